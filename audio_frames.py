@@ -0,0 +1,314 @@
+import array
+import os
+import logging
+from functools import lru_cache
+
+from livekit import rtc
+
+try:
+    import numpy as np
+except ImportError:
+    # livekit-rtc depends on numpy; the pure Python path only keeps this module importable without it
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Rate (Hz) and channels agent speech is converted to before it reaches the room; 0 passes TTS audio through
+AUDIO_OUTPUT_SAMPLE_RATE = int(os.getenv("AUDIO_OUTPUT_SAMPLE_RATE", "0"))
+AUDIO_OUTPUT_CHANNELS = int(os.getenv("AUDIO_OUTPUT_CHANNELS", "1"))
+AUDIO_FRAME_MS = int(os.getenv("AUDIO_FRAME_MS", "20"))
+# Seconds of converted audio held by each converter's ring; emitted frames stay valid that long
+AUDIO_RING_SECONDS = float(os.getenv("AUDIO_RING_SECONDS", "2"))
+
+
+def as_bytes(data) -> memoryview:
+    """Byte view of any PCM buffer (bytes, memoryview of int16, numpy array) without copying."""
+    view = data if isinstance(data, memoryview) else memoryview(data)
+    return view if view.format == "B" and view.ndim == 1 else view.cast("B")
+
+
+class PcmRingBuffer:
+    """Preallocated ring of int16 PCM; reads return views into the ring instead of new bytes.
+
+    Sizes are in samples (interleaved, so a stereo frame is two samples). A view returned by
+    `read()` is valid until the ring wraps back over it. Reads that straddle the end of the
+    ring are linearized into a preallocated scratch buffer, which the next wrapped read reuses.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._buf = bytearray(capacity * 2)
+        self._view = memoryview(self._buf)
+        self._scratch = memoryview(bytearray(capacity * 2))
+        self._read = 0
+        self._write = 0
+        self.available = 0
+        self.overruns = 0
+
+    @property
+    def free(self) -> int:
+        return self.capacity - self.available
+
+    def write(self, data) -> int:
+        """Copy samples into the ring, dropping the oldest unread ones if it is full."""
+        src = as_bytes(data)
+        samples = len(src) // 2
+        if samples > self.capacity:
+            src = src[-self.capacity * 2:]
+            samples = self.capacity
+        if samples > self.free:
+            self.overruns += 1
+            self._read = (self._read + samples - self.free) % self.capacity
+            self.available = self.capacity - samples
+        start = self._write * 2
+        first = min(len(src), len(self._buf) - start)
+        self._view[start:start + first] = src[:first]
+        if first < len(src):
+            self._view[:len(src) - first] = src[first:]
+        self._write = (self._write + samples) % self.capacity
+        self.available += samples
+        return samples
+
+    def read(self, samples) -> memoryview:
+        """Take `samples` samples (or fewer if less is buffered) as a byte view."""
+        samples = min(samples, self.available)
+        start = self._read * 2
+        end = start + samples * 2
+        if end <= len(self._buf):
+            view = self._view[start:end]
+        else:
+            first = len(self._buf) - start
+            self._scratch[:first] = self._view[start:]
+            self._scratch[first:samples * 2] = self._view[:samples * 2 - first]
+            view = self._scratch[:samples * 2]
+        self._read = (self._read + samples) % self.capacity
+        self.available -= samples
+        return view
+
+    def clear(self):
+        self._read = self._write = self.available = 0
+
+
+@lru_cache(maxsize=64)
+def _interp_plan(frames, phase, step, channels):
+    """Gather indices and weights for linear interpolation of one block (numpy only).
+
+    Output sample k sits at input position `phase + k * step`; position -1 is the last
+    sample of the previous block, which is kept at index 0 of the extended input.
+    """
+    count = int((frames - 1 - phase) // step) + 1 if frames - 1 >= phase else 0
+    positions = phase + step * np.arange(count, dtype=np.float64)
+    left = np.floor(positions)
+    # Broadcast up front: ufuncs with broadcast operands allocate internal buffers
+    weights = np.repeat((positions - left).astype(np.float32).reshape(-1, 1), channels, axis=1)
+    left_idx = left.astype(np.intp) + 1
+    right_idx = np.minimum(left_idx + 1, frames)
+    next_phase = phase + step * count - frames
+    return left_idx, right_idx, weights, count, round(next_phase, 9)
+
+
+class Resampler:
+    """Streaming linear-interpolation resampler for interleaved int16 PCM.
+
+    Keeps the last input sample and the fractional output position across blocks, so
+    arbitrary block sizes resample seamlessly. Integer downsampling ratios (48 kHz to
+    16 kHz) average each group of input samples instead, which also suppresses aliasing.
+    Work buffers are preallocated and reused; the returned array is a view into the output
+    buffer, valid until the next call.
+    """
+
+    def __init__(self, src_rate, dst_rate, num_channels=1):
+        self.src_rate = src_rate
+        self.dst_rate = dst_rate
+        self.num_channels = num_channels
+        self.step = src_rate / dst_rate
+        self.decimation = src_rate // dst_rate if src_rate % dst_rate == 0 and src_rate > dst_rate else 0
+        self._phase = 0.0
+        self._last = [0] * num_channels
+        self._capacity = 0
+
+    def _ensure(self, frames):
+        if frames <= self._capacity:
+            return
+        out_frames = int(frames / self.step) + 2
+        ch = self.num_channels
+        self._ext = np.zeros((frames + 1, ch), dtype=np.float32)
+        self._wide = np.empty((frames, ch), dtype=np.int32)
+        self._left = np.empty((out_frames, ch), dtype=np.float32)
+        self._right = np.empty((out_frames, ch), dtype=np.float32)
+        self._sum = np.empty((out_frames, ch), dtype=np.int32)
+        self._out = np.empty((out_frames, ch), dtype=np.int16)
+        self._capacity = frames
+
+    def process(self, data):
+        """Resample a block; returns int16 samples (numpy view, or `array('h')` without numpy)."""
+        if np is None:
+            return self._process_python(data)
+        ch = self.num_channels
+        x = np.frombuffer(as_bytes(data), dtype=np.int16).reshape(-1, ch)
+        frames = len(x)
+        if not frames:
+            return x.reshape(-1)
+        self._ensure(frames)
+
+        if self.decimation and self._phase == 0.0 and frames % self.decimation == 0:
+            count = frames // self.decimation
+            # Widen first: reductions that cast on the fly allocate internal buffers
+            wide = self._wide[:frames]
+            np.copyto(wide, x)
+            total = self._sum[:count]
+            np.sum(wide.reshape(count, self.decimation, ch), axis=1, out=total)
+            np.floor_divide(total, self.decimation, out=total)
+            out = self._out[:count]
+            out[...] = total
+            self._last = x[-1].tolist()
+            return out.reshape(-1)
+
+        left_idx, right_idx, weights, count, next_phase = _interp_plan(frames, self._phase, self.step, ch)
+        ext = self._ext[:frames + 1]
+        ext[0] = self._last
+        ext[1:] = x
+        left = self._left[:count]
+        right = self._right[:count]
+        # mode="clip" lets take() write straight into `out`; "raise" buffers it
+        np.take(ext, left_idx, axis=0, out=left, mode="clip")
+        np.take(ext, right_idx, axis=0, out=right, mode="clip")
+        np.subtract(right, left, out=right)
+        np.multiply(right, weights, out=right)
+        np.add(left, right, out=left)
+        np.rint(left, out=left)
+        out = self._out[:count]
+        out[...] = left
+        self._last = x[-1].tolist()
+        self._phase = next_phase
+        return out.reshape(-1)
+
+    def _process_python(self, data):
+        ch = self.num_channels
+        x = array.array("h")
+        x.frombytes(as_bytes(data))
+        frames = len(x) // ch
+        out = array.array("h")
+        k = 0
+        t = self._phase
+        while t <= frames - 1:
+            i = int(t // 1)
+            frac = t - i
+            for c in range(ch):
+                left = x[i * ch + c] if i >= 0 else self._last[c]
+                right = x[min(i + 1, frames - 1) * ch + c]
+                out.append(int(round(left + (right - left) * frac)))
+            k += 1
+            t = self._phase + k * self.step
+        if frames:
+            self._last = list(x[(frames - 1) * ch:frames * ch])
+            self._phase = round(t - frames, 9)
+        return out
+
+
+class ChannelMixer:
+    """Converts interleaved int16 PCM between channel counts into a reusable output buffer.
+
+    Downmixing averages the channels; upmixing copies mono to every channel. Other
+    conversions go through mono.
+    """
+
+    def __init__(self, src_channels, dst_channels):
+        self.src_channels = src_channels
+        self.dst_channels = dst_channels
+        self._capacity = 0
+
+    def _ensure(self, frames):
+        if frames > self._capacity:
+            self._wide = np.empty((frames, self.src_channels), dtype=np.int32) if np is not None else None
+            self._sum = np.empty(frames, dtype=np.int32) if np is not None else None
+            self._out = np.empty(frames * self.dst_channels, dtype=np.int16) if np is not None else None
+            self._capacity = frames
+
+    def process(self, data):
+        src, dst = self.src_channels, self.dst_channels
+        if np is None:
+            x = array.array("h")
+            x.frombytes(as_bytes(data))
+            mono = [sum(x[i:i + src]) // src for i in range(0, len(x), src)] if src > 1 else x
+            return array.array("h", (s for s in mono for _ in range(dst)))
+        x = np.frombuffer(as_bytes(data), dtype=np.int16).reshape(-1, src)
+        frames = len(x)
+        self._ensure(frames)
+        out = self._out[:frames * dst].reshape(frames, dst)
+        if src == 1:
+            out[...] = x
+        else:
+            wide = self._wide[:frames]
+            np.copyto(wide, x)
+            total = self._sum[:frames]
+            np.sum(wide, axis=1, out=total)
+            np.floor_divide(total, src, out=total)
+            out[...] = total.reshape(-1, 1)
+        return out.reshape(-1)
+
+
+class FrameConverter:
+    """Turns PCM chunks of any rate and channel layout into fixed-size frames in one target format.
+
+    Chunks go through channel mixing and resampling into a ring buffer. Complete `frame_ms`
+    frames are then yielded as `rtc.AudioFrame`s over views of the ring. A view frame's data
+    is overwritten after `ring_seconds` of later audio, so consumers must use it right away.
+    With `copy_frames=True` each frame owns a copy of its data instead, for frames handed to
+    code that may buffer them (agent speech).
+    """
+
+    def __init__(self, sample_rate, num_channels=1, frame_ms=AUDIO_FRAME_MS, ring_seconds=AUDIO_RING_SECONDS,
+                 copy_frames=False):
+        self.sample_rate = sample_rate
+        self.num_channels = num_channels
+        self.copy_frames = copy_frames
+        self.frame_samples = sample_rate * frame_ms // 1000 * num_channels
+        # A whole number of frames, so frame reads never straddle the end of the ring
+        frames = max(2, int(ring_seconds * 1000 / frame_ms))
+        self._ring = PcmRingBuffer(frames * self.frame_samples)
+        self._resampler = None
+        self._mixer = None
+        self.frames_out = 0
+
+    def _convert(self, data, sample_rate, num_channels):
+        if num_channels != self.num_channels:
+            if self._mixer is None or self._mixer.src_channels != num_channels:
+                self._mixer = ChannelMixer(num_channels, self.num_channels)
+            data = self._mixer.process(data)
+        if sample_rate != self.sample_rate:
+            if self._resampler is None or self._resampler.src_rate != sample_rate:
+                self._resampler = Resampler(sample_rate, self.sample_rate, self.num_channels)
+            data = self._resampler.process(data)
+        return as_bytes(data)
+
+    def push(self, data, sample_rate, num_channels=1):
+        """Convert a chunk and yield every frame it completes."""
+        src = self._convert(data, sample_rate, num_channels)
+        offset = 0
+        while offset < len(src):
+            # Never overwrite unread audio: write at most what fits, then drain
+            take = min(len(src) - offset, self._ring.free * 2)
+            self._ring.write(src[offset:offset + take])
+            offset += take
+            while self._ring.available >= self.frame_samples:
+                yield self._frame(self._ring.read(self.frame_samples))
+
+    def push_frame(self, frame):
+        """Convert an `rtc.AudioFrame`; yields frames in the target format."""
+        return self.push(frame.data, frame.sample_rate, frame.num_channels)
+
+    def flush(self):
+        """Yield buffered audio that doesn't fill a whole frame and reset the ring."""
+        if self._ring.available:
+            yield self._frame(self._ring.read(self._ring.available))
+        self._ring.clear()
+
+    def _frame(self, view):
+        self.frames_out += 1
+        return rtc.AudioFrame(
+            data=bytes(view) if self.copy_frames else view,
+            sample_rate=self.sample_rate,
+            num_channels=self.num_channels,
+            samples_per_channel=len(view) // (2 * self.num_channels),
+        )
@@ -0,0 +1,181 @@
+import asyncio
+import os
+import logging
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Connection pool tuning (all optional)
+BACKEND_POOL_LIMIT = int(os.getenv("BACKEND_POOL_LIMIT", "200"))
+BACKEND_POOL_LIMIT_PER_HOST = int(os.getenv("BACKEND_POOL_LIMIT_PER_HOST", "50"))
+BACKEND_DNS_CACHE_TTL = int(os.getenv("BACKEND_DNS_CACHE_TTL", "300"))
+BACKEND_KEEPALIVE_TIMEOUT = float(os.getenv("BACKEND_KEEPALIVE_TIMEOUT", "60"))
+BACKEND_CONNECT_TIMEOUT = float(os.getenv("BACKEND_CONNECT_TIMEOUT", "5"))
+BACKEND_READ_TIMEOUT = float(os.getenv("BACKEND_READ_TIMEOUT", "15"))
+
+
+class BackendClient:
+    """Keep-alive aiohttp connection pool shared by every tool and session in the worker."""
+
+    def __init__(
+        self,
+        name="backend",
+        limit=BACKEND_POOL_LIMIT,
+        limit_per_host=BACKEND_POOL_LIMIT_PER_HOST,
+        dns_cache_ttl=BACKEND_DNS_CACHE_TTL,
+        keepalive_timeout=BACKEND_KEEPALIVE_TIMEOUT,
+        connect_timeout=BACKEND_CONNECT_TIMEOUT,
+        read_timeout=BACKEND_READ_TIMEOUT,
+    ):
+        self.name = name
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._session = None
+        self._connector = None
+        self._lock = None
+
+        # Counters fed by aiohttp trace hooks
+        self.requests_total = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.waiters = 0
+        self.max_waiters = 0
+
+    def _build_trace_config(self):
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, ctx, params):
+            self.requests_total += 1
+
+        async def on_connection_create_end(session, ctx, params):
+            self.connections_created += 1
+
+        async def on_connection_reuseconn(session, ctx, params):
+            self.connections_reused += 1
+
+        async def on_connection_queued_start(session, ctx, params):
+            self.waiters += 1
+            self.max_waiters = max(self.max_waiters, self.waiters)
+
+        async def on_connection_queued_end(session, ctx, params):
+            self.waiters -= 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_connection_queued_start.append(on_connection_queued_start)
+        trace_config.on_connection_queued_end.append(on_connection_queued_end)
+        return trace_config
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Return the pooled session, creating it on first use inside the running loop."""
+        if self._session is not None and not self._session.closed:
+            return self._session
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._session is None or self._session.closed:
+                self._connector = aiohttp.TCPConnector(
+                    limit=self.limit,
+                    limit_per_host=self.limit_per_host,
+                    ttl_dns_cache=self.dns_cache_ttl,
+                    use_dns_cache=True,
+                    keepalive_timeout=self.keepalive_timeout,
+                )
+                self._session = aiohttp.ClientSession(
+                    connector=self._connector,
+                    timeout=aiohttp.ClientTimeout(
+                        total=None,
+                        connect=self.connect_timeout,
+                        sock_read=self.read_timeout,
+                    ),
+                    trace_configs=[self._build_trace_config()],
+                )
+                logger.info(
+                    f"Created {self.name} connection pool "
+                    f"(limit={self.limit}, per_host={self.limit_per_host}, dns_ttl={self.dns_cache_ttl}s)"
+                )
+        return self._session
+
+    def request(self, method, url, **kwargs):
+        """Issue a request on the shared pool; use as `async with client.request(...) as resp`."""
+        return _PooledRequest(self, method, url, kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def stats(self) -> dict:
+        """Snapshot of pool usage for sizing the pool under load."""
+        in_use = 0
+        idle = 0
+        connector = self._connector
+        if connector is not None and not connector.closed:
+            # aiohttp does not expose these publicly; read them defensively.
+            in_use = len(getattr(connector, "_acquired", ()) or ())
+            idle = sum(len(conns) for conns in (getattr(connector, "_conns", {}) or {}).values())
+        acquired = self.connections_created + self.connections_reused
+        return {
+            "name": self.name,
+            "open_connections": in_use + idle,
+            "in_use_connections": in_use,
+            "idle_connections": idle,
+            "waiters": self.waiters,
+            "max_waiters": self.max_waiters,
+            "requests_total": self.requests_total,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "reuse_ratio": round(self.connections_reused / acquired, 4) if acquired else 0.0,
+            "limit": self.limit,
+            "limit_per_host": self.limit_per_host,
+        }
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            logger.info(f"Closing {self.name} connection pool: {self.stats()}")
+            await self._session.close()
+        self._session = None
+        self._connector = None
+
+
+class _PooledRequest:
+    """Async context manager that resolves the shared session lazily before issuing a request."""
+
+    def __init__(self, client, method, url, kwargs):
+        self._client = client
+        self._method = method
+        self._url = url
+        self._kwargs = kwargs
+        self._ctx = None
+
+    async def __aenter__(self) -> aiohttp.ClientResponse:
+        session = await self._client.get_session()
+        self._ctx = session.request(self._method, self._url, **self._kwargs)
+        return await self._ctx.__aenter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return await self._ctx.__aexit__(exc_type, exc, tb)
+
+
+_backend_client = None
+
+
+def get_backend_client() -> BackendClient:
+    """Process-wide client used for all calls to the Optiflow backend and webhooks."""
+    global _backend_client
+    if _backend_client is None:
+        _backend_client = BackendClient()
+    return _backend_client
+
+
+async def close_backend_client():
+    global _backend_client
+    if _backend_client is not None:
+        await _backend_client.close()
+        _backend_client = None
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""Micro-benchmark of the PCM frame path: per-frame bytes and Python loops vs `audio_frames`.
+
+Two scenarios, each fed with chunks of varying size like a provider stream:
+
+- tts-to-room: 24 kHz mono TTS output to 48 kHz mono 20 ms frames
+- room-to-stt: 48 kHz stereo 10 ms room frames to 16 kHz mono 20 ms frames
+
+"before" is the straightforward approach: accumulate into a bytearray, slice a new `bytes`
+per frame, and resample and mix channels with Python loops over `array('h')`. "after" is
+`audio_frames.FrameConverter` (ring buffer views, vectorized int16 resampling and mixing).
+Both hand `rtc.AudioFrame`s to the consumer.
+
+Reported per scenario and implementation:
+- frames/s: output frames per second of CPU time on one core
+- bytes/frame: peak transient heap per frame, measured with tracemalloc in a separate pass
+
+Usage:
+    python benchmarks/audio_bench.py --seconds 30
+    python benchmarks/audio_bench.py --json audio.json
+"""
+import argparse
+import array
+import json
+import math
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from livekit import rtc  # noqa: E402
+from audio_frames import FrameConverter  # noqa: E402
+
+SCENARIOS = {
+    # name: (source rate, source channels, source chunk sizes in ms, target rate, target channels)
+    "tts-to-room": (24000, 1, (20, 60, 100, 250), 48000, 1),
+    "room-to-stt": (48000, 2, (10,), 16000, 1),
+}
+FRAME_MS = 20
+
+
+def make_chunks(rate, channels, chunk_ms, seconds, seed=1):
+    """Speech-like test signal (two tones) cut into chunks of the given durations."""
+    rng = random.Random(seed)
+    total = int(rate * seconds)
+    samples = array.array("h", (
+        int(6000 * math.sin(2 * math.pi * 220 * i / rate) + 3000 * math.sin(2 * math.pi * 1250 * i / rate))
+        for i in range(total) for _ in range(channels)
+    ))
+    data = samples.tobytes()
+    chunks = []
+    offset = 0
+    while offset < len(data):
+        size = rate * rng.choice(chunk_ms) // 1000 * channels * 2
+        chunks.append(data[offset:offset + size])
+        offset += size
+    return chunks
+
+
+class NaiveConverter:
+    """The pre-`audio_frames` way: new bytes per frame and per-sample Python loops."""
+
+    def __init__(self, sample_rate, num_channels, frame_ms=FRAME_MS):
+        self.sample_rate = sample_rate
+        self.num_channels = num_channels
+        self.frame_bytes = sample_rate * frame_ms // 1000 * num_channels * 2
+        self.buffer = bytearray()
+        self.phase = 0.0
+        self.last = 0
+
+    def push(self, data, sample_rate, num_channels):
+        samples = array.array("h")
+        samples.frombytes(data)
+        if num_channels != self.num_channels:
+            samples = array.array("h", (
+                sum(samples[i:i + num_channels]) // num_channels for i in range(0, len(samples), num_channels)
+            ))
+        if sample_rate != self.sample_rate:
+            samples = self._resample(samples, sample_rate / self.sample_rate)
+        self.buffer += samples.tobytes()
+        while len(self.buffer) >= self.frame_bytes:
+            frame = bytes(self.buffer[:self.frame_bytes])
+            del self.buffer[:self.frame_bytes]
+            yield rtc.AudioFrame(
+                data=frame,
+                sample_rate=self.sample_rate,
+                num_channels=self.num_channels,
+                samples_per_channel=len(frame) // (2 * self.num_channels),
+            )
+
+    def _resample(self, samples, step):
+        out = array.array("h")
+        t = self.phase
+        n = len(samples)
+        while t <= n - 1:
+            i = int(t)
+            frac = t - i
+            left = samples[i] if i >= 0 else self.last
+            right = samples[min(i + 1, n - 1)]
+            out.append(int(round(left + (right - left) * frac)))
+            t += step
+        self.last = samples[-1]
+        self.phase = t - n
+        return out
+
+
+def run_once(impl, scenario, chunks):
+    src_rate, src_channels, _, dst_rate, dst_channels = SCENARIOS[scenario]
+    converter = (FrameConverter(dst_rate, dst_channels, frame_ms=FRAME_MS) if impl == "after"
+                 else NaiveConverter(dst_rate, dst_channels))
+    frames = 0
+    for chunk in chunks:
+        for _ in converter.push(chunk, src_rate, src_channels):
+            frames += 1
+    return frames
+
+
+def measure_speed(impl, scenario, chunks, repeat):
+    best = None
+    frames = 0
+    for _ in range(repeat):
+        started = time.process_time()
+        frames = run_once(impl, scenario, chunks)
+        elapsed = time.process_time() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return frames / best if best else float("inf")
+
+
+def measure_allocations(impl, scenario, chunks):
+    """Peak transient heap per output frame: memory that exists only while a chunk is converted."""
+    src_rate, src_channels, _, dst_rate, dst_channels = SCENARIOS[scenario]
+    converter = (FrameConverter(dst_rate, dst_channels, frame_ms=FRAME_MS) if impl == "after"
+                 else NaiveConverter(dst_rate, dst_channels))
+    # Warm up so buffers allocated once per converter aren't counted
+    for chunk in chunks[:50]:
+        for _ in converter.push(chunk, src_rate, src_channels):
+            pass
+    tracemalloc.start()
+    transient = 0
+    frames = 0
+    try:
+        for chunk in chunks[50:]:
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            for _ in converter.push(chunk, src_rate, src_channels):
+                frames += 1
+            _, peak = tracemalloc.get_traced_memory()
+            transient += max(0, peak - before)
+    finally:
+        tracemalloc.stop()
+    return transient / frames if frames else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=SCENARIOS)
+    parser.add_argument("--seconds", type=float, default=20.0, help="seconds of audio per scenario")
+    parser.add_argument("--repeat", type=int, default=3, help="timing runs; the fastest is reported")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'scenario':<12} {'impl':<7} {'frames/s':>12} {'bytes/frame':>12}")
+    for scenario in args.scenarios:
+        src_rate, src_channels, chunk_ms, _, _ = SCENARIOS[scenario]
+        chunks = make_chunks(src_rate, src_channels, chunk_ms, args.seconds)
+        results[scenario] = {}
+        for impl in ("before", "after"):
+            speed = measure_speed(impl, scenario, chunks, args.repeat)
+            allocated = measure_allocations(impl, scenario, chunks)
+            results[scenario][impl] = {"frames_per_second": speed, "bytes_per_frame": allocated}
+            print(f"{scenario:<12} {impl:<7} {speed:>12,.0f} {allocated:>12,.0f}")
+        before, after = results[scenario]["before"], results[scenario]["after"]
+        print(f"{scenario:<12} {'speedup':<7} {after['frames_per_second'] / before['frames_per_second']:>11.1f}x")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
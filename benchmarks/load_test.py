@@ -0,0 +1,508 @@
+#!/usr/bin/env python3
+"""Synthetic load test: N concurrent voice sessions through `JarvisAgent.process_job`.
+
+Everything runs offline in one process, like a single agent worker:
+
+- LiveKit rooms and the agent session are replaced by `FakeSession`. It plays the user,
+  with think time, end of speech, and a final transcript after the STT latency. It also
+  drives replies through the agent's real `tts_node` (sentence streaming), and consumes
+  the agent audio as it is produced.
+- While the user speaks, interim transcripts arrive word by word every `--interim-interval`.
+  Everything the agent sends on the data channel is decoded and counted.
+- The LLM streams a canned reply token by token after a first-token delay. A share of
+  turns (`--tool-ratio`) first calls the knowledge base tool through the agent's tool
+  executor.
+- TTS returns PCM after a first-byte delay, faster than real time.
+- The Optiflow backend is a local aiohttp server. It serves knowledge base search,
+  Pipedream actions and bulk presence, with its own latency.
+
+Every latency gets uniform jitter of +/- `--jitter` (a fraction). For each concurrency level the report
+gives the sessions that completed every turn, the turn latency, CPU per session, RSS per
+session, data channel packets and bytes per session, and event-loop lag. Turn latency runs from the end of user speech to the first
+agent audio frame, and the report shows its p50/p95/p99. The highest level whose p99
+stays within `--slo-p99` without failed sessions is reported as sustained.
+
+Usage:
+    python benchmarks/load_test.py --sessions 10 25 50 100 --turns 5
+    python benchmarks/load_test.py --sessions 50 --json load.json
+    python benchmarks/load_test.py --sessions 50 --baseline load.json --max-regression 0.25 --max-p99 1.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+USER_UTTERANCES = (
+    "What is on my calendar for tomorrow morning",
+    "Summarize the onboarding guide for new engineers",
+    "Send an email to the team about the release",
+    "What does our travel policy say about hotels",
+    "Create a task to review the quarterly report",
+    "How do I request access to the analytics dashboard",
+)
+
+AGENT_REPLY = (
+    "Sure, I can help with that. Here is a short summary of what I found. "
+    "The document covers the main steps and who to contact for each of them. "
+    "Let me know if you want me to go into more detail on any part."
+)
+
+SAMPLE_RATE = 24000
+# Duration of each synthesized TTS chunk
+TTS_CHUNK_MS = 100
+
+
+def _jittered(seconds, jitter):
+    return max(0.0, seconds * (1 + random.uniform(-jitter, jitter)))
+
+
+class LoadProfile:
+    """Latencies (seconds) of the stand-ins and the shape of each simulated session."""
+
+    def __init__(self, args):
+        self.turns = args.turns
+        self.think_time = args.think_time
+        self.stt_latency = args.stt_latency
+        self.llm_first_token = args.llm_first_token
+        self.llm_token_interval = args.llm_token_interval
+        self.tts_first_byte = args.tts_first_byte
+        self.tts_speed = args.tts_speed
+        self.backend_latency = args.backend_latency
+        self.jitter = args.jitter
+        self.tool_ratio = args.tool_ratio
+        self.interim_interval = args.interim_interval
+        self.data_encoding = args.data_encoding
+
+    def delay(self, seconds):
+        return asyncio.sleep(_jittered(seconds, self.jitter))
+
+
+# --- Stand-ins -------------------------------------------------------------------------
+
+class FakeParticipant:
+    def __init__(self, identity):
+        self.identity = identity
+
+
+class FakeRoom:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeJob:
+    def __init__(self, index):
+        from livekit.agents import AgentJobType
+
+        self.id = f"load-job-{index}"
+        self.type = AgentJobType.AGENT
+        self.room = FakeRoom(f"load-room-{index}")
+        self.participant = FakeParticipant(f"load-user-{index}")
+        self.metadata = json.dumps({
+            "userId": self.participant.identity,
+            "orgId": "load-org",
+            "memoryContext": [f"The user prefers short answers ({index})."],
+            "dataEncoding": FakeSession.profile.data_encoding,
+        })
+
+
+class FakeToolContext:
+    def __init__(self, participant):
+        self.job = FakeJobRef(participant)
+        self.metadata = {"user_id": participant.identity, "org_id": "load-org"}
+
+
+class FakeJobRef:
+    def __init__(self, participant):
+        self.participant = participant
+
+
+class FakeAudio:
+    """Shape of a synthesized audio chunk as the TTS plugins return it."""
+
+    __slots__ = ("frame",)
+
+    def __init__(self, frame):
+        self.frame = frame
+
+
+class FakeTTS:
+    def __init__(self, profile):
+        self.profile = profile
+        self.requests = 0
+
+    async def synthesize(self, text, **kwargs):
+        from livekit import rtc
+
+        self.requests += 1
+        await self.profile.delay(self.profile.tts_first_byte)
+        # About 15 characters per second of speech, delivered tts_speed times faster than real time
+        samples = SAMPLE_RATE * TTS_CHUNK_MS // 1000
+        chunk = bytes(samples * 2)
+        for _ in range(max(1, int(len(text) / 15 * 1000 / TTS_CHUNK_MS))):
+            yield FakeAudio(rtc.AudioFrame(
+                data=chunk, sample_rate=SAMPLE_RATE, num_channels=1, samples_per_channel=samples,
+            ))
+            await asyncio.sleep(TTS_CHUNK_MS / 1000 / self.profile.tts_speed)
+
+
+class FakeLLM:
+    def __init__(self, profile):
+        self.profile = profile
+        self.tools = []
+
+    async def stream(self, ctx, query):
+        if self.tools and random.random() < self.profile.tool_ratio:
+            # The knowledge base tool is registered second, wrapped by the tool executor
+            await self.profile.delay(self.profile.llm_first_token)
+            await self.tools[-1].arun(ctx, query_text=query)
+        await self.profile.delay(self.profile.llm_first_token)
+        for token in AGENT_REPLY.split(" "):
+            yield token + " "
+            await self.profile.delay(self.profile.llm_token_interval)
+
+
+class FakeEvent:
+    def __init__(self, type, **fields):
+        self.type = type
+        self.__dict__.update(fields)
+
+
+class FakeSession:
+    """Stands in for `AgentSession`: plays the user and the room around the real agent code."""
+
+    profile = None
+    results = None
+    created = []
+
+    def __init__(self, room=None, participant=None, stt=None, llm=None, tts=None,
+                 llm_context=None, tts_node=None, **kwargs):
+        self.room = room
+        self.participant = participant
+        self.llm = llm
+        self.tts = tts
+        self.llm_context = llm_context
+        self.tts_node = tts_node
+        self.errors = 0
+        self.turns = 0
+        self.closed = False
+        self.created.append(self)
+
+    async def say(self, text, audio=None):
+        if audio is not None:
+            async for _ in audio:
+                pass
+
+    async def send_data(self, payload):
+        from data_channel import decode
+
+        self.results.packets += 1
+        self.results.packet_bytes += len(payload) if isinstance(payload, bytes) else len(payload.encode())
+        for message in decode(payload):
+            if message.get("type") == "error":
+                self.errors += 1
+
+    def interrupt(self):
+        pass
+
+    async def close(self):
+        self.closed = True
+
+    async def process_media(self):
+        profile = self.profile
+        ctx = FakeToolContext(self.participant)
+        for _ in range(profile.turns):
+            if self.closed:
+                return
+            await profile.delay(profile.think_time)
+            query = random.choice(USER_UTTERANCES)
+            yield FakeEvent("user_started_speaking")
+            words = query.split(" ")
+            for count in range(1, len(words) + 1):
+                await profile.delay(profile.interim_interval)
+                yield FakeEvent("transcript", text=" ".join(words[:count]), is_final=False)
+            yield FakeEvent("user_stopped_speaking")
+            speech_ended = time.perf_counter()
+            await profile.delay(profile.stt_latency)
+            yield FakeEvent("transcript", text=query, is_final=True)
+
+            first_frame = True
+            async for _ in self.tts_node(self.llm.stream(ctx, query)):
+                if first_frame:
+                    first_frame = False
+                    self.results.turn_latencies.append(time.perf_counter() - speech_ended)
+                    yield FakeEvent("agent_speaking_started")
+            yield FakeEvent("agent_speaking_finished")
+            self.results.turns += 1
+            self.turns += 1
+
+
+async def start_backend(profile):
+    """Local Optiflow backend stand-in; returns (runner, base_url)."""
+    from aiohttp import web
+
+    async def knowledge_search(request):
+        body = await request.json()
+        await profile.delay(profile.backend_latency)
+        return web.json_response({"documents": [{
+            "title": "Load test document",
+            "content": f"Synthetic content for {body.get('query')!r}. " * 4,
+            "metadata": {"source": "load-test"},
+            "similarity": 0.9,
+        }]})
+
+    async def pipedream_execute(request):
+        await request.read()
+        await profile.delay(profile.backend_latency)
+        return web.json_response({"status": "success"})
+
+    async def presence_check_bulk(request):
+        body = await request.json()
+        await profile.delay(profile.backend_latency)
+        return web.json_response({"users": {user_id: {"inactive": False} for user_id in body.get("userIds", [])}})
+
+    app = web.Application()
+    app.router.add_post("/api/knowledge/search", knowledge_search)
+    app.router.add_post("/api/pipedream/execute", pipedream_execute)
+    app.router.add_post("/api/presence/check-bulk", presence_check_bulk)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+# --- Measurement -----------------------------------------------------------------------
+
+class LevelResults:
+    def __init__(self):
+        self.turn_latencies = []
+        self.turns = 0
+        self.loop_lags = []
+        self.peak_rss = 0
+        self.packets = 0
+        self.packet_bytes = 0
+
+
+def current_rss() -> int:
+    """Resident set size in bytes (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+async def monitor_loop(results, interval=0.01):
+    """Sample event-loop lag (how late a short sleep wakes up) and RSS until cancelled."""
+    while True:
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        results.loop_lags.append(max(0.0, time.perf_counter() - expected))
+        results.peak_rss = max(results.peak_rss, current_rss())
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+async def run_level(main_agent, profile, sessions, ramp):
+    from provider_pool import SessionProviders
+
+    results = LevelResults()
+    FakeSession.profile = profile
+    FakeSession.results = results
+    FakeSession.created = []
+    tts = FakeTTS(profile)
+
+    async def run_session(index):
+        await asyncio.sleep(ramp * index / max(1, sessions))
+        providers = SessionProviders(stt=None, llm=FakeLLM(profile), tts=tts)
+        await main_agent.JarvisAgent(providers).process_job(FakeJob(index))
+
+    rss_before = current_rss()
+    results.peak_rss = rss_before
+    monitor = asyncio.create_task(monitor_loop(results))
+    cpu_before = time.process_time()
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(run_session(index) for index in range(sessions)))
+    finally:
+        monitor.cancel()
+        await asyncio.gather(monitor, return_exceptions=True)
+    wall = time.perf_counter() - started
+    cpu = time.process_time() - cpu_before
+
+    completed = sum(1 for session in FakeSession.created if not session.errors and session.turns == profile.turns)
+    latencies = results.turn_latencies
+    return {
+        "sessions": sessions,
+        "completed": completed,
+        "failed": sessions - completed,
+        "turns": results.turns,
+        "duration": round(wall, 3),
+        "turn_p50": percentile(latencies, 0.5),
+        "turn_p95": percentile(latencies, 0.95),
+        "turn_p99": percentile(latencies, 0.99),
+        "turns_per_second": results.turns / wall if wall else 0.0,
+        # Share of one core used per concurrent session
+        "cpu_per_session": cpu / wall / sessions if wall else 0.0,
+        "rss_mb_per_session": max(0, results.peak_rss - rss_before) / sessions / (1024 * 1024),
+        "packets_per_session": results.packets / sessions,
+        "bytes_per_session": results.packet_bytes / sessions,
+        "loop_lag_p99": percentile(results.loop_lags, 0.99),
+        "loop_lag_max": max(results.loop_lags) if results.loop_lags else None,
+    }
+
+
+def configure_environment(backend_url, cache_dir):
+    """Point the agent at the local stand-ins; must run before `main_agent` is imported."""
+    os.environ["OPTIFLOW_BACKEND_URL"] = backend_url
+    os.environ["OPTIFLOW_BACKEND_API_KEY"] = "load-test"
+    os.environ["PHRASE_CACHE_DIR"] = cache_dir
+    os.environ.setdefault("LOG_FILE", "")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("WORKER_PROCESSES", "0")
+    # Forward interim transcripts so the data channel carries realistic traffic
+    os.environ.setdefault("DATA_CHANNEL_TRANSCRIPTS", "true")
+    # Empty rather than unset so a local .env can't turn them back on
+    for name in ("AGENT_EVENT_WEBHOOK_URL", "DISPATCH_URL", "OPENAI_API_KEY", "DEEPGRAM_API_KEY", "ELEVENLABS_API_KEY"):
+        os.environ[name] = ""
+
+
+def check_thresholds(results, args, baseline):
+    failures = []
+    for level in results:
+        label = f"{level['sessions']} sessions"
+        if level["failed"]:
+            failures.append(f"{label}: {level['failed']} sessions failed")
+        if args.max_p99 is not None and (level["turn_p99"] or 0) > args.max_p99:
+            failures.append(f"{label}: turn p99 {level['turn_p99']:.3f}s > {args.max_p99:.3f}s")
+        if args.max_loop_lag is not None and (level["loop_lag_p99"] or 0) > args.max_loop_lag:
+            failures.append(f"{label}: loop lag p99 {level['loop_lag_p99']:.3f}s > {args.max_loop_lag:.3f}s")
+    if baseline:
+        previous = {level["sessions"]: level for level in baseline.get("levels", [])}
+        for level in results:
+            before = previous.get(level["sessions"])
+            if not before:
+                continue
+            for metric in ("turn_p50", "turn_p99", "cpu_per_session"):
+                if not before.get(metric) or level.get(metric) is None:
+                    continue
+                limit = before[metric] * (1 + args.max_regression)
+                if level[metric] > limit:
+                    failures.append(
+                        f"{level['sessions']} sessions {metric}: {level[metric]:.4f} > {limit:.4f} "
+                        f"(baseline {before[metric]:.4f} +{args.max_regression:.0%})"
+                    )
+    return failures
+
+
+async def run(args):
+    profile = LoadProfile(args)
+    runner, backend_url = await start_backend(profile)
+    cache_dir = tempfile.mkdtemp(prefix="jarvis-load-")
+    configure_environment(backend_url, cache_dir)
+    sys.path.insert(0, REPO_ROOT)
+    import main_agent
+    from backend_client import close_backend_client
+    from log_setup import configure_logging
+
+    configure_logging()
+
+    # Every session the agent opens is a simulated user in a simulated room
+    main_agent.AgentSession = FakeSession
+
+    results = []
+    try:
+        # Render the fixed phrases once so the first level doesn't pay for it
+        await main_agent.phrase_cache.prewarm(FakeTTS(profile), main_agent.FIXED_PHRASES)
+        for sessions in args.sessions:
+            level = await run_level(main_agent, profile, sessions, args.ramp)
+            results.append(level)
+            print(
+                f"{level['sessions']:>8} {level['completed']:>9} {level['turns']:>6} "
+                f"{_ms(level['turn_p50'])} {_ms(level['turn_p95'])} {_ms(level['turn_p99'])} "
+                f"{level['cpu_per_session'] * 100:>8.2f}% {level['rss_mb_per_session']:>8.2f} "
+                f"{level['packets_per_session']:>9.1f} {level['bytes_per_session']:>9.0f} "
+                f"{_ms(level['loop_lag_p99'])} {_ms(level['loop_lag_max'])}",
+                flush=True,
+            )
+    finally:
+        await close_backend_client()
+        await runner.cleanup()
+    return results
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:>8.1f}" if seconds is not None else f"{'-':>8}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[10, 25, 50],
+                        help="concurrency levels to run, in order (default 10 25 50)")
+    parser.add_argument("--turns", type=int, default=5, help="user turns per session")
+    parser.add_argument("--ramp", type=float, default=1.0, help="seconds over which sessions of a level start")
+    parser.add_argument("--think-time", type=float, default=1.0, help="user pause before each turn")
+    parser.add_argument("--stt-latency", type=float, default=0.15, help="end of speech to final transcript")
+    parser.add_argument("--interim-interval", type=float, default=0.08, help="time between interim transcripts")
+    parser.add_argument("--data-encoding", choices=("msgpack", "json"), default="msgpack",
+                        help="data channel format the simulated clients advertise")
+    parser.add_argument("--llm-first-token", type=float, default=0.35)
+    parser.add_argument("--llm-token-interval", type=float, default=0.02)
+    parser.add_argument("--tts-first-byte", type=float, default=0.15)
+    parser.add_argument("--tts-speed", type=float, default=4.0, help="TTS output speed relative to real time")
+    parser.add_argument("--backend-latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.3, help="uniform jitter as a fraction of each latency")
+    parser.add_argument("--tool-ratio", type=float, default=0.3, help="share of turns that query the knowledge base")
+    parser.add_argument("--slo-p99", type=float, default=1.5,
+                        help="turn p99 (seconds) a level must stay within to count as sustained")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="results file from an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="allowed increase of p50/p99/CPU per session against the baseline (default 0.25)")
+    parser.add_argument("--max-p99", type=float, help="fail if any level's turn p99 exceeds this (seconds)")
+    parser.add_argument("--max-loop-lag", type=float, help="fail if any level's loop lag p99 exceeds this (seconds)")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    print(f"{'sessions':>8} {'completed':>9} {'turns':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'cpu/sess':>9} {'MB/sess':>8} {'pkts/sess':>9} {'B/sess':>9} {'lag p99':>8} {'lag max':>8}")
+    levels = asyncio.run(run(args))
+    sustained = max(
+        (level["sessions"] for level in levels
+         if not level["failed"] and level["turn_p99"] is not None and level["turn_p99"] <= args.slo_p99),
+        default=0,
+    )
+    print(f"\nSustained: {sustained} concurrent sessions within a {args.slo_p99:.2f}s turn p99")
+
+    report = {"sustained": sustained, "slo_p99": args.slo_p99, "levels": levels}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    failures = check_thresholds(levels, args, baseline)
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
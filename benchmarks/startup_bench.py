@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""Startup benchmark for the agent entry points.
+
+Every measurement runs in a fresh interpreter so module caches don't carry over:
+
+- import: seconds to import the entry module (`main`, `run`, `main_agent`)
+- ready: seconds from process start until the entry point can do work. For the FastAPI
+  apps this is the first successful `GET /health`. For `main_agent` it is the end of
+  `warm_worker()` (provider clients created, fixed phrases rendered).
+
+Usage:
+    python benchmarks/startup_bench.py --runs 5 --json startup.json
+    python benchmarks/startup_bench.py --baseline startup.json --max-regression 0.25
+    python benchmarks/startup_bench.py --targets main_agent --importtime 15
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TARGETS = ("main", "run", "main_agent")
+HTTP_TARGETS = ("main", "run")
+
+IMPORT_SNIPPET = """
+import time
+started = time.perf_counter()
+import {module}
+print(time.perf_counter() - started)
+"""
+
+SERVE_SNIPPET = """
+import uvicorn
+import {module} as target
+uvicorn.run(target.app, host="127.0.0.1", port={port}, log_level="warning")
+"""
+
+WARM_SNIPPET = """
+import asyncio
+import {module} as target
+asyncio.run(target.warm_worker())
+"""
+
+
+def _env():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = REPO_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    # Keep the benchmark in a single process and off the file system log
+    env.setdefault("WORKER_PROCESSES", "0")
+    env.setdefault("LOG_FILE", "")
+    return env
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import(module):
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET.format(module=module)],
+        cwd=REPO_ROOT, env=_env(), capture_output=True, text=True, timeout=300,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr.strip()}")
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def measure_ready(module, timeout=120.0):
+    if module in HTTP_TARGETS:
+        port = _free_port()
+        started = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, "-c", SERVE_SNIPPET.format(module=module, port=port)],
+            cwd=REPO_ROOT, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+        )
+        try:
+            while time.perf_counter() - started < timeout:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"{module} exited before becoming ready:\n{proc.stderr.read().strip()}")
+                try:
+                    with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as resp:
+                        if resp.status == 200:
+                            return time.perf_counter() - started
+                except OSError:
+                    time.sleep(0.01)
+            raise RuntimeError(f"{module} was not ready after {timeout:.0f}s")
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", WARM_SNIPPET.format(module=module)],
+        cwd=REPO_ROOT, env=_env(), capture_output=True, text=True, timeout=timeout,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"warming {module} failed:\n{result.stderr.strip()}")
+    return time.perf_counter() - started
+
+
+def import_profile(module, top):
+    """Slowest top-level packages by cumulative import time, from `python -X importtime`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, env=_env(), capture_output=True, text=True, timeout=300,
+    )
+    packages = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        # Entries nested one level under the target carry the cumulative time of their subtree
+        name = name[1:]
+        if name.startswith("  ") and not name.startswith("    "):
+            package = name.strip().split(".")[0]
+            packages[package] = packages.get(package, 0) + int(cumulative)
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "median": statistics.median(ordered),
+        "p95": ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))],
+        "min": ordered[0],
+        "runs": len(ordered),
+    }
+
+
+def check_regressions(results, baseline, max_regression):
+    failures = []
+    for target, phases in results.items():
+        for phase, summary in phases.items():
+            previous = baseline.get(target, {}).get(phase)
+            if not previous or "median" not in summary:
+                continue
+            limit = previous["median"] * (1 + max_regression)
+            if summary["median"] > limit:
+                failures.append(
+                    f"{target} {phase}: median {summary['median']:.3f}s > {limit:.3f}s "
+                    f"(baseline {previous['median']:.3f}s +{max_regression:.0%})"
+                )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", nargs="+", default=list(TARGETS), choices=TARGETS)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--skip-ready", action="store_true", help="only measure import time")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="results file from an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="allowed slowdown of the median against the baseline (default 0.25)")
+    parser.add_argument("--importtime", type=int, default=0, metavar="N",
+                        help="also list the N slowest top-level imports per target")
+    args = parser.parse_args()
+
+    results = {}
+    errors = []
+    for target in args.targets:
+        phases = {}
+        measurements = [("import", measure_import)]
+        if not args.skip_ready:
+            measurements.append(("ready", measure_ready))
+        for phase, measure in measurements:
+            try:
+                phases[phase] = summarize([measure(target) for _ in range(args.runs)])
+            except Exception as e:
+                errors.append(f"{target} {phase}: {e}")
+                phases[phase] = {"error": str(e).splitlines()[-1]}
+        results[target] = phases
+
+    print(f"{'target':<12} {'phase':<7} {'median':>9} {'p95':>9} {'min':>9}")
+    for target, phases in results.items():
+        for phase, summary in phases.items():
+            if "error" in summary:
+                print(f"{target:<12} {phase:<7} error: {summary['error']}")
+            else:
+                print(f"{target:<12} {phase:<7} {summary['median']:>8.3f}s {summary['p95']:>8.3f}s {summary['min']:>8.3f}s")
+
+    if args.importtime:
+        for target in args.targets:
+            print(f"\nSlowest imports for {target}:")
+            for name, micros in import_profile(target, args.importtime):
+                print(f"  {name:<30} {micros / 1000:>9.1f} ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    failed = bool(errors)
+    for error in errors:
+        print(f"\nERROR {error}", file=sys.stderr)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = check_regressions(results, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        failed = failed or bool(regressions)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
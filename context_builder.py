@@ -0,0 +1,135 @@
+import os
+import re
+import logging
+from datetime import datetime, timezone
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+MEMORY_CONTEXT_TOKEN_BUDGET = int(os.getenv("MEMORY_CONTEXT_TOKEN_BUDGET", "1500"))
+MEMORY_ITEM_MAX_TOKENS = int(os.getenv("MEMORY_ITEM_MAX_TOKENS", "200"))
+# "recent" keeps the newest items, "relevant" keeps the highest scored items
+MEMORY_CONTEXT_POLICY = os.getenv("MEMORY_CONTEXT_POLICY", "recent")
+TOKENIZER_MODEL = os.getenv("TOKENIZER_MODEL", "gpt-4")
+
+# Approximate per-message overhead of the chat format, in tokens
+MESSAGE_OVERHEAD_TOKENS = 4
+MEMORY_HEADER = "Conversation history with this user, oldest first. Use it to provide continuity:"
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    # Loaded on first use: building the encoding reads (and may download) the BPE ranks
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model(TOKENIZER_MODEL)
+    except Exception:  # tiktoken is optional
+        return None
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    """Token count for `text`; uses tiktoken when installed, otherwise ~4 characters per token."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return max(1, (len(text) + 3) // 4)
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = _get_encoding()
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text)[:max_tokens]) + "..."
+    return text[:max_tokens * 4] + "..."
+
+
+def _item_time(item):
+    """Sort key `(has_time, epoch seconds)`; accepts epoch numbers (s or ms) and ISO 8601 strings."""
+    value = item.get("timestamp") or item.get("createdAt")
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            try:
+                parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+            except ValueError:
+                return (False, 0.0)
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=timezone.utc)
+            return (True, parsed.timestamp())
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        # Epoch milliseconds are past year 5000 as seconds
+        return (True, value / 1000 if value > 1e11 else float(value))
+    return (False, 0.0)
+
+
+def _item_score(item):
+    try:
+        return float(item.get("score", item.get("relevance", 0)))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def build_memory_block(memory_context, budget=MEMORY_CONTEXT_TOKEN_BUDGET, policy=MEMORY_CONTEXT_POLICY):
+    """Dedupe memory items and merge them into one system message within a token budget.
+
+    Returns `(text, stats)`; `text` is None when there is nothing to add.
+    """
+    items = [
+        item for item in memory_context or []
+        if isinstance(item, dict) and item.get("content") and item.get("role")
+    ]
+    # Tokens the previous one-message-per-item format would have used
+    original_tokens = sum(
+        count_tokens(f"Previous conversation: {item['role']}: {item['content']}") + MESSAGE_OVERHEAD_TOKENS
+        for item in items
+    )
+
+    if any(_item_time(item)[0] for item in items):
+        items.sort(key=_item_time)
+
+    unique = []
+    seen = set()
+    for item in items:
+        key = (item["role"], _SPACE_RE.sub(" ", str(item["content"])).strip().lower())
+        if key in seen:
+            continue
+        seen.add(key)
+        unique.append(item)
+
+    if policy == "relevant":
+        candidates = sorted(range(len(unique)), key=lambda i: _item_score(unique[i]), reverse=True)
+    else:
+        candidates = range(len(unique) - 1, -1, -1)
+
+    used = count_tokens(MEMORY_HEADER) + MESSAGE_OVERHEAD_TOKENS
+    kept = {}
+    for i in candidates:
+        line = f"{unique[i]['role']}: {_truncate(str(unique[i]['content']).strip(), MEMORY_ITEM_MAX_TOKENS)}"
+        tokens = count_tokens(line) + 1
+        if used + tokens > budget:
+            if policy != "relevant":
+                break
+            continue
+        kept[i] = line
+        used += tokens
+
+    stats = {
+        "items": len(items),
+        "duplicates": len(items) - len(unique),
+        "kept": len(kept),
+        "original_tokens": original_tokens,
+        "tokens": used if kept else 0,
+    }
+    stats["tokens_saved"] = original_tokens - stats["tokens"]
+    if not kept:
+        return None, stats
+    # Keep chronological order in the prompt regardless of selection policy
+    lines = [kept[i] for i in sorted(kept)]
+    return MEMORY_HEADER + "\n" + "\n".join(lines), stats
@@ -0,0 +1,270 @@
+import asyncio
+import json
+import os
+import logging
+
+from turn_metrics import metrics
+
+try:
+    import msgpack
+except ImportError:
+    # Without msgpack every client gets the JSON format
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# "msgpack", "json", or "auto" (msgpack for clients that advertise it, JSON for everyone else)
+DATA_CHANNEL_ENCODING = os.getenv("DATA_CHANNEL_ENCODING", "auto")
+# Interim transcripts within this window are coalesced into the latest one
+DATA_CHANNEL_COALESCE_MS = int(os.getenv("DATA_CHANNEL_COALESCE_MS", "150"))
+# Small status messages within this window go out together as one packet
+DATA_CHANNEL_BATCH_MS = int(os.getenv("DATA_CHANNEL_BATCH_MS", "40"))
+# Encoded messages larger than this are sent on their own
+DATA_CHANNEL_BATCH_MAX_BYTES = int(os.getenv("DATA_CHANNEL_BATCH_MAX_BYTES", "1024"))
+# Packets queued per room before senders wait for the transport
+DATA_CHANNEL_QUEUE_SIZE = int(os.getenv("DATA_CHANNEL_QUEUE_SIZE", "32"))
+# Batch JSON messages too; only for JSON clients that understand "batch" packets
+DATA_CHANNEL_JSON_BATCH = os.getenv("DATA_CHANNEL_JSON_BATCH", "false").lower() in ("1", "true", "yes")
+# Forward the user's transcripts (interim and final) to the client; off unless clients expect them
+DATA_CHANNEL_TRANSCRIPTS = os.getenv("DATA_CHANNEL_TRANSCRIPTS", "false").lower() in ("1", "true", "yes")
+
+# Message types delivered right away, ahead of any batching window
+URGENT_TYPES = {"error"}
+
+_stats = {
+    "channels": 0,
+    "messages": 0,
+    "packets": 0,
+    "bytes": 0,
+    "coalesced": 0,
+    "batched": 0,
+    "backpressure_waits": 0,
+    "send_errors": 0,
+}
+
+
+def resolve_encoding(requested=None) -> str:
+    """Pick the wire format for a client given what it advertised (e.g. job metadata `dataEncoding`)."""
+    encoding = DATA_CHANNEL_ENCODING
+    if encoding == "auto":
+        encoding = "msgpack" if str(requested or "").lower() == "msgpack" else "json"
+    if encoding == "msgpack" and msgpack is None:
+        logger.warning("msgpack is not installed; sending data channel messages as JSON")
+        encoding = "json"
+    return encoding
+
+
+def encode(message, encoding="json"):
+    """Serialize one message: bytes for msgpack, text for JSON as before."""
+    if encoding == "msgpack":
+        return msgpack.packb(message, use_bin_type=True)
+    return json.dumps(message, separators=(",", ":"))
+
+
+def decode(payload):
+    """Parse a packet in either format; batches are returned as their list of messages."""
+    if isinstance(payload, (bytes, bytearray, memoryview)):
+        data = bytes(payload)
+        if data[:1] in (b"{", b"["):
+            message = json.loads(data)
+        else:
+            message = msgpack.unpackb(data, raw=False)
+    else:
+        message = json.loads(payload)
+    if isinstance(message, dict) and message.get("type") == "batch":
+        return message["messages"]
+    return [message]
+
+
+class DataChannel:
+    """Per-room outbound data channel: coalesces, batches and queues messages for one transport.
+
+    `transport` is an async callable taking an encoded packet (`session.send_data`,
+    `local_participant.publish_data`). Interim transcripts replace the pending one from the
+    same speaker until `coalesce_ms` passes; small messages wait up to `batch_ms` and leave
+    together as one `{"type": "batch", "messages": [...]}` packet. Packets are sent in order
+    by one writer task from a bounded queue; when it is full, `send()` waits for the
+    transport (interim transcripts just keep coalescing).
+    """
+
+    def __init__(self, transport, encoding="json", coalesce_ms=DATA_CHANNEL_COALESCE_MS,
+                 batch_ms=DATA_CHANNEL_BATCH_MS, queue_size=DATA_CHANNEL_QUEUE_SIZE):
+        self.transport = transport
+        self.encoding = encoding
+        self.batching = encoding == "msgpack" or DATA_CHANNEL_JSON_BATCH
+        self.coalesce_delay = coalesce_ms / 1000
+        self.batch_delay = batch_ms / 1000
+        self.queue_size = max(1, queue_size)
+        # Messages waiting for their window: [message, encoded size]
+        self._pending = []
+        self._timer = None
+        self._deadline = None
+        self._queue = asyncio.Queue()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._writer = None
+        self._closed = False
+        self.messages = 0
+        self.packets = 0
+        self.bytes = 0
+        self.coalesced = 0
+        self.batched = 0
+        self.backpressure_waits = 0
+        _stats["channels"] += 1
+
+    async def send(self, message: dict):
+        """Queue a message; returns once it is accepted, not when it is delivered."""
+        if self._closed:
+            raise RuntimeError("data channel is closed")
+        self.messages += 1
+        _stats["messages"] += 1
+        if self._is_interim(message):
+            self._coalesce(message)
+            return
+        # Backpressure: wait for the writer rather than queueing without bound
+        if self._queue.qsize() >= self.queue_size:
+            self.backpressure_waits += 1
+            _stats["backpressure_waits"] += 1
+            while self._queue.qsize() >= self.queue_size:
+                self._space.clear()
+                await self._space.wait()
+        if self._is_final(message):
+            self._drop_interim(message)
+        size = len(encode(message, self.encoding)) if self.batching else DATA_CHANNEL_BATCH_MAX_BYTES + 1
+        if message.get("type") in URGENT_TYPES or size > DATA_CHANNEL_BATCH_MAX_BYTES:
+            self._pending.append([message, size])
+            self._flush_pending()
+            return
+        self._pending.append([message, size])
+        self._schedule(self.batch_delay)
+
+    async def flush(self):
+        """Send everything pending now and wait until the transport has taken it."""
+        self._flush_pending()
+        await self._queue.join()
+
+    async def close(self):
+        """Flush and stop the writer; messages sent afterwards raise."""
+        if self._closed:
+            return
+        try:
+            await self.flush()
+        finally:
+            self._closed = True
+            if self._writer is not None:
+                self._writer.cancel()
+            logger.debug(f"Data channel closed: {self.stats()}")
+
+    def stats(self) -> dict:
+        return {
+            "encoding": self.encoding,
+            "messages": self.messages,
+            "packets": self.packets,
+            "bytes": self.bytes,
+            "coalesced": self.coalesced,
+            "batched": self.batched,
+            "backpressure_waits": self.backpressure_waits,
+            "queued": self._queue.qsize(),
+        }
+
+    @staticmethod
+    def _is_interim(message):
+        return message.get("type") == "user_transcript" and not message.get("final", True)
+
+    @staticmethod
+    def _is_final(message):
+        return message.get("type") == "user_transcript" and message.get("final", True)
+
+    def _coalesce(self, message):
+        for entry in self._pending:
+            if self._is_interim(entry[0]) and entry[0].get("participant") == message.get("participant"):
+                entry[0] = message
+                if self.batching:
+                    entry[1] = len(encode(message, self.encoding))
+                self.coalesced += 1
+                _stats["coalesced"] += 1
+                return
+        self._pending.append([message, len(encode(message, self.encoding)) if self.batching else 0])
+        self._schedule(self.coalesce_delay)
+
+    def _drop_interim(self, message):
+        """A final transcript supersedes the pending interim from the same speaker."""
+        for i, entry in enumerate(self._pending):
+            if self._is_interim(entry[0]) and entry[0].get("participant") == message.get("participant"):
+                del self._pending[i]
+                self.coalesced += 1
+                _stats["coalesced"] += 1
+                return
+
+    def _schedule(self, delay):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + delay
+        if self._timer is not None and self._deadline <= deadline:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._deadline = deadline
+        self._timer = loop.call_later(delay, self._flush_pending)
+
+    def _flush_pending(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        if not self.batching:
+            for message, _ in pending:
+                self._enqueue(encode(message, self.encoding))
+            return
+        batch = []
+        batch_bytes = 0
+        for message, size in pending:
+            if batch and batch_bytes + size > DATA_CHANNEL_BATCH_MAX_BYTES:
+                self._enqueue_batch(batch)
+                batch, batch_bytes = [], 0
+            batch.append(message)
+            batch_bytes += size
+        self._enqueue_batch(batch)
+
+    def _enqueue_batch(self, batch):
+        if len(batch) == 1:
+            self._enqueue(encode(batch[0], self.encoding))
+            return
+        self.batched += len(batch)
+        _stats["batched"] += len(batch)
+        self._enqueue(encode({"type": "batch", "messages": batch}, self.encoding))
+
+    def _enqueue(self, packet):
+        self._queue.put_nowait(packet)
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write())
+
+    async def _write(self):
+        while True:
+            packet = await self._queue.get()
+            size = len(packet) if isinstance(packet, bytes) else len(packet.encode())
+            try:
+                await self.transport(packet)
+                self.packets += 1
+                self.bytes += size
+                _stats["packets"] += 1
+                _stats["bytes"] += size
+                metrics.inc("data_channel_packets_total", help_text="Data channel packets sent", encoding=self.encoding)
+                metrics.inc("data_channel_bytes_total", size, "Data channel payload bytes sent", encoding=self.encoding)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                _stats["send_errors"] += 1
+                logger.warning(f"Data channel send failed: {e}")
+            finally:
+                self._queue.task_done()
+                if self._queue.qsize() < self.queue_size:
+                    self._space.set()
+
+
+def stats() -> dict:
+    return {
+        **_stats,
+        "messages_per_packet": round(_stats["messages"] / _stats["packets"], 3) if _stats["packets"] else 0.0,
+    }
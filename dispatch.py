@@ -0,0 +1,341 @@
+import asyncio
+import os
+import socket
+import time
+import logging
+from collections import OrderedDict, deque
+
+from turn_metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Requests allowed to wait for capacity, in total and per tenant
+DISPATCH_MAX_QUEUE = int(os.getenv("DISPATCH_MAX_QUEUE", "500"))
+DISPATCH_MAX_QUEUE_PER_TENANT = int(os.getenv("DISPATCH_MAX_QUEUE_PER_TENANT", "50"))
+# Longest a request waits for capacity before it is answered with 429
+DISPATCH_MAX_WAIT = float(os.getenv("DISPATCH_MAX_WAIT", "5"))
+# Workers without a heartbeat for this long are not given new sessions and are forgotten
+DISPATCH_HEARTBEAT_TTL = float(os.getenv("DISPATCH_HEARTBEAT_TTL", "15"))
+# Most workers registered at once; heartbeats from further new worker ids are refused
+DISPATCH_MAX_WORKERS = int(os.getenv("DISPATCH_MAX_WORKERS", "256"))
+# A worker counts as full at this CPU fraction or event-loop lag (seconds)
+DISPATCH_MAX_CPU = float(os.getenv("DISPATCH_MAX_CPU", "0.85"))
+DISPATCH_MAX_LOOP_LAG = float(os.getenv("DISPATCH_MAX_LOOP_LAG", "0.2"))
+DISPATCH_RETRY_AFTER = float(os.getenv("DISPATCH_RETRY_AFTER", "2"))
+
+# Worker side: where to send heartbeats (the dispatcher's base URL) and how often
+DISPATCH_URL = os.getenv("DISPATCH_URL")
+DISPATCH_API_KEY = os.getenv("DISPATCH_API_KEY")
+DISPATCH_HEARTBEAT_INTERVAL = float(os.getenv("DISPATCH_HEARTBEAT_INTERVAL", "2"))
+
+
+class DispatchRejected(Exception):
+    """The fleet is saturated; the caller should retry after `retry_after` seconds."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class WorkerState:
+    __slots__ = ("worker_id", "capacity", "active_sessions", "cpu", "loop_lag", "last_heartbeat", "placed")
+
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.capacity = 0
+        self.active_sessions = 0
+        self.cpu = 0.0
+        self.loop_lag = 0.0
+        self.last_heartbeat = 0.0
+        self.placed = 0
+
+    def load(self) -> float:
+        """Fraction of the worker's headroom in use; 1.0 or more means full."""
+        if self.capacity <= 0:
+            return 1.0
+        return max(
+            self.active_sessions / self.capacity,
+            self.cpu / DISPATCH_MAX_CPU,
+            self.loop_lag / DISPATCH_MAX_LOOP_LAG,
+        )
+
+    def to_dict(self, now) -> dict:
+        return {
+            "worker_id": self.worker_id,
+            "capacity": self.capacity,
+            "active_sessions": self.active_sessions,
+            "cpu": self.cpu,
+            "loop_lag": self.loop_lag,
+            "load": round(self.load(), 3),
+            "heartbeat_age": round(now - self.last_heartbeat, 3),
+            "placed": self.placed,
+        }
+
+
+class _Waiter:
+    __slots__ = ("tenant", "future", "enqueued_at")
+
+    def __init__(self, tenant, future):
+        self.tenant = tenant
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class Dispatcher:
+    """Admits session requests and places them on the least loaded agent worker.
+
+    Workers report capacity, active sessions, CPU and event-loop lag via `heartbeat()`.
+    When no worker has headroom, requests wait in per-tenant queues that are served
+    round-robin, so one tenant's burst can't starve the others. Requests that would
+    overflow the queue, or that wait longer than `max_wait`, are rejected with a
+    Retry-After hint instead of being pushed onto saturated workers.
+
+    Admission control only starts once a worker has sent a heartbeat; until then every
+    request is admitted right away without a worker. Workers silent for `heartbeat_ttl`
+    are dropped, and at most `max_workers` can be registered at once. The worker id is
+    advisory: LiveKit still assigns the job to a worker.
+    """
+
+    def __init__(self, max_queue=DISPATCH_MAX_QUEUE, max_queue_per_tenant=DISPATCH_MAX_QUEUE_PER_TENANT,
+                 max_wait=DISPATCH_MAX_WAIT, heartbeat_ttl=DISPATCH_HEARTBEAT_TTL,
+                 max_workers=DISPATCH_MAX_WORKERS):
+        self.max_queue = max_queue
+        self.max_queue_per_tenant = max_queue_per_tenant
+        self.max_wait = max_wait
+        self.heartbeat_ttl = heartbeat_ttl
+        self.max_workers = max_workers
+        self.workers = {}
+        # Set by the first heartbeat; stays set when every worker later goes stale
+        self.managed = False
+        self._queues = OrderedDict()
+        self.queued = 0
+
+        self.placed = 0
+        self.unmanaged = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def heartbeat(self, worker_id, capacity, active_sessions, cpu=0.0, loop_lag=0.0):
+        """Record a worker's load; raises ValueError for a new worker when `max_workers` are registered."""
+        self._prune()
+        worker = self.workers.get(worker_id)
+        if worker is None:
+            if len(self.workers) >= self.max_workers:
+                raise ValueError(f"too many workers registered ({self.max_workers})")
+            worker = self.workers[worker_id] = WorkerState(worker_id)
+            self.managed = True
+            logger.info(f"Agent worker {worker_id} registered with capacity {capacity}")
+        worker.capacity = int(capacity)
+        worker.active_sessions = int(active_sessions)
+        worker.cpu = float(cpu)
+        worker.loop_lag = float(loop_lag)
+        worker.last_heartbeat = time.monotonic()
+        self._drain()
+
+    def _prune(self):
+        cutoff = time.monotonic() - self.heartbeat_ttl
+        for worker_id in [w.worker_id for w in self.workers.values() if w.last_heartbeat < cutoff]:
+            del self.workers[worker_id]
+            logger.info(f"Agent worker {worker_id} dropped after no heartbeat for {self.heartbeat_ttl}s")
+
+    def _live_workers(self):
+        cutoff = time.monotonic() - self.heartbeat_ttl
+        return [worker for worker in self.workers.values() if worker.last_heartbeat >= cutoff]
+
+    def _pick_worker(self):
+        candidates = [worker for worker in self._live_workers() if worker.load() < 1.0]
+        if not candidates:
+            return None
+        return min(candidates, key=WorkerState.load)
+
+    def _place(self, worker):
+        # Count the session now; the worker's next heartbeat replaces the estimate
+        worker.active_sessions += 1
+        worker.placed += 1
+        self.placed += 1
+        return worker.worker_id
+
+    def retry_after(self) -> float:
+        """Back-off hint that grows with the backlog relative to fleet capacity."""
+        capacity = sum(worker.capacity for worker in self._live_workers())
+        return min(60.0, DISPATCH_RETRY_AFTER * (1 + self.queued / max(1, capacity)))
+
+    def _reject(self, tenant, reason, started):
+        self.rejected += 1
+        metrics.inc("dispatch_requests", help_text="Dispatch requests by outcome", result="rejected")
+        metrics.observe("dispatch_latency_seconds", time.perf_counter() - started, "Time to answer a dispatch request")
+        logger.warning(f"Rejected dispatch for tenant {tenant}: {reason}")
+        raise DispatchRejected(reason, self.retry_after())
+
+    async def dispatch(self, tenant="default"):
+        """Reserve a slot for a new session; returns the chosen worker id or raises DispatchRejected.
+
+        Returns None without queueing while no worker has ever registered.
+        """
+        started = time.perf_counter()
+        if not self.managed:
+            self.unmanaged += 1
+            metrics.inc("dispatch_requests", help_text="Dispatch requests by outcome", result="unmanaged")
+            metrics.observe("dispatch_latency_seconds", time.perf_counter() - started, "Time to answer a dispatch request")
+            return None
+        worker = self._pick_worker() if not self.queued else None
+        if worker is not None:
+            worker_id = self._place(worker)
+            metrics.inc("dispatch_requests", help_text="Dispatch requests by outcome", result="placed")
+            metrics.observe("dispatch_queue_wait_seconds", 0.0, "Time a dispatch request waited for capacity")
+            metrics.observe("dispatch_latency_seconds", time.perf_counter() - started, "Time to answer a dispatch request")
+            return worker_id
+
+        queue = self._queues.get(tenant)
+        if self.queued >= self.max_queue:
+            self._reject(tenant, "dispatch queue full", started)
+        if queue is not None and len(queue) >= self.max_queue_per_tenant:
+            self._reject(tenant, "tenant queue full", started)
+
+        waiter = _Waiter(tenant, asyncio.get_running_loop().create_future())
+        self._queues.setdefault(tenant, deque()).append(waiter)
+        self.queued += 1
+        # Capacity may have freed up between the check above and now
+        self._drain()
+        try:
+            worker_id = await asyncio.wait_for(asyncio.shield(waiter.future), self.max_wait)
+        except asyncio.TimeoutError:
+            self._remove(waiter)
+            self.timed_out += 1
+            metrics.inc("dispatch_requests", help_text="Dispatch requests by outcome", result="timeout")
+            raise DispatchRejected("no agent capacity available", self.retry_after())
+        except asyncio.CancelledError:
+            self._remove(waiter)
+            raise
+        metrics.inc("dispatch_requests", help_text="Dispatch requests by outcome", result="placed")
+        metrics.observe("dispatch_latency_seconds", time.perf_counter() - started, "Time to answer a dispatch request")
+        return worker_id
+
+    def _remove(self, waiter):
+        queue = self._queues.get(waiter.tenant)
+        if queue is None or waiter.future.done():
+            return
+        try:
+            queue.remove(waiter)
+            self.queued -= 1
+        except ValueError:
+            pass
+        if not queue:
+            del self._queues[waiter.tenant]
+
+    def _drain(self):
+        """Hand free capacity to queued requests, one tenant at a time in rotation."""
+        while self._queues:
+            worker = self._pick_worker()
+            if worker is None:
+                return
+            tenant, queue = next(iter(self._queues.items()))
+            waiter = queue.popleft()
+            self.queued -= 1
+            if queue:
+                self._queues.move_to_end(tenant)
+            else:
+                del self._queues[tenant]
+            if waiter.future.done():
+                continue
+            metrics.observe(
+                "dispatch_queue_wait_seconds", time.perf_counter() - waiter.enqueued_at,
+                "Time a dispatch request waited for capacity"
+            )
+            waiter.future.set_result(self._place(worker))
+
+    def snapshot(self) -> dict:
+        self._prune()
+        now = time.monotonic()
+        return {
+            "workers": [worker.to_dict(now) for worker in self.workers.values()],
+            "queued": self.queued,
+            "tenants_waiting": len(self._queues),
+        }
+
+    def stats(self) -> dict:
+        live = self._live_workers()
+        answered = self.placed + self.unmanaged + self.rejected + self.timed_out
+        return {
+            "workers": len(live),
+            "capacity": sum(worker.capacity for worker in live),
+            "active_sessions": sum(worker.active_sessions for worker in live),
+            "queued": self.queued,
+            "placed": self.placed,
+            "unmanaged": self.unmanaged,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "rejection_rate": (self.rejected + self.timed_out) / answered if answered else 0.0,
+        }
+
+
+_dispatcher = None
+
+
+def get_dispatcher() -> Dispatcher:
+    """Return the process-wide dispatcher, creating it on first use."""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = Dispatcher()
+    return _dispatcher
+
+
+def stats() -> dict:
+    return _dispatcher.stats() if _dispatcher is not None else {}
+
+
+class WorkerHeartbeat:
+    """Reports this worker's load to the dispatcher every `interval` seconds.
+
+    `active_sessions` is a callable returning the current session count. CPU is this
+    process's CPU time over wall time; loop lag is how late the heartbeat's own sleep wakes up.
+    """
+
+    def __init__(self, dispatch_url, capacity, active_sessions, worker_id=None,
+                 interval=DISPATCH_HEARTBEAT_INTERVAL, api_key=DISPATCH_API_KEY):
+        self.url = f"{dispatch_url.rstrip('/')}/agent/workers/heartbeat"
+        self.capacity = capacity
+        self.active_sessions = active_sessions
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.interval = interval
+        self.api_key = api_key
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        from backend_client import get_backend_client
+
+        headers = {"X-Api-Key": self.api_key} if self.api_key else {}
+        loop_lag = 0.0
+        last_wall, last_cpu = time.monotonic(), time.process_time()
+        while True:
+            now_wall, now_cpu = time.monotonic(), time.process_time()
+            cpu = (now_cpu - last_cpu) / max(1e-6, now_wall - last_wall)
+            last_wall, last_cpu = now_wall, now_cpu
+            payload = {
+                "workerId": self.worker_id,
+                "capacity": self.capacity,
+                "activeSessions": self.active_sessions(),
+                "cpu": round(cpu, 3),
+                "loopLag": round(loop_lag, 4),
+            }
+            try:
+                async with get_backend_client().post(self.url, json=payload, headers=headers) as resp:
+                    if resp.status >= 400:
+                        logger.warning(f"Dispatcher rejected heartbeat: {resp.status}")
+            except Exception as e:
+                logger.warning(f"Failed to send heartbeat to dispatcher: {e}")
+
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            loop_lag = max(0.0, time.monotonic() - expected)
@@ -0,0 +1,172 @@
+import asyncio
+import gzip
+import json
+import os
+import random
+import time
+import logging
+from collections import deque
+
+from backend_client import get_backend_client
+
+logger = logging.getLogger(__name__)
+
+AGENT_EVENT_BUFFER_SIZE = int(os.getenv("AGENT_EVENT_BUFFER_SIZE", "10000"))
+# 1 posts each event on its own as the bare event object (the webhook's original format);
+# larger sizes post {"events": [...]}, which the receiver must support
+AGENT_EVENT_BATCH_SIZE = int(os.getenv("AGENT_EVENT_BATCH_SIZE", "1"))
+AGENT_EVENT_FLUSH_INTERVAL = float(os.getenv("AGENT_EVENT_FLUSH_INTERVAL", "1.0"))
+AGENT_EVENT_GZIP = os.getenv("AGENT_EVENT_GZIP", "false").lower() in ("1", "true", "yes")
+AGENT_EVENT_MAX_RETRIES = int(os.getenv("AGENT_EVENT_MAX_RETRIES", "5"))
+# What to do when the buffer is full: "drop_oldest", "drop_newest" or "block"
+AGENT_EVENT_OVERFLOW_POLICY = os.getenv("AGENT_EVENT_OVERFLOW_POLICY", "drop_oldest")
+
+
+class EventOutbox:
+    """Bounded in-memory buffer that delivers agent events to the webhook in batches.
+
+    With `batch_size` 1 each event is posted as the bare event object, as before batching
+    existed; larger batches are posted as `{"events": [...]}`. Failed posts are retried with
+    jittered exponential backoff before being dropped.
+    """
+
+    def __init__(
+        self,
+        url,
+        buffer_size=AGENT_EVENT_BUFFER_SIZE,
+        batch_size=AGENT_EVENT_BATCH_SIZE,
+        flush_interval=AGENT_EVENT_FLUSH_INTERVAL,
+        use_gzip=AGENT_EVENT_GZIP,
+        max_retries=AGENT_EVENT_MAX_RETRIES,
+        overflow_policy=AGENT_EVENT_OVERFLOW_POLICY,
+    ):
+        if overflow_policy not in ("drop_oldest", "drop_newest", "block"):
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+        self.url = url
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.use_gzip = use_gzip
+        self.max_retries = max_retries
+        self.overflow_policy = overflow_policy
+
+        self._buffer = deque()
+        self._wakeup = None
+        self._space = None
+        self._task = None
+        self._closing = False
+
+        self.enqueued = 0
+        self.sent = 0
+        self.dropped = 0
+        self.failed_batches = 0
+        self.retries = 0
+        self.flushes = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+        self._total_flush_latency = 0.0
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._space = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def publish(self, event: dict):
+        """Queue an event. Only waits when the buffer is full and the policy is "block"."""
+        if self._closing:
+            self.dropped += 1
+            return
+        self._ensure_started()
+        while len(self._buffer) >= self.buffer_size:
+            if self.overflow_policy == "drop_newest":
+                self.dropped += 1
+                return
+            if self.overflow_policy == "drop_oldest":
+                self._buffer.popleft()
+                self.dropped += 1
+                break
+            self._space.clear()
+            await self._space.wait()
+        self._buffer.append(event)
+        self.enqueued += 1
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self._buffer:
+                await self._flush_batch()
+                if len(self._buffer) < self.batch_size and not self._closing:
+                    break
+            if self._closing and not self._buffer:
+                return
+
+    async def _flush_batch(self):
+        batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+        self._space.set()
+        body = json.dumps(batch[0] if self.batch_size == 1 else {"events": batch}).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self.use_gzip:
+            body = gzip.compress(body)
+            headers["Content-Encoding"] = "gzip"
+
+        started = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with get_backend_client().post(self.url, data=body, headers=headers) as resp:
+                    if resp.status < 400:
+                        self.sent += len(batch)
+                        break
+                    error = f"{resp.status} {await resp.text()}"
+                    retryable = resp.status >= 500 or resp.status == 429
+            except Exception as e:
+                error = str(e) or type(e).__name__
+                retryable = True
+            if not retryable or attempt == self.max_retries or self._closing and attempt >= 1:
+                self.failed_batches += 1
+                self.dropped += len(batch)
+                logger.error(f"Failed to send {len(batch)} agent events to webhook: {error}")
+                break
+            self.retries += 1
+            # Full jitter exponential backoff
+            await asyncio.sleep(random.uniform(0, min(30.0, 0.5 * 2 ** attempt)))
+
+        latency = time.perf_counter() - started
+        self.flushes += 1
+        self.last_flush_latency = latency
+        self.max_flush_latency = max(self.max_flush_latency, latency)
+        self._total_flush_latency += latency
+
+    async def close(self, timeout=10.0):
+        """Flush buffered events and stop the sender."""
+        self._closing = True
+        if self._task is None or self._task.done():
+            return
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            logger.warning(f"Dropped {len(self._buffer)} agent events on shutdown")
+            self.dropped += len(self._buffer)
+            self._buffer.clear()
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": len(self._buffer),
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "failed_batches": self.failed_batches,
+            "retries": self.retries,
+            "flushes": self.flushes,
+            "last_flush_latency": self.last_flush_latency,
+            "avg_flush_latency": self._total_flush_latency / self.flushes if self.flushes else 0.0,
+            "max_flush_latency": self.max_flush_latency,
+        }
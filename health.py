@@ -0,0 +1,125 @@
+import asyncio
+import os
+import time
+import logging
+
+import aiohttp
+
+from backend_client import get_backend_client
+
+logger = logging.getLogger(__name__)
+
+HEALTH_PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", "15"))
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "5"))
+# Cached probe results older than this are reported as stale
+HEALTH_STALE_AFTER = float(os.getenv("HEALTH_STALE_AFTER", "60"))
+# Minimum seconds between deep checks triggered through the API
+HEALTH_DEEP_MIN_INTERVAL = float(os.getenv("HEALTH_DEEP_MIN_INTERVAL", "10"))
+
+
+async def http_probe(url, headers=None, timeout=HEALTH_PROBE_TIMEOUT):
+    """Probe that passes when `url` answers with a 2xx status."""
+    async with get_backend_client().get(
+        url, headers=headers or {}, timeout=aiohttp.ClientTimeout(total=timeout)
+    ) as resp:
+        if resp.status >= 300:
+            raise RuntimeError(f"HTTP {resp.status}")
+
+
+def livekit_probe(livekit_url):
+    http_url = livekit_url.replace("wss://", "https://", 1).replace("ws://", "http://", 1)
+    return lambda: http_probe(f"{http_url}/.well-known/livekit/health")
+
+
+def openai_probe(api_key):
+    return lambda: http_probe("https://api.openai.com/v1/models", {"Authorization": f"Bearer {api_key}"})
+
+
+class HealthMonitor:
+    """Probes dependencies concurrently in the background and serves the results from memory.
+
+    `snapshot()` never does I/O, so health endpoints stay fast no matter how slow or
+    unreachable a dependency is. `deep_check()` probes on demand, at most once per
+    `deep_min_interval`; concurrent callers share the same run.
+    """
+
+    def __init__(self, probes, interval=HEALTH_PROBE_INTERVAL, timeout=HEALTH_PROBE_TIMEOUT,
+                 stale_after=HEALTH_STALE_AFTER, deep_min_interval=HEALTH_DEEP_MIN_INTERVAL):
+        self.probes = dict(probes)
+        self.interval = interval
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self.deep_min_interval = deep_min_interval
+        self.results = {name: {"ok": False, "checked_at": None, "latency": None, "error": "not checked yet"}
+                        for name in self.probes}
+        self._task = None
+        self._deep_task = None
+        self._last_deep_at = 0.0
+        self.runs = 0
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        for task in (self._task, self._deep_task):
+            if task is not None:
+                task.cancel()
+        await asyncio.gather(*(t for t in (self._task, self._deep_task) if t is not None), return_exceptions=True)
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await self.probe_all()
+            await asyncio.sleep(self.interval)
+
+    async def _probe(self, name, probe):
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(probe(), self.timeout)
+            error = None
+        except asyncio.TimeoutError:
+            error = f"timed out after {self.timeout:g}s"
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        if error:
+            logger.debug(f"Health probe {name} failed: {error}")
+        self.results[name] = {
+            "ok": error is None,
+            "checked_at": time.time(),
+            "latency": round(time.perf_counter() - started, 4),
+            "error": error,
+        }
+
+    async def probe_all(self):
+        """Run every probe concurrently and update the cached results."""
+        await asyncio.gather(*(self._probe(name, probe) for name, probe in self.probes.items()))
+        self.runs += 1
+
+    def snapshot(self) -> dict:
+        """Cached results with their age; no I/O."""
+        now = time.time()
+        checks = {}
+        for name, result in self.results.items():
+            checked_at = result["checked_at"]
+            age = now - checked_at if checked_at else None
+            checks[name] = {**result, "age": round(age, 3) if age is not None else None,
+                            "stale": age is None or age > self.stale_after}
+        healthy = all(check["ok"] and not check["stale"] for check in checks.values())
+        return {"status": "healthy" if healthy else "degraded", "checks": checks}
+
+    async def deep_check(self):
+        """Probe now; returns `(snapshot, retry_after)`, with snapshot None while rate limited.
+
+        A probe already in flight is joined rather than started again.
+        """
+        if self._deep_task is not None and not self._deep_task.done():
+            await asyncio.shield(self._deep_task)
+            return self.snapshot(), 0.0
+        wait = self._last_deep_at + self.deep_min_interval - time.monotonic()
+        if wait > 0:
+            return None, wait
+        self._last_deep_at = time.monotonic()
+        self._deep_task = asyncio.create_task(self.probe_all())
+        await asyncio.shield(self._deep_task)
+        return self.snapshot(), 0.0
@@ -0,0 +1,157 @@
+import os
+import re
+import time
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+KB_CACHE_MAX_ENTRIES = int(os.getenv("KB_CACHE_MAX_ENTRIES", "5000"))
+KB_CACHE_MAX_BYTES = int(os.getenv("KB_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+KB_CACHE_TTL = float(os.getenv("KB_CACHE_TTL", "300"))
+KB_CACHE_NEGATIVE_TTL = float(os.getenv("KB_CACHE_NEGATIVE_TTL", "30"))
+# Per knowledge base type TTLs, e.g. "personal=120,team=300,organization=900"
+KB_CACHE_TTLS = os.getenv("KB_CACHE_TTLS", "personal=120,team=300,organization=900")
+
+_WORD_RE = re.compile(r"[^\w\s]+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def parse_ttls(spec: str) -> dict:
+    """Parse a "kb_type=seconds,..." string into a dict."""
+    ttls = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        kb_type, _, seconds = item.partition("=")
+        try:
+            ttls[kb_type.strip()] = float(seconds)
+        except ValueError:
+            logger.warning(f"Ignoring invalid KB cache TTL entry: {item!r}")
+    return ttls
+
+
+def normalize_query(text: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace so near-identical queries share a key."""
+    text = _WORD_RE.sub(" ", (text or "").lower())
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "org_id", "negative", "size")
+
+    def __init__(self, value, expires_at, org_id, negative):
+        self.value = value
+        self.expires_at = expires_at
+        self.org_id = org_id
+        self.negative = negative
+        self.size = len(value)
+
+
+class KnowledgeBaseCache:
+    """In-memory LRU cache of knowledge base search results with per-type TTLs."""
+
+    def __init__(
+        self,
+        max_entries=KB_CACHE_MAX_ENTRIES,
+        max_bytes=KB_CACHE_MAX_BYTES,
+        default_ttl=KB_CACHE_TTL,
+        negative_ttl=KB_CACHE_NEGATIVE_TTL,
+        ttls=None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self.ttls = parse_ttls(KB_CACHE_TTLS) if ttls is None else dict(ttls)
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(user_id, kb_type, query_text) -> tuple:
+        return (user_id or "", kb_type or "", normalize_query(query_text))
+
+    def get(self, user_id, kb_type, query_text):
+        """Return the cached result string, or None on a miss."""
+        key = self.make_key(user_id, kb_type, query_text)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        if entry.negative:
+            self.negative_hits += 1
+        return entry.value
+
+    def put(self, user_id, kb_type, query_text, value: str, negative=False, org_id=None):
+        """Store a result; negative entries ("No results found") use the short negative TTL."""
+        if negative:
+            ttl = self.negative_ttl
+        else:
+            ttl = self.ttls.get(kb_type or "", self.default_ttl)
+        if ttl <= 0 or len(value) > self.max_bytes:
+            return
+        key = self.make_key(user_id, kb_type, query_text)
+        if key in self._entries:
+            self._remove(key)
+        entry = _Entry(value, time.monotonic() + ttl, org_id, negative)
+        self._entries[key] = entry
+        self._bytes += entry.size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate_user(self, user_id) -> int:
+        """Drop every entry for a user, e.g. after they upload or delete documents."""
+        return self._invalidate(lambda key, entry: key[0] == (user_id or ""))
+
+    def invalidate_org(self, org_id) -> int:
+        """Drop every entry tagged with an organization, e.g. after a shared KB changes."""
+        return self._invalidate(lambda key, entry: entry.org_id == org_id)
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def _invalidate(self, predicate) -> int:
+        keys = [key for key, entry in self._entries.items() if predicate(key, entry)]
+        for key in keys:
+            self._remove(key)
+        self.invalidations += len(keys)
+        return len(keys)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+# Shared by all sessions in the worker process
+kb_cache = KnowledgeBaseCache()
@@ -0,0 +1,195 @@
+import asyncio
+import json
+import os
+import time
+import logging
+from collections import OrderedDict
+
+from kb_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+# Off by default: every prefetch is a backend search, and unused results still fill kb_cache
+KB_PREFETCH_ENABLED = os.getenv("KB_PREFETCH_ENABLED", "false").lower() in ("1", "true", "yes")
+KB_PREFETCH_MIN_WORDS = int(os.getenv("KB_PREFETCH_MIN_WORDS", "3"))
+KB_PREFETCH_DEBOUNCE = float(os.getenv("KB_PREFETCH_DEBOUNCE", "0.25"))
+KB_PREFETCH_MAX_INFLIGHT = int(os.getenv("KB_PREFETCH_MAX_INFLIGHT", "2"))
+KB_PREFETCH_MAX_AGE = float(os.getenv("KB_PREFETCH_MAX_AGE", "20"))
+# Share of the transcript's keywords the tool query must cover (it must contain none that aren't heard)
+KB_PREFETCH_MIN_COVERAGE = float(os.getenv("KB_PREFETCH_MIN_COVERAGE", "0.6"))
+
+_STOPWORDS = frozenset(
+    "a about an and any are can could did do does for from get give have how i im in is it "
+    "know let me my of on or our please show tell that the there this to us was we what whats "
+    "when where which who why with you your".split()
+)
+
+
+def keywords(text: str) -> frozenset:
+    """Content words of a query, with simple plurals folded ("policies" and "policy" match)."""
+    words = set()
+    for word in normalize_query(text).split():
+        if word in _STOPWORDS:
+            continue
+        if len(word) > 4 and word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.add(word)
+    return frozenset(words)
+
+
+def _is_error(result) -> bool:
+    """`search()` reports failures as JSON with an "error" key rather than raising."""
+    try:
+        return "error" in json.loads(result)
+    except (TypeError, ValueError):
+        return True
+
+
+class _Prefetch:
+    __slots__ = ("query", "keywords", "task", "started_at", "claimed")
+
+    def __init__(self, query, task):
+        self.query = query
+        self.keywords = keywords(query)
+        self.task = task
+        self.started_at = time.monotonic()
+        self.claimed = False
+
+
+class KnowledgeBasePrefetcher:
+    """Speculatively runs knowledge base searches from interim transcripts for one session.
+
+    The LLM usually rewrites what the user said into a shorter search query, so a prefetch
+    is reused when every keyword of the tool query was heard in the transcript and those
+    keywords make up at least `min_coverage` of the transcript's own. It must also be for
+    the same user and organization. Failed prefetches are never reused.
+    """
+
+    def __init__(
+        self,
+        kb_tool,
+        user_id=None,
+        org_id=None,
+        min_words=KB_PREFETCH_MIN_WORDS,
+        debounce=KB_PREFETCH_DEBOUNCE,
+        max_inflight=KB_PREFETCH_MAX_INFLIGHT,
+        max_age=KB_PREFETCH_MAX_AGE,
+        min_coverage=KB_PREFETCH_MIN_COVERAGE,
+    ):
+        self.kb_tool = kb_tool
+        self.user_id = user_id
+        self.org_id = org_id
+        self.min_words = min_words
+        self.debounce = debounce
+        self.max_inflight = max_inflight
+        self.max_age = max_age
+        self.min_coverage = min_coverage
+        self._prefetches = OrderedDict()
+
+        self.started = 0
+        self.cancelled = 0
+        self.reused = 0
+        self.unused = 0
+
+    def on_transcript(self, text: str, is_final: bool = False):
+        """Feed an interim or final transcript; starts (or supersedes) a speculative search."""
+        query = normalize_query(text)
+        if len(query.split()) < self.min_words or query in self._prefetches:
+            return
+        self._expire()
+
+        # An interim transcript that extends an unfinished prefetch makes it stale
+        for old_query, prefetch in list(self._prefetches.items()):
+            if not prefetch.task.done() and query.startswith(old_query):
+                self._cancel(old_query)
+
+        delay = 0 if is_final else self.debounce
+        task = asyncio.create_task(self._run(text, delay))
+        self._prefetches[query] = _Prefetch(query, task)
+        self.started += 1
+
+        inflight = [q for q, p in self._prefetches.items() if not p.task.done()]
+        for old_query in inflight[:-self.max_inflight]:
+            self._cancel(old_query)
+
+    async def _run(self, text: str, delay: float) -> str:
+        if delay:
+            await asyncio.sleep(delay)
+        return await self.kb_tool.search(text, user_id=self.user_id, org_id=self.org_id)
+
+    async def claim(self, query_text: str, kb_type: str = None, user_id=None, org_id=None):
+        """Return the result of a prefetch matching this query, waiting for it if still in flight, or None."""
+        if kb_type or not self._prefetches:
+            # Prefetches search across all knowledge bases
+            return None
+        if (user_id, org_id) != (self.user_id, self.org_id):
+            # Prefetches ran for the session's user; results are scoped per user
+            return None
+        self._expire()
+        prefetch = self._match(query_text)
+        if prefetch is None:
+            return None
+
+        try:
+            result = await asyncio.shield(prefetch.task)
+        except asyncio.CancelledError:
+            if prefetch.task.cancelled():
+                return None
+            raise
+        except Exception as e:
+            logger.warning(f"Speculative knowledge base search failed: {e}")
+            return None
+        if _is_error(result):
+            # Let the tool retry instead of reusing a failure
+            self._prefetches.pop(prefetch.query, None)
+            return None
+        prefetch.claimed = True
+        self.reused += 1
+        logger.info(f"Reused speculative knowledge base search for query: '{query_text}'")
+        return result
+
+    def _match(self, query_text):
+        """The latest prefetch of this exact query, or else one whose transcript the query covers."""
+        exact = self._prefetches.get(normalize_query(query_text))
+        if exact is not None and not exact.task.cancelled():
+            return exact
+        wanted = keywords(query_text)
+        if not wanted:
+            return None
+        for prefetch in reversed(self._prefetches.values()):
+            if prefetch.task.cancelled() or not prefetch.keywords:
+                continue
+            if wanted <= prefetch.keywords and len(wanted) / len(prefetch.keywords) >= self.min_coverage:
+                return prefetch
+        return None
+
+    def _cancel(self, query):
+        prefetch = self._prefetches.pop(query)
+        if not prefetch.task.done():
+            prefetch.task.cancel()
+            self.cancelled += 1
+
+    def _expire(self):
+        now = time.monotonic()
+        for query, prefetch in list(self._prefetches.items()):
+            if now - prefetch.started_at > self.max_age:
+                if not prefetch.claimed and prefetch.task.done():
+                    self.unused += 1
+                self._cancel(query)
+
+    def cancel_all(self):
+        for query, prefetch in list(self._prefetches.items()):
+            if not prefetch.claimed and prefetch.task.done():
+                self.unused += 1
+            self._cancel(query)
+
+    def stats(self) -> dict:
+        return {
+            "started": self.started,
+            "reused": self.reused,
+            "cancelled": self.cancelled,
+            "unused": self.unused,
+            "tracked": len(self._prefetches),
+        }
@@ -0,0 +1,222 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+
+from turn_metrics import current_turns
+
+LOG_FILE = os.getenv("LOG_FILE", "agent.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_JSON = os.getenv("LOG_JSON", "false").lower() in ("1", "true", "yes")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+# Also roll the log file over after this many seconds (0 disables time-based rotation)
+LOG_ROTATE_INTERVAL = float(os.getenv("LOG_ROTATE_INTERVAL", str(24 * 60 * 60)))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Identical messages within this window are collapsed into a counted summary
+LOG_DEDUP_WINDOW = float(os.getenv("LOG_DEDUP_WINDOW", "60"))
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class SizeAndTimeRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """RotatingFileHandler that also rolls over once the file is older than `interval` seconds."""
+
+    def __init__(self, filename, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT,
+                 interval=LOG_ROTATE_INTERVAL, encoding="utf-8"):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding=encoding)
+        self.interval = interval
+        self._opened_at = time.time()
+
+    def shouldRollover(self, record):
+        if self.interval and time.time() - self._opened_at >= self.interval:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self._opened_at = time.time()
+
+
+class DuplicateCollapsingFilter(logging.Filter):
+    """Drops repeats of an identical warning, error or exception within a time window.
+
+    Records are compared by their formatted message, so the same template with different
+    arguments is never collapsed. INFO and DEBUG records without an exception always pass.
+    The next occurrence after the window carries a count of what was suppressed.
+    """
+
+    def __init__(self, window=LOG_DEDUP_WINDOW):
+        super().__init__()
+        self.window = window
+        self._seen = {}
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def filter(self, record):
+        if not self.window or (record.levelno < logging.WARNING and not record.exc_info):
+            return True
+        try:
+            message = record.getMessage()
+        except Exception:
+            return True
+        exc = record.exc_info[1] if record.exc_info else None
+        key = (record.name, record.levelno, message, type(exc).__name__ if exc else None, str(exc) if exc else None)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._seen.get(key)
+            if entry is not None and now - entry[0] < self.window:
+                entry[1] += 1
+                self.suppressed += 1
+                return False
+            suppressed = entry[1] if entry is not None else 0
+            self._seen[key] = [now, 0, record.name, record.levelno, message]
+            if len(self._seen) > 10000:
+                self._seen = {k: v for k, v in self._seen.items() if now - v[0] < self.window}
+        if suppressed:
+            record.msg = f"{message} [repeated {suppressed} more times in the last {self.window:.0f}s]"
+            record.args = None
+        return True
+
+    def pending_summaries(self):
+        """Summary records for repeats that have not been reported yet, e.g. at shutdown."""
+        records = []
+        with self._lock:
+            for entry in self._seen.values():
+                _, count, name, level, msg = entry
+                if count:
+                    records.append(logging.LogRecord(name, level, "", 0, f"{msg} [repeated {count} more times]", None, None))
+                    entry[1] = 0
+        return records
+
+
+class SessionContextFilter(logging.Filter):
+    """Attaches the current session and turn ids to records from the caller's context."""
+
+    def filter(self, record):
+        tracker = current_turns.get()
+        record.session_id = tracker.session_id if tracker is not None else None
+        record.turn_id = tracker.turn_id if tracker is not None else None
+        return True
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Compact one-object-per-line output."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "session_id", None):
+            entry["session_id"] = record.session_id
+            entry["turn_id"] = record.turn_id
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, separators=(",", ":"), default=str)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that never blocks the caller and measures its own overhead.
+
+    Formatting happens on the listener thread; records are dropped (and counted) when the
+    queue is full.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.records = 0
+        self.dropped = 0
+        self.enqueue_seconds = 0.0
+
+    def prepare(self, record):
+        # Resolve args now (they may be mutated later) but leave exception formatting to the listener
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def emit(self, record):
+        started = time.perf_counter()
+        try:
+            self.enqueue(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+        self.records += 1
+        self.enqueue_seconds += time.perf_counter() - started
+
+
+_queue_handler = None
+_dedup_filter = None
+_listener = None
+
+
+def configure_logging(log_file=LOG_FILE, level=LOG_LEVEL, use_json=LOG_JSON, force=False):
+    """Route all logging through a background thread with rotation and duplicate collapsing.
+
+    Pass `force=True` in a forked child: the listener thread inherited from the parent does
+    not exist there, so a new pipeline is set up (typically with its own log file).
+    """
+    global _queue_handler, _dedup_filter, _listener
+    if _listener is not None and not force:
+        return
+
+    formatter = JsonLinesFormatter() if use_json else logging.Formatter(TEXT_FORMAT)
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(SizeAndTimeRotatingFileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _queue_handler = NonBlockingQueueHandler(log_queue)
+    _dedup_filter = DuplicateCollapsingFilter()
+    _queue_handler.addFilter(_dedup_filter)
+    _queue_handler.addFilter(SessionContextFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        for record in _dedup_filter.pending_summaries():
+            _queue_handler.enqueue(record)
+        _listener.stop()
+        _listener = None
+
+
+def stats() -> dict:
+    if _queue_handler is None:
+        return {}
+    records = _queue_handler.records
+    return {
+        "records": records,
+        "dropped": _queue_handler.dropped,
+        "suppressed_duplicates": _dedup_filter.suppressed,
+        "queue_depth": _queue_handler.queue.qsize(),
+        "enqueue_seconds_total": _queue_handler.enqueue_seconds,
+        "enqueue_seconds_avg": _queue_handler.enqueue_seconds / records if records else 0.0,
+    }
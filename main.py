@@ -1,12 +1,24 @@
 from fastapi import FastAPI, Request, Response
+from fastapi.responses import PlainTextResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import os
-import json
+import hmac
+import math
+import uuid
 import uvicorn
+from datetime import datetime, timezone
+from turn_metrics import metrics
+from token_service import get_token_service, stats as token_stats
+from dispatch import get_dispatcher, DispatchRejected, DISPATCH_API_KEY, stats as dispatch_stats
 
 # Create FastAPI app
 app = FastAPI()
 
+# /agent/token requires this value in the X-Api-Key header; without it the endpoint is disabled
+TOKEN_ENDPOINT_API_KEY = os.getenv("TOKEN_ENDPOINT_API_KEY")
+metrics.register_collector("tokens", token_stats)
+metrics.register_collector("dispatch", dispatch_stats)
+
 # Configure CORS - read origins from environment or use defaults
 origins = os.getenv("CORS_ALLOW_ORIGIN", "https://app.isyncso.com").split(",")
 if origins == [""]:
@@ -30,37 +42,93 @@ app.add_middleware(
     expose_headers=["Content-Type", "Authorization"],
 )
 
+def api_key_error(request: Request, api_key, endpoint):
+    """Error response unless the caller presents `api_key` in X-Api-Key; fails closed when it isn't set."""
+    if not api_key:
+        return JSONResponse({"error": f"{endpoint} is not configured"}, status_code=503)
+    if not hmac.compare_digest(request.headers.get("X-Api-Key", ""), api_key):
+        return JSONResponse({"error": "Unauthorized"}, status_code=401)
+    return None
+
+def token_auth_error(request: Request):
+    return api_key_error(request, TOKEN_ENDPOINT_API_KEY, "Token endpoint")
+
+def worker_auth_error(request: Request):
+    return api_key_error(request, DISPATCH_API_KEY, "Worker endpoint")
+
 # Current health endpoint that's working
 @app.get("/health")
 async def health_check():
     print(f"Health check requested")
     return {"status": "ok"}
 
-# Add the missing agent/dispatch endpoint
+# Prometheus-style metrics for this process
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# Admit a session against agent worker capacity and return the room token.
+# Callers authenticate with TOKEN_ENDPOINT_API_KEY, so room and identity come from a trusted backend.
 @app.post("/agent/dispatch")
 async def agent_dispatch(request: Request):
-    print(f"POST /agent/dispatch received")
+    auth_error = token_auth_error(request)
+    if auth_error is not None:
+        return auth_error
     try:
-        # Get request body if any
         body = await request.json()
-        print(f"Request body: {json.dumps(body)}")
-    except Exception as e:
-        print(f"Error parsing request body: {str(e)}")
+    except Exception:
         body = {}
-    
-    # Simple mock response
+    tenant = str(body.get("tenantId") or body.get("orgId") or request.headers.get("X-Tenant-Id") or "default")
+    room = body.get("room") or f"room-{uuid.uuid4().hex[:12]}"
+    identity = body.get("identity") or body.get("userId") or f"user-{uuid.uuid4().hex[:8]}"
+
+    try:
+        worker_id = await get_dispatcher().dispatch(tenant)
+    except DispatchRejected as e:
+        return JSONResponse(
+            {"status": "error", "message": e.reason, "retry_after": round(e.retry_after, 1)},
+            status_code=429,
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
+    try:
+        token, _ = get_token_service().get_token(room, identity, name=body.get("name"))
+    except ValueError as e:
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=503)
     return {
         "status": "success",
         "message": "Agent dispatched successfully",
         "data": {
-            "agent_id": "mock-agent-123",
+            "agent_id": worker_id,
             "connection_info": {
-                "token": "mock-token-xyz",
-                "room": "mock-room-456"
+                "token": token,
+                "room": room,
             }
         }
     }
 
+# Agent workers report their load here; see dispatch.WorkerHeartbeat
+@app.post("/agent/workers/heartbeat")
+async def worker_heartbeat(request: Request):
+    auth_error = worker_auth_error(request)
+    if auth_error is not None:
+        return auth_error
+    try:
+        body = await request.json()
+        get_dispatcher().heartbeat(
+            body["workerId"], body["capacity"], body["activeSessions"],
+            cpu=body.get("cpu", 0.0), loop_lag=body.get("loopLag", 0.0),
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        return JSONResponse({"error": f"Invalid heartbeat: {e}"}, status_code=400)
+    return {"status": "ok"}
+
+@app.get("/agent/workers")
+async def list_workers(request: Request):
+    auth_error = worker_auth_error(request)
+    if auth_error is not None:
+        return auth_error
+    return get_dispatcher().snapshot()
+
 # Also handle OPTIONS requests explicitly for CORS preflight
 @app.options("/agent/dispatch")
 async def agent_dispatch_options():
@@ -80,11 +148,19 @@ async def agent_dispatch_options():
 
 # Add other needed endpoints here
 @app.get("/agent/token")
-async def agent_token():
-    print(f"GET /agent/token received")
+async def agent_token(request: Request, room: str, identity: str, name: str = None):
+    auth_error = token_auth_error(request)
+    if auth_error is not None:
+        return auth_error
+    try:
+        token, expires_at = get_token_service().get_token(room, identity, name=name)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=503)
     return {
-        "token": "mock-token-abc-123",
-        "expires_at": "2025-05-16T00:00:00Z"
+        "token": token,
+        "expires_at": datetime.fromtimestamp(expires_at, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "room": room,
+        "identity": identity,
     }
 
 if __name__ == "__main__":
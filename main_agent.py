@@ -1,42 +1,44 @@
 import asyncio
+import inspect
 import os
 import logging
 import json
 from dotenv import load_dotenv
-import requests
 import aiohttp
 from livekit.agents import (
     JobContext,
     AgentJobType,
     WorkerOptions,
-    Agent,
     AgentSession,
-    tts as lk_tts,
-    stt as lk_stt,
     llm as lk_llm,
     tools as lk_tools,
 )
 from livekit.agents.utils import AudioEncoding
-from livekit.agents.pipeline import llm_node, tts_node, stt_node
-from livekit.plugins import openai as openai_plugin
-from livekit.plugins import deepgram as deepgram_plugin
-from livekit.plugins import elevenlabs as elevenlabs_plugin
 import time
-from livekit import agents
-from livekit.plugins.openai import OpenAITTSPlugin, OpenAIASRPlugin, OpenAIChatCompletionPlugin
 import traceback
+from backend_client import get_backend_client, close_backend_client
+from kb_cache import kb_cache
+from kb_prefetch import KnowledgeBasePrefetcher, KB_PREFETCH_ENABLED
+from phrase_cache import phrase_cache, synthesized_frames
+from provider_pool import ProviderPool, SessionProviders
+from presence_service import get_presence_service, close_presence_service, PRESENCE_BACKEND
+from event_outbox import EventOutbox
+from context_builder import build_memory_block, count_tokens
+from speech_stream import SentenceStreamer
+from audio_frames import FrameConverter, AUDIO_OUTPUT_SAMPLE_RATE, AUDIO_OUTPUT_CHANNELS
+from vad_gate import GatedSTT, VAD_GATE_ENABLED, preload_vad, stats as vad_stats
+from data_channel import DataChannel, resolve_encoding, DATA_CHANNEL_TRANSCRIPTS, stats as data_channel_stats
+from tts_cache import TTS_CACHE_ENABLED, stats as tts_cache_stats
+from turn_metrics import metrics, TurnTracker, current_turns, tool_span
+from tool_executor import ToolExecutor
+from log_setup import configure_logging, stats as log_stats
+from dispatch import WorkerHeartbeat, DISPATCH_URL
+from worker_pool import WORKER_MAX_JOBS
 
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("agent.log"),
-        logging.StreamHandler()
-    ]
-)
+# Logging is configured by the entry points, not on import: the worker pool's fork server
+# preloads this module and must not start the log listener thread before forking children
 logger = logging.getLogger(__name__)
 
 # Environment variables
@@ -47,9 +49,15 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
 ELEVENLABS_VOICE_ID = os.getenv("ELEVENLABS_VOICE_ID", "EXAVITQu4vr4xnSDxMaL")  # Default: "Josh"
+ELEVENLABS_MODEL_ID = os.getenv("ELEVENLABS_MODEL_ID", "eleven_multilingual_v2")
 OPTIFLOW_BACKEND_URL = os.getenv("OPTIFLOW_BACKEND_URL")
 OPTIFLOW_BACKEND_API_KEY = os.getenv("OPTIFLOW_BACKEND_API_KEY")
 AGENT_EVENT_WEBHOOK_URL = os.getenv("AGENT_EVENT_WEBHOOK_URL")
+PIPEDREAM_TIMEOUT = float(os.getenv("PIPEDREAM_TIMEOUT", "30"))
+# Stop the reply being spoken when the user starts talking over it
+BARGE_IN_ENABLED = os.getenv("BARGE_IN_ENABLED", "true").lower() in ("1", "true", "yes")
+# Comma-separated action types that always run in the background ("*" for all)
+PIPEDREAM_DEFERRED_ACTIONS = {a.strip() for a in os.getenv("PIPEDREAM_DEFERRED_ACTIONS", "").split(",") if a.strip()}
 
 # System prompt
 SYSTEM_PROMPT = """
@@ -58,18 +66,39 @@ When a user connects, always greet them right away with a friendly introduction.
 Keep your responses clear and concise.
 """
 
-# Setup plugins
-asr_plugin = OpenAIASRPlugin(api_key=OPENAI_API_KEY)
-tts_plugin = OpenAITTSPlugin(api_key=OPENAI_API_KEY, voice="alloy")
-llm_plugin = OpenAIChatCompletionPlugin(
-    api_key=OPENAI_API_KEY,
-    model="gpt-4o",
-    system_prompt=SYSTEM_PROMPT,
+# System prompt for voice sessions. Keep it byte-for-byte stable: it is the shared
+# prompt prefix that providers can cache across sessions.
+JARVIS_SYSTEM_PROMPT = (
+    "You are Jarvis, a highly capable AI assistant for Optiflow. "
+    "Your primary user is an Optiflow user who is using your voice interface. "
+    "You can understand voice commands, execute tasks using available tools "
+    "(like Pipedream for external actions and a knowledge base for information retrieval), "
+    "and respond in a helpful, concise, and professional manner. "
+    "When a tool is used, summarize the outcome for the user. "
+    "If you need clarification, ask the user. "
+    "Always confirm actions before execution if they are irreversible or sensitive. "
+    "Keep your responses conversational but efficient."
+)
+
+# Fixed phrases, prerendered once per worker by the phrase audio cache
+WELCOME_MESSAGE = "Hello, I'm Jarvis, your voice assistant for Optiflow. How can I help you today?"
+ERROR_MESSAGE = "I'm sorry, but I've encountered an internal error. Please try reconnecting."
+GOODBYE_MESSAGE = "I'll be here when you return. Goodbye!"
+FIXED_PHRASES = (WELCOME_MESSAGE, ERROR_MESSAGE, GOODBYE_MESSAGE)
+
+# Provider clients shared by every job in this worker process
+provider_pool = ProviderPool(
+    openai_api_key=OPENAI_API_KEY,
+    llm_model="gpt-4-turbo-preview",
+    deepgram_api_key=DEEPGRAM_API_KEY,
+    elevenlabs_api_key=ELEVENLABS_API_KEY,
+    elevenlabs_voice_id=ELEVENLABS_VOICE_ID,
+    elevenlabs_model_id=ELEVENLABS_MODEL_ID,
 )
 
 # --- Pipedream Tool Definition ---
 class PipedreamActionTool(lk_tools.Tool):
-    def __init__(self):
+    def __init__(self, announcer=None):
         super().__init__(
             name="execute_pipedream_action",
             description=(
@@ -77,12 +106,21 @@ class PipedreamActionTool(lk_tools.Tool):
                 "Use this for tasks like sending emails, creating calendar events, "
                 "managing tasks in Asana/Jira, or interacting with CRMs. "
                 "Specify the 'action_type' (e.g., 'send_email', 'create_asana_task') and "
-                "necessary 'parameters'."
+                "necessary 'parameters'. "
+                "Set 'deferred' to true for slow actions: the action then runs in the background "
+                "and the user is told the result when it finishes, so you can keep talking."
             ),
         )
+        # Coroutine called with (action_type, result) when a deferred action completes
+        self.announcer = announcer
+        self._pending = set()
         logger.info("PipedreamActionTool initialized.")
 
-    async def arun(self, ctx: lk_tools.ToolContext, action_type: str, parameters: dict) -> str:
+    async def arun(self, ctx: lk_tools.ToolContext, action_type: str, parameters: dict, deferred: bool = None) -> str:
+        with tool_span("execute_pipedream_action"):
+            return await self._run(ctx, action_type, parameters, deferred)
+
+    async def _run(self, ctx: lk_tools.ToolContext, action_type: str, parameters: dict, deferred: bool = None) -> str:
         logger.info(f"PipedreamTool called: action_type={action_type}, params={parameters}")
         
         if not OPTIFLOW_BACKEND_URL or not OPTIFLOW_BACKEND_API_KEY:
@@ -103,6 +141,22 @@ class PipedreamActionTool(lk_tools.Tool):
             "user_identity": user_identity
         }
         
+        if deferred is None:
+            deferred = "*" in PIPEDREAM_DEFERRED_ACTIONS or action_type in PIPEDREAM_DEFERRED_ACTIONS
+        
+        if deferred and self.announcer is not None:
+            self._defer(action_type, self.execute(action_type, payload))
+            logger.info(f"Pipedream action {action_type} deferred to background")
+            return json.dumps({
+                "status": "accepted",
+                "message": (f"The {action_type} action has started in the background. "
+                            "The user will be told the result when it finishes.")
+            })
+        
+        return await self.execute(action_type, payload)
+
+    async def execute(self, action_type: str, payload: dict) -> str:
+        """Run the action on the Optiflow backend without blocking the event loop."""
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {OPTIFLOW_BACKEND_API_KEY}"
@@ -110,24 +164,80 @@ class PipedreamActionTool(lk_tools.Tool):
         
         try:
             logger.info(f"Calling Optiflow backend for Pipedream action: {action_type}")
-            response = requests.post(
-                f"{OPTIFLOW_BACKEND_URL}/api/pipedream/execute", 
-                json=payload, 
-                headers=headers, 
-                timeout=30
-            )
-            response.raise_for_status()
-            result = response.text
+            async with get_backend_client().post(
+                f"{OPTIFLOW_BACKEND_URL}/api/pipedream/execute",
+                json=payload,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=PIPEDREAM_TIMEOUT)
+            ) as response:
+                result = await response.text()
+                if response.status >= 400:
+                    error_msg = f"Failed to execute Pipedream action: {response.status}, {result}"
+                    logger.error(error_msg)
+                    return json.dumps({"error": error_msg})
             logger.info(f"Pipedream action {action_type} executed successfully")
             return result
-        except requests.RequestException as e:
-            error_msg = f"Failed to execute Pipedream action: {str(e)}"
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error_msg = f"Failed to execute Pipedream action: {str(e) or type(e).__name__}"
             logger.error(error_msg)
             return json.dumps({"error": error_msg})
 
+    def on_interrupt(self, task, ctx, action_type: str, parameters: dict = None, deferred: bool = None):
+        """Called by the tool executor when the user interrupts: don't abandon an action with side effects."""
+        if self.announcer is None:
+            return None
+        self._defer(action_type, task)
+        logger.info(f"Pipedream action {action_type} continues in background after interruption")
+        return json.dumps({
+            "status": "accepted",
+            "message": (f"The {action_type} action continues in the background. "
+                        "The user will be told the result when it finishes.")
+        })
+
+    def on_timeout(self, task, ctx, action_type: str, parameters: dict = None, deferred: bool = None):
+        """Called by the tool executor when an action overruns its budget: let it finish in the background."""
+        if self.announcer is None:
+            return None
+        self._defer(action_type, task)
+        logger.info(f"Pipedream action {action_type} is slow, continuing in background")
+        return json.dumps({
+            "status": "accepted",
+            "message": (f"The {action_type} action is taking longer than expected and continues in the background. "
+                        "The user will be told the result when it finishes.")
+        })
+
+    def _defer(self, action_type: str, pending_result):
+        task = asyncio.create_task(self._run_deferred(action_type, pending_result))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _run_deferred(self, action_type: str, pending_result):
+        try:
+            result = await pending_result
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # execute() only turns request errors into results; tell the user about anything else too
+            error_msg = f"Failed to execute Pipedream action: {str(e) or type(e).__name__}"
+            logger.error(error_msg, exc_info=True)
+            result = json.dumps({"error": error_msg})
+        try:
+            await self.announcer(action_type, result)
+        except Exception as e:
+            logger.error(f"Failed to announce result of Pipedream action {action_type}: {e}")
+
+    async def cancel_pending(self):
+        """Cancel deferred actions that are still running when the session ends."""
+        tasks = list(self._pending)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+            logger.info(f"Cancelled {len(tasks)} pending Pipedream actions")
+
 # --- Knowledge Base Tool (Enhanced) ---
 class KnowledgeBaseQueryTool(lk_tools.Tool):
-    def __init__(self, backend_url=None, backend_api_key=None):
+    def __init__(self, backend_url=None, backend_api_key=None, cache=None):
         super().__init__(
             name="query_knowledge_base",
             description=(
@@ -139,9 +249,16 @@ class KnowledgeBaseQueryTool(lk_tools.Tool):
         )
         self.backend_url = backend_url or os.getenv("OPTIFLOW_BACKEND_URL")
         self.backend_api_key = backend_api_key or os.getenv("OPTIFLOW_BACKEND_API_KEY")
+        self.cache = cache if cache is not None else kb_cache
+        # Set per session when speculative prefetching from transcripts is enabled
+        self.prefetcher = None
         logger.info("KnowledgeBaseQueryTool initialized with backend URL")
     
     async def arun(self, ctx: lk_tools.ToolContext, query_text: str, kb_type: str = None) -> str:
+        with tool_span("query_knowledge_base"):
+            return await self._run(ctx, query_text, kb_type)
+
+    async def _run(self, ctx: lk_tools.ToolContext, query_text: str, kb_type: str = None) -> str:
         logger.info(f"KnowledgeBaseTool called: query='{query_text}', kb_type='{kb_type}'")
         
         if not self.backend_url or not self.backend_api_key:
@@ -152,14 +269,30 @@ class KnowledgeBaseQueryTool(lk_tools.Tool):
                 ]
             })
         
-        # Extract user ID from context if available
+        # Extract user and organization IDs from context if available
         user_id = None
+        org_id = None
         try:
-            if hasattr(ctx, "metadata") and "user_id" in ctx.metadata:
-                user_id = ctx.metadata["user_id"]
+            if hasattr(ctx, "metadata"):
+                user_id = ctx.metadata.get("user_id")
+                org_id = ctx.metadata.get("org_id")
         except Exception as e:
             logger.error(f"Error extracting user ID from context: {e}")
         
+        if self.prefetcher is not None:
+            prefetched = await self.prefetcher.claim(query_text, kb_type, user_id=user_id, org_id=org_id)
+            if prefetched is not None:
+                return prefetched
+        
+        return await self.search(query_text, kb_type=kb_type, user_id=user_id, org_id=org_id)
+    
+    async def search(self, query_text: str, kb_type: str = None, user_id=None, org_id=None) -> str:
+        """Search the knowledge base, serving repeated queries from the result cache."""
+        cached = self.cache.get(user_id, kb_type, query_text)
+        if cached is not None:
+            logger.debug(f"Knowledge base cache hit for query: '{query_text}'")
+            return cached
+        
         try:
             # Prepare search parameters
             params = {
@@ -177,44 +310,47 @@ class KnowledgeBaseQueryTool(lk_tools.Tool):
                 "Content-Type": "application/json"
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.backend_url}/api/knowledge/search",
-                    json=params,
-                    headers=headers
-                ) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        logger.error(f"Error querying knowledge base: {response.status}, {error_text}")
-                        return json.dumps({
-                            "error": f"Failed to query knowledge base: {response.status}",
-                            "results": []
-                        })
-                    
-                    data = await response.json()
-                    
-                    # Format the results nicely for the agent
-                    formatted_results = []
-                    for doc in data.get("documents", []):
-                        formatted_result = {
-                            "title": doc.get("title", "Untitled Document"),
-                            "content": doc.get("content", ""),
-                            "source": doc.get("metadata", {}).get("source", "Unknown Source"),
-                            "score": doc.get("similarity", 0)
-                        }
-                        formatted_results.append(formatted_result)
-                    
-                    if not formatted_results:
-                        return json.dumps({
-                            "message": f"No results found for query: '{query_text}'",
-                            "results": []
-                        })
-                    
+            async with get_backend_client().post(
+                f"{self.backend_url}/api/knowledge/search",
+                json=params,
+                headers=headers
+            ) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    logger.error(f"Error querying knowledge base: {response.status}, {error_text}")
                     return json.dumps({
-                        "message": f"Found {len(formatted_results)} relevant documents.",
-                        "results": formatted_results
+                        "error": f"Failed to query knowledge base: {response.status}",
+                        "results": []
                     })
-                    
+                
+                data = await response.json()
+            
+            # Format the results nicely for the agent
+            formatted_results = []
+            for doc in data.get("documents", []):
+                formatted_result = {
+                    "title": doc.get("title", "Untitled Document"),
+                    "content": doc.get("content", ""),
+                    "source": doc.get("metadata", {}).get("source", "Unknown Source"),
+                    "score": doc.get("similarity", 0)
+                }
+                formatted_results.append(formatted_result)
+            
+            if not formatted_results:
+                result = json.dumps({
+                    "message": f"No results found for query: '{query_text}'",
+                    "results": []
+                })
+                self.cache.put(user_id, kb_type, query_text, result, negative=True, org_id=org_id)
+                return result
+            
+            result = json.dumps({
+                "message": f"Found {len(formatted_results)} relevant documents.",
+                "results": formatted_results
+            })
+            self.cache.put(user_id, kb_type, query_text, result, org_id=org_id)
+            return result
+                
         except Exception as e:
             logger.error(f"Error in KnowledgeBaseQueryTool: {e}")
             return json.dumps({
@@ -222,55 +358,71 @@ class KnowledgeBaseQueryTool(lk_tools.Tool):
                 "results": []
             })
 
+# Agent events are delivered in batches in the background so callers never wait on the webhook
+event_outbox = EventOutbox(AGENT_EVENT_WEBHOOK_URL) if AGENT_EVENT_WEBHOOK_URL else None
+
+# Worker-level stats exported on /metrics
+metrics.register_collector("backend_pool", lambda: get_backend_client().stats())
+metrics.register_collector("provider_pool", provider_pool.stats)
+metrics.register_collector("kb_cache", kb_cache.stats)
+metrics.register_collector("phrase_cache", phrase_cache.stats)
+metrics.register_collector("logging", log_stats)
+metrics.register_collector("presence", lambda: get_presence_service(OPTIFLOW_BACKEND_URL).stats())
+metrics.register_collector("data_channel", data_channel_stats)
+if event_outbox is not None:
+    metrics.register_collector("event_outbox", event_outbox.stats)
+if TTS_CACHE_ENABLED:
+    metrics.register_collector("tts_cache", tts_cache_stats)
+if VAD_GATE_ENABLED:
+    metrics.register_collector("vad", vad_stats)
+
 async def send_agent_event(event_type, user_id, room_id):
-    if not AGENT_EVENT_WEBHOOK_URL:
+    if event_outbox is None:
         return
-    payload = {
+    await event_outbox.publish({
         "event_type": event_type,
         "user_id": user_id,
         "room_id": room_id,
         "timestamp": int(time.time()),
-    }
-    try:
-        async with aiohttp.ClientSession() as client:
-            async with client.post(
-                AGENT_EVENT_WEBHOOK_URL,
-                json=payload,
-                headers={"Content-Type": "application/json"}
-            ) as resp:
-                if resp.status != 200:
-                    logger.error(f"Failed to send agent event webhook: {resp.status} {await resp.text()}")
-    except Exception as e:
-        logger.error(f"Error sending agent event webhook: {e}")
+    })
 
 class JarvisAgent:
-    def __init__(self):
+    def __init__(self, providers: SessionProviders):
         try:
-            # Initialize STT (Speech-to-Text)
-            self.stt_plugin = deepgram_plugin.STT(api_key=DEEPGRAM_API_KEY) if DEEPGRAM_API_KEY else lk_stt.NoOpSTT()
-            logger.info(f"STT initialized: {type(self.stt_plugin).__name__}")
-            
-            # Initialize LLM (Language Model)
-            self.llm_plugin = openai_plugin.LLM(
-                model="gpt-4-turbo-preview", 
-                api_key=OPENAI_API_KEY
-            ) if OPENAI_API_KEY else lk_llm.NoOpLLM()
-            logger.info(f"LLM initialized: {type(self.llm_plugin).__name__}")
-            
-            # Initialize TTS (Text-to-Speech)
-            self.tts_plugin = elevenlabs_plugin.TTS(
-                api_key=ELEVENLABS_API_KEY,
-                voice_id=ELEVENLABS_VOICE_ID,
-                model_id="eleven_multilingual_v2"
-            ) if ELEVENLABS_API_KEY else lk_tts.NoOpTTS()
-            logger.info(f"TTS initialized: {type(self.tts_plugin).__name__}")
+            # Provider handles leased from the worker's provider pool; STT only hears speech
+            self.stt_plugin = GatedSTT(providers.stt) if VAD_GATE_ENABLED else providers.stt
+            self.llm_plugin = providers.llm
+            self.tts_plugin = providers.tts
+            # Identify the rendered voice for audio caches
+            self.tts_voice_id = providers.tts_voice_id
+            self.tts_model_id = providers.tts_model_id
             
             # Initialize tools
             self.pipedream_tool = PipedreamActionTool()
             self.kb_tool = KnowledgeBaseQueryTool(backend_url=OPTIFLOW_BACKEND_URL, backend_api_key=OPTIFLOW_BACKEND_API_KEY)
             
-            # Register tools with the LLM
-            self.llm_plugin.tools = [self.pipedream_tool, self.kb_tool]
+            # Register tools with this session's LLM handle; calls run concurrently within per-tool budgets
+            self.tool_executor = ToolExecutor()
+            self.llm_plugin.tools = [
+                self.tool_executor.wrap(self.pipedream_tool),
+                self.tool_executor.wrap(self.kb_tool),
+            ]
+            
+            # Memory context compaction stats for this session
+            self.context_stats = None
+            
+            # Sentence streamer for the response currently being spoken
+            self.current_speech = None
+            # Chat context of the running session, trimmed on barge-in
+            self.chat_ctx = None
+            # (heard, generated, message count) of an interrupted reply not yet in the chat context
+            self._pending_trim = None
+            
+            # Per-turn latency marks for this session
+            self.turns = TurnTracker()
+            
+            # Outbound data channel of the running session
+            self.data_channel = None
             
             logger.info("JarvisAgent fully initialized.")
         except Exception as e:
@@ -279,6 +431,9 @@ class JarvisAgent:
             raise
 
     async def process_job(self, job: JobContext):
+        # Set before anything can fail so the error path and cleanup can check them
+        session = None
+        presence = None
         try:
             logger.info(f"JarvisAgent processing job: {job.id} for participant: {job.participant.identity if job.participant else 'N/A'}")
             
@@ -304,31 +459,27 @@ class JarvisAgent:
                 logger.error(f"Error parsing metadata: {e}")
                 # Continue without memory context
             
-            # Create initial chat context
+            # Create initial chat context; the stable system prompt always comes first
+            # so provider-side prompt prefix caching can apply across sessions
             initial_ctx = lk_llm.ChatContext()
             initial_ctx.append(
                 role=lk_llm.ChatRole.SYSTEM,
-                content=("You are Jarvis, a highly capable AI assistant for Optiflow. "
-                        "Your primary user is an Optiflow user who is using your voice interface. "
-                        "You can understand voice commands, execute tasks using available tools "
-                        "(like Pipedream for external actions and a knowledge base for information retrieval), "
-                        "and respond in a helpful, concise, and professional manner. "
-                        "When a tool is used, summarize the outcome for the user. "
-                        "If you need clarification, ask the user. "
-                        "Always confirm actions before execution if they are irreversible or sensitive. "
-                        "Keep your responses conversational but efficient.")
+                content=JARVIS_SYSTEM_PROMPT
             )
             
             # Add memory context to enhance the assistant's knowledge of the user
-            if memory_context and len(memory_context) > 0:
-                memory_str = "\n\nHere is the conversation history with this user that you should use to provide continuity:\n"
-                for memory_item in memory_context:
-                    if isinstance(memory_item, dict) and 'content' in memory_item and 'role' in memory_item:
-                        initial_ctx.append(
-                            role=lk_llm.ChatRole.SYSTEM,
-                            content=f"Previous conversation: {memory_item['role']}: {memory_item['content']}"
-                        )
-                logger.info("Enhanced prompt with memory context")
+            if memory_context:
+                memory_block, self.context_stats = build_memory_block(memory_context)
+                if memory_block:
+                    initial_ctx.append(
+                        role=lk_llm.ChatRole.SYSTEM,
+                        content=memory_block
+                    )
+                logger.info(f"Enhanced prompt with memory context: {self.context_stats}")
+            
+            # Tools and pipeline tasks created from here on report into this session's tracker
+            self.turns.session_id = job.id
+            current_turns.set(self.turns)
             
             # Create an AgentSession (v1.0 API)
             session = AgentSession(
@@ -338,20 +489,40 @@ class JarvisAgent:
                 llm=self.llm_plugin,
                 tts=self.tts_plugin,
                 audio_encoding=AudioEncoding.PCM_S16LE,
-                llm_context=initial_ctx
+                llm_context=initial_ctx,
+                tts_node=self.tts_node
+            )
+            self.chat_ctx = getattr(session, "llm_context", None) or initial_ctx
+            # Clients that can decode msgpack say so in the job metadata; others get JSON
+            self.data_channel = DataChannel(session.send_data, encoding=resolve_encoding(metadata.get("dataEncoding")))
+            
+            # Start knowledge base searches from transcripts before the LLM asks for them.
+            # They must run as the same user as tool calls, which read ctx.metadata["user_id"].
+            if KB_PREFETCH_ENABLED and self.kb_tool.backend_url and self.kb_tool.backend_api_key:
+                self.kb_tool.prefetcher = KnowledgeBasePrefetcher(
+                    self.kb_tool,
+                    user_id=metadata.get("user_id", user_id),
+                    org_id=metadata.get("org_id", metadata.get("orgId")),
+                )
+            
+            # Deferred Pipedream actions report back into this session when they finish
+            self.pipedream_tool.announcer = (
+                lambda action_type, result: self.announce_action_result(session, action_type, result)
             )
             
             try:
                 # Send welcome message
-                welcome_message = "Hello, I'm Jarvis, your voice assistant for Optiflow. How can I help you today?"
-                await session.tts.synthesize(welcome_message)
+                await self.speak_phrase(session, WELCOME_MESSAGE)
                 
-                # Start polling for user presence in the background
-                presence_task = None
-                if job.participant and job.room:
+                # Track user presence through the worker's shared presence poller
+                if job.participant and job.room and (OPTIFLOW_BACKEND_URL or PRESENCE_BACKEND == "local"):
                     user_id = job.participant.identity
                     room_id = job.room.name
-                    presence_task = asyncio.create_task(self.poll_user_presence(user_id, room_id, session))
+                    presence = get_presence_service(OPTIFLOW_BACKEND_URL)
+                    presence.register(
+                        job.id, user_id, room_id,
+                        lambda: self.leave_inactive_user(user_id, room_id, session)
+                    )
                 
                 # Main conversation loop
                 async for event in session.process_media():
@@ -359,23 +530,51 @@ class JarvisAgent:
                     # V1.0 uses a different event model
                     if event.type == "transcript":
                         # User said something
-                        logger.info(f"User said: {event.text}")
+                        is_final = getattr(event, "is_final", True)
+                        if is_final:
+                            self.turns.mark("stt_final")
+                            logger.debug(f"User said: {event.text}")
+                        if self.kb_tool.prefetcher is not None:
+                            self.kb_tool.prefetcher.on_transcript(event.text, is_final=is_final)
+                        if DATA_CHANNEL_TRANSCRIPTS:
+                            await self.data_channel.send({
+                                "type": "user_transcript",
+                                "participant": job.participant.identity if job.participant else None,
+                                "transcript": event.text,
+                                "final": is_final
+                            })
+                    
+                    elif event.type == "user_started_speaking":
+                        # Barge-in: stop talking over the user. Speech while the agent is silent
+                        # (backchannels, noise, the user finishing their sentence) leaves tools alone.
+                        if BARGE_IN_ENABLED and self.current_speech is not None:
+                            await self.interrupt_speech(session)
+                            # The user moved on; results of outstanding lookups would be stale.
+                            # Actions with side effects finish in the background instead.
+                            cancelled = self.tool_executor.interrupt()
+                            if cancelled:
+                                logger.info(f"Cancelled {cancelled} tool calls on user interruption")
+                    
+                    elif event.type == "user_stopped_speaking":
+                        # End of user speech starts the turn's latency clock
+                        self.turns.start_turn()
+                        # An interrupted reply is committed by now; trim it before the next turn
+                        if self._pending_trim is not None:
+                            heard, generated, position = self._pending_trim
+                            self._pending_trim = None
+                            self._trim_reply(heard, generated, insert_at=position)
                     
                     elif event.type == "agent_speaking_started":
                         # Agent started speaking
-                        logger.info("Agent started speaking")
+                        logger.debug("Agent started speaking")
                     
                     elif event.type == "agent_speaking_finished":
                         # Agent finished speaking
-                        logger.info("Agent finished speaking")
+                        logger.debug("Agent finished speaking")
                     
                     elif event.type == "error":
                         # Handle errors
                         logger.error(f"Error in session: {event.error}")
-                
-                # Cleanup tasks
-                if presence_task:
-                    presence_task.cancel()
                     
             except Exception as e:
                 error_msg = f"Error in agent processing: {e}"
@@ -383,13 +582,13 @@ class JarvisAgent:
                 
                 try:
                     # Notify the frontend of the error
-                    await session.send_data(json.dumps({
+                    await self.data_channel.send({
                         "type": "error",
                         "message": "An internal error occurred with the agent."
-                    }))
+                    })
                     
                     # Also try to speak the error if TTS is available
-                    await session.tts.synthesize("I'm sorry, but I've encountered an internal error. Please try reconnecting.")
+                    await self.speak_phrase(session, ERROR_MESSAGE)
                 except Exception as send_e:
                     logger.error(f"Failed to send error to client: {send_e}")
         except Exception as e:
@@ -398,81 +597,266 @@ class JarvisAgent:
             logger.error(traceback.format_exc())
             try:
                 # Notify the frontend of the error
-                await session.send_data(json.dumps({
-                    "type": "error",
-                    "message": "An internal error occurred with the agent."
-                }))
+                if self.data_channel is not None:
+                    await self.data_channel.send({
+                        "type": "error",
+                        "message": "An internal error occurred with the agent."
+                    })
                 # Also try to speak the error if TTS is available
-                await session.tts.synthesize("I'm sorry, but I've encountered an internal error. Please try reconnecting.")
+                if session is not None:
+                    await self.speak_phrase(session, ERROR_MESSAGE)
             except Exception as send_e:
                 logger.error(f"Failed to send error to client: {send_e}")
         finally:
             logger.info(f"Agent processing finished for job {job.id}.")
-            await session.close()
+            if presence is not None:
+                presence.unregister(job.id)
+            logger.info(f"Tool executor stats for job {job.id}: {self.tool_executor.stats()}")
+            await self.tool_executor.close()
+            await self.pipedream_tool.cancel_pending()
+            if self.kb_tool.prefetcher is not None:
+                logger.info(f"Knowledge base prefetch stats for job {job.id}: {self.kb_tool.prefetcher.stats()}")
+                self.kb_tool.prefetcher.cancel_all()
+                self.kb_tool.prefetcher = None
+            if self.data_channel is not None:
+                try:
+                    await self.data_channel.close()
+                except Exception as e:
+                    logger.warning(f"Failed to flush data channel for job {job.id}: {e}")
+                logger.info(f"Data channel stats for job {job.id}: {self.data_channel.stats()}")
+            if session is not None:
+                await session.close()
     
-    async def poll_user_presence(self, user_id, room_id, session: AgentSession):
-        """Poll the Optiflow backend for user presence. If inactive, end the session."""
-        poll_interval = 30  # seconds
-        inactivity_limit = 10 * 60  # 10 minutes in seconds
-        last_active = time.time()
-        while True:
-            try:
-                async with aiohttp.ClientSession() as client:
-                    async with client.post(
-                        f"{OPTIFLOW_BACKEND_URL}/api/presence/check",
-                        json={"userId": user_id},
-                        headers={"Content-Type": "application/json"}
-                    ) as resp:
-                        data = await resp.json()
-                        if not data.get("inactive", False):
-                            last_active = time.time()
-                        else:
-                            # If inactive for more than inactivity_limit, end session
-                            if time.time() - last_active > inactivity_limit:
-                                logger.info(f"[AGENT LEAVE] User {user_id} inactive for over 10 minutes. Jarvis agent leaving room: {room_id}")
-                                await send_agent_event("agent_leave", user_id, room_id)
-                                
-                                await session.send_data(json.dumps({
-                                    "type": "agent_status",
-                                    "status": "leaving_room",
-                                    "reason": "user_inactive"
-                                }))
-                                
-                                await session.tts.synthesize("I'll be here when you return. Goodbye!")
-                                await session.close()
-                                return
-            except Exception as e:
-                logger.error(f"Error polling user presence: {e}")
-            await asyncio.sleep(poll_interval)
+    async def tts_node(self, text, model_settings=None):
+        """Pipeline TTS stage: speak streamed LLM output sentence by sentence as it arrives."""
+        speech = SentenceStreamer(self.tts_plugin)
+        self.current_speech = speech
+        # Normalize provider audio to the room's format. TTS runs faster than real time and the
+        # pipeline buffers what we yield, so frames are copied out of the converter's ring.
+        converter = (
+            FrameConverter(AUDIO_OUTPUT_SAMPLE_RATE, AUDIO_OUTPUT_CHANNELS, copy_frames=True)
+            if AUDIO_OUTPUT_SAMPLE_RATE else None
+        )
+        first_frame = True
+        try:
+            async for audio in speech.run(self._mark_first_token(text)):
+                if first_frame:
+                    first_frame = False
+                    self.turns.mark("tts_request", speech.first_request_at)
+                    self.turns.mark("tts_first_byte", speech.first_audio_at)
+                    self.turns.mark("audio_out")
+                if converter is None:
+                    yield audio.frame
+                else:
+                    for frame in converter.push_frame(audio.frame):
+                        yield frame
+            if converter is not None and not speech.cancelled:
+                for frame in converter.flush():
+                    yield frame
+        finally:
+            if self.current_speech is speech:
+                self.current_speech = None
+            if speech.cancelled:
+                metrics.observe(
+                    "interruption_stop_seconds", time.perf_counter() - speech.cancelled_at,
+                    "Time from barge-in to the end of agent audio output"
+                )
+    
+    async def _mark_first_token(self, text):
+        first = True
+        try:
+            async for delta in text:
+                if first:
+                    first = False
+                    self.turns.mark("llm_first_token")
+                yield delta
+        finally:
+            # Propagate early close (e.g. barge-in) to the LLM stream
+            aclose = getattr(text, "aclose", None)
+            if aclose is not None:
+                await aclose()
+    
+    async def interrupt_speech(self, session: AgentSession):
+        """Barge-in: stop the reply being spoken, abandon its generation and keep only what was heard."""
+        speech = self.current_speech
+        if speech is None or speech.cancelled:
+            return
+        heard = speech.heard_text()
+        speech.cancel()
+        try:
+            # Flush audio already queued for playout
+            interrupted = session.interrupt()
+            if inspect.isawaitable(interrupted):
+                await interrupted
+        except Exception as e:
+            logger.warning(f"Failed to interrupt session playback: {e}")
+        if not self._trim_reply(heard, speech.received_text):
+            # Not committed yet; trim it once the framework adds it
+            self._pending_trim = (heard, speech.received_text, len(getattr(self.chat_ctx, "messages", None) or []))
+        
+        unheard = speech.received_text.strip()[len(heard):]
+        unplayed_chunks = max(0, speech.chunks_started - len(speech.spoken_chunks))
+        metrics.inc("interruptions", help_text="Replies cut off by the user speaking")
+        metrics.inc("interrupted_chars_discarded", len(unheard), help_text="Generated reply characters the user never heard")
+        metrics.inc("interrupted_tokens_discarded", count_tokens(unheard), help_text="Generated reply tokens the user never heard")
+        metrics.inc("interrupted_tts_chunks_cancelled", unplayed_chunks, help_text="Synthesized or pending TTS chunks dropped on barge-in")
+        logger.info(
+            f"User interrupted the agent after {len(heard)} of {len(speech.received_text)} generated characters; "
+            f"dropped {unplayed_chunks} TTS chunks"
+        )
+    
+    def _trim_reply(self, heard: str, generated: str, insert_at=None) -> bool:
+        """Replace the interrupted assistant message with the part the user heard.
+
+        Returns False when the reply is not in the chat context (yet), so nothing was changed;
+        with `insert_at` the heard part is inserted at that position instead.
+        """
+        messages = getattr(self.chat_ctx, "messages", None)
+        if messages is None:
+            return True
+        generated = generated.strip()
+        # Skip the user's messages since the interruption, then search back to the turn before
+        end = len(messages)
+        while end and messages[end - 1].role == lk_llm.ChatRole.USER:
+            end -= 1
+        for i in range(end - 1, -1, -1):
+            message = messages[i]
+            if message.role == lk_llm.ChatRole.USER:
+                break
+            content = message.content if isinstance(message.content, str) else ""
+            if message.role != lk_llm.ChatRole.ASSISTANT or not content.strip():
+                continue
+            content = content.strip()
+            if not (generated.startswith(content) or content.startswith(generated)):
+                continue
+            if heard:
+                message.content = heard
+            else:
+                del messages[i]
+            return True
+        if insert_at is not None and heard:
+            self.chat_ctx.append(role=lk_llm.ChatRole.ASSISTANT, content=heard)
+            messages.insert(min(insert_at, len(messages) - 1), messages.pop())
+            return True
+        return False
+    
+    async def speak_phrase(self, session: AgentSession, text: str):
+        """Play a fixed phrase from the phrase audio cache instead of synthesizing it again."""
+        await phrase_cache.play(
+            session, text,
+            voice_id=self.tts_voice_id,
+            model_id=self.tts_model_id,
+            encoding=AudioEncoding.PCM_S16LE,
+        )
+    
+    async def announce_action_result(self, session: AgentSession, action_type: str, result: str):
+        """Report a finished deferred Pipedream action on the data channel and by voice."""
+        try:
+            parsed = json.loads(result)
+        except (TypeError, ValueError):
+            parsed = result
+        failed = isinstance(parsed, dict) and "error" in parsed
+        action_name = action_type.replace("_", " ")
+        
+        await self.data_channel.send({
+            "type": "action_result",
+            "action_type": action_type,
+            "status": "error" if failed else "success",
+            "result": parsed
+        })
+        
+        if failed:
+            text = f"Sorry, the {action_name} action didn't go through."
+        else:
+            text = f"Your {action_name} action has finished."
+        await session.say(text, audio=synthesized_frames(session.tts, text))
+    
+    async def leave_inactive_user(self, user_id, room_id, session: AgentSession):
+        """Called by the presence service when the user has been inactive too long."""
+        logger.info(f"[AGENT LEAVE] User {user_id} inactive for over 10 minutes. Jarvis agent leaving room: {room_id}")
+        await send_agent_event("agent_leave", user_id, room_id)
+        
+        await self.data_channel.send({
+            "type": "agent_status",
+            "status": "leaving_room",
+            "reason": "user_inactive"
+        })
+        
+        await self.speak_phrase(session, GOODBYE_MESSAGE)
+        await self.data_channel.flush()
+        await session.close()
 
 async def request_fnc(job_request: JobContext):
+    # Jobs run by the LiveKit CLI don't go through an entry point of ours; no-op once configured
+    configure_logging()
     logger.info(f"Received job request: {job_request.id}, type: {job_request.type}")
     
     if job_request.type == AgentJobType.AGENT:
-        agent = JarvisAgent()
-        await agent.process_job(job_request)
+        async with provider_pool.lease() as providers:
+            agent = JarvisAgent(providers)
+            await agent.process_job(job_request)
     else:
         logger.warning(f"Unhandled job type: {job_request.type}")
 
+worker_heartbeat = None
+
+async def warm_worker():
+    """Create provider clients and render fixed phrases before the first job arrives."""
+    global worker_heartbeat
+    await provider_pool.start()
+    await phrase_cache.prewarm(
+        provider_pool.tts, FIXED_PHRASES,
+        voice_id=provider_pool.tts_voice_id,
+        model_id=provider_pool.tts_model_id,
+        encoding=AudioEncoding.PCM_S16LE,
+    )
+    if VAD_GATE_ENABLED:
+        preload_vad()
+    if DISPATCH_URL and worker_heartbeat is None:
+        # Let the dispatcher place new sessions by this worker's load
+        worker_heartbeat = WorkerHeartbeat(DISPATCH_URL, WORKER_MAX_JOBS, lambda: provider_pool.active_leases)
+        worker_heartbeat.start()
+
+async def shutdown_worker():
+    """Stop the heartbeat, deliver queued agent events and close shared clients; run on every worker exit."""
+    global worker_heartbeat
+    if worker_heartbeat is not None:
+        await worker_heartbeat.stop()
+        worker_heartbeat = None
+    await close_presence_service()
+    await provider_pool.close()
+    if event_outbox is not None:
+        await event_outbox.close()
+    await close_backend_client()
+
 async def run_agent_worker():
     if not LIVEKIT_URL:
         raise ValueError("LIVEKIT_URL is not set in environment variables.")
     
-    worker_opts = WorkerOptions(
-        request_handler=request_fnc,
-    )
-    
-    logger.info(f"Starting Jarvis Agent Worker, connecting to LiveKit: {LIVEKIT_URL}")
-    
-    # This is placeholder code - you would use the livekit-server agent CLI in production
-    # For example: livekit-server agent run main_agent:request_fnc --url $LIVEKIT_URL --api-key $LIVEKIT_API_KEY --api-secret $LIVEKIT_API_SECRET
-    
-    print("Jarvis Agent Worker defined. To run:")
-    print("1. Ensure all .env variables are set (LIVEKIT_URL, API keys, etc.).")
-    print("2. Use LiveKit CLI: `livekit-server agent run main_agent:request_fnc --url $LIVEKIT_URL --api-key $LIVEKIT_API_KEY --api-secret $LIVEKIT_API_SECRET`")
+    await warm_worker()
+    try:
+        worker_opts = WorkerOptions(
+            request_handler=request_fnc,
+        )
+        
+        logger.info(f"Starting Jarvis Agent Worker, connecting to LiveKit: {LIVEKIT_URL}")
+        
+        # This is placeholder code - you would use the livekit-server agent CLI in production
+        # For example: livekit-server agent run main_agent:request_fnc --url $LIVEKIT_URL --api-key $LIVEKIT_API_KEY --api-secret $LIVEKIT_API_SECRET
+        
+        print("Jarvis Agent Worker defined. To run:")
+        print("1. Ensure all .env variables are set (LIVEKIT_URL, API keys, etc.).")
+        print("2. Use LiveKit CLI: `livekit-server agent run main_agent:request_fnc --url $LIVEKIT_URL --api-key $LIVEKIT_API_KEY --api-secret $LIVEKIT_API_SECRET`")
+    finally:
+        # The worker is done: drain agent events and close shared clients
+        await shutdown_worker()
 
 # Initialize agent with new v2 structure
 async def main():
+    # Dev pipeline only; imported here so loading the worker module doesn't pull them in
+    from livekit import agents
+    from livekit.plugins.openai import OpenAITTSPlugin, OpenAIASRPlugin, OpenAIChatCompletionPlugin
+    
     # Get API keys from environment
     livekit_api_key = os.environ.get("LIVEKIT_API_KEY")
     livekit_api_secret = os.environ.get("LIVEKIT_API_SECRET")
@@ -539,6 +923,7 @@ async def main():
         print("Shutting down agent...")
     finally:
         await pipeline.stop()
+        await shutdown_worker()
 
 if __name__ == "__main__":
     print("Jarvis Voice Agent Script")
@@ -549,6 +934,7 @@ if __name__ == "__main__":
     
     # The following is not necessary if using the livekit-server CLI to run the agent
     # It's here for manual testing or direct execution in development
+    configure_logging()
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
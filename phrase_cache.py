@@ -0,0 +1,176 @@
+import asyncio
+import hashlib
+import json
+import os
+import logging
+from livekit import rtc
+
+logger = logging.getLogger(__name__)
+
+PHRASE_CACHE_DIR = os.getenv("PHRASE_CACHE_DIR", os.path.join(".cache", "phrases"))
+PHRASE_FRAME_MS = int(os.getenv("PHRASE_FRAME_MS", "20"))
+
+
+async def synthesized_frames(tts, text: str):
+    """Live synthesis as audio frames, for `session.say(text, audio=...)`."""
+    async for audio in tts.synthesize(text):
+        yield audio.frame
+
+
+def phrase_key(text: str, voice_id: str, model_id: str, encoding) -> str:
+    """Stable content hash for a rendered phrase."""
+    material = json.dumps([text, voice_id or "", model_id or "", str(encoding)])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class PhraseAudio:
+    """Rendered PCM_S16LE audio for one phrase, replayable as LiveKit audio frames."""
+
+    __slots__ = ("text", "pcm", "sample_rate", "num_channels")
+
+    def __init__(self, text: str, pcm: bytes, sample_rate: int, num_channels: int):
+        self.text = text
+        self.pcm = pcm
+        self.sample_rate = sample_rate
+        self.num_channels = num_channels
+
+    @property
+    def duration(self) -> float:
+        return len(self.pcm) / (2 * self.num_channels * self.sample_rate)
+
+    def frames(self, frame_ms: int = PHRASE_FRAME_MS):
+        """Yield fixed-size frames that reference the cached buffer without copying it."""
+        samples_per_channel = self.sample_rate * frame_ms // 1000
+        frame_bytes = samples_per_channel * self.num_channels * 2
+        view = memoryview(self.pcm)
+        for offset in range(0, len(view), frame_bytes):
+            chunk = view[offset:offset + frame_bytes]
+            yield rtc.AudioFrame(
+                data=chunk,
+                sample_rate=self.sample_rate,
+                num_channels=self.num_channels,
+                samples_per_channel=len(chunk) // (2 * self.num_channels),
+            )
+
+    async def aframes(self, frame_ms: int = PHRASE_FRAME_MS):
+        for frame in self.frames(frame_ms):
+            yield frame
+
+
+class PhraseAudioCache:
+    """Renders the agent's fixed phrases once and keeps them in memory with an on-disk backing store."""
+
+    def __init__(self, cache_dir=PHRASE_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._phrases = {}
+        self._locks = {}
+        self.hits = 0
+        self.renders = 0
+        self.disk_loads = 0
+
+    async def get(self, tts, text: str, voice_id=None, model_id=None, encoding="pcm_s16le") -> PhraseAudio:
+        """Return the phrase audio, loading it from disk or rendering it through `tts` on first use."""
+        key = phrase_key(text, voice_id, model_id, encoding)
+        phrase = self._phrases.get(key)
+        if phrase is not None:
+            self.hits += 1
+            return phrase
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            phrase = self._phrases.get(key)
+            if phrase is not None:
+                self.hits += 1
+                return phrase
+            phrase = await asyncio.to_thread(self._load, key, text)
+            if phrase is not None:
+                self.disk_loads += 1
+            else:
+                phrase = await self._render(tts, text)
+                self.renders += 1
+                await asyncio.to_thread(self._save, key, phrase, voice_id, model_id, encoding)
+            self._phrases[key] = phrase
+        self._locks.pop(key, None)
+        return phrase
+
+    async def prewarm(self, tts, phrases, voice_id=None, model_id=None, encoding="pcm_s16le"):
+        """Render a set of phrases concurrently, e.g. at worker startup."""
+        results = await asyncio.gather(
+            *(self.get(tts, text, voice_id, model_id, encoding) for text in phrases),
+            return_exceptions=True,
+        )
+        for text, result in zip(phrases, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Failed to prerender phrase {text!r}: {result}")
+
+    async def play(self, session, text: str, voice_id=None, model_id=None, encoding="pcm_s16le"):
+        """Play a phrase into the session's room from cache, falling back to live synthesis."""
+        try:
+            phrase = await self.get(session.tts, text, voice_id, model_id, encoding)
+        except Exception as e:
+            logger.warning(f"Phrase cache unavailable for {text!r}, synthesizing live: {e}")
+            await session.say(text, audio=synthesized_frames(session.tts, text))
+            return
+        await session.say(text, audio=phrase.aframes())
+
+    @staticmethod
+    async def _render(tts, text: str) -> PhraseAudio:
+        pcm = bytearray()
+        sample_rate = None
+        num_channels = None
+        async for audio in tts.synthesize(text):
+            frame = audio.frame
+            sample_rate = frame.sample_rate
+            num_channels = frame.num_channels
+            pcm += frame.data.cast("B")
+        if sample_rate is None:
+            raise RuntimeError(f"TTS returned no audio for phrase {text!r}")
+        return PhraseAudio(text, bytes(pcm), sample_rate, num_channels)
+
+    def _paths(self, key):
+        base = os.path.join(self.cache_dir, key)
+        return base + ".pcm", base + ".json"
+
+    def _load(self, key, text):
+        pcm_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(pcm_path, "rb") as f:
+                pcm = f.read()
+        except (OSError, ValueError):
+            return None
+        return PhraseAudio(text, pcm, meta["sample_rate"], meta["num_channels"])
+
+    def _save(self, key, phrase, voice_id, model_id, encoding):
+        pcm_path, meta_path = self._paths(key)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(pcm_path + ".tmp", "wb") as f:
+                f.write(phrase.pcm)
+            os.replace(pcm_path + ".tmp", pcm_path)
+            with open(meta_path + ".tmp", "w") as f:
+                json.dump({
+                    "text": phrase.text,
+                    "voice_id": voice_id,
+                    "model_id": model_id,
+                    "encoding": str(encoding),
+                    "sample_rate": phrase.sample_rate,
+                    "num_channels": phrase.num_channels,
+                }, f)
+            os.replace(meta_path + ".tmp", meta_path)
+        except OSError as e:
+            logger.warning(f"Could not persist phrase audio to {self.cache_dir}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "phrases": len(self._phrases),
+            "bytes": sum(len(p.pcm) for p in self._phrases.values()),
+            "hits": self.hits,
+            "renders": self.renders,
+            "disk_loads": self.disk_loads,
+        }
+
+
+# Shared by all sessions in the worker process
+phrase_cache = PhraseAudioCache()
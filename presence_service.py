@@ -0,0 +1,238 @@
+import asyncio
+import os
+import time
+import logging
+
+from backend_client import get_backend_client
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_POLL_INTERVAL = float(os.getenv("PRESENCE_POLL_INTERVAL", "30"))
+PRESENCE_MIN_POLL_INTERVAL = float(os.getenv("PRESENCE_MIN_POLL_INTERVAL", "5"))
+PRESENCE_INACTIVITY_LIMIT = float(os.getenv("PRESENCE_INACTIVITY_LIMIT", str(10 * 60)))
+PRESENCE_BULK_SIZE = int(os.getenv("PRESENCE_BULK_SIZE", "500"))
+# "http" polls the Optiflow backend, "local" uses the in-process stand-in
+PRESENCE_BACKEND = os.getenv("PRESENCE_BACKEND", "http")
+
+
+class LocalPresenceBackend:
+    """In-process stand-in for the backend presence API, used in tests and local runs."""
+
+    def __init__(self):
+        self.inactive_users = set()
+        self.requests = 0
+
+    def set_inactive(self, user_id, inactive=True):
+        if inactive:
+            self.inactive_users.add(user_id)
+        else:
+            self.inactive_users.discard(user_id)
+
+    def check_bulk(self, user_ids) -> dict:
+        """Same response shape as POST /api/presence/check-bulk."""
+        self.requests += 1
+        return {"users": {user_id: {"inactive": user_id in self.inactive_users} for user_id in user_ids}}
+
+    async def fetch(self, user_ids) -> dict:
+        return self.check_bulk(user_ids)["users"]
+
+
+class HttpPresenceBackend:
+    """Bulk presence checks against the Optiflow backend over the shared connection pool."""
+
+    def __init__(self, backend_url, api_key=None):
+        self.backend_url = backend_url
+        self.api_key = api_key
+        self.bulk_supported = True
+
+    def _headers(self):
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    async def fetch(self, user_ids) -> dict:
+        if self.bulk_supported:
+            statuses = {}
+            for i in range(0, len(user_ids), PRESENCE_BULK_SIZE):
+                batch = user_ids[i:i + PRESENCE_BULK_SIZE]
+                async with get_backend_client().post(
+                    f"{self.backend_url}/api/presence/check-bulk",
+                    json={"userIds": batch},
+                    headers=self._headers()
+                ) as resp:
+                    if resp.status == 404:
+                        logger.warning("Bulk presence endpoint not available, falling back to per-user checks")
+                        self.bulk_supported = False
+                        break
+                    resp.raise_for_status()
+                    data = await resp.json()
+                    statuses.update(data.get("users", {}))
+            else:
+                return statuses
+        return await self._fetch_each(user_ids)
+
+    async def _fetch_each(self, user_ids) -> dict:
+        semaphore = asyncio.Semaphore(10)
+
+        async def check(user_id):
+            async with semaphore:
+                async with get_backend_client().post(
+                    f"{self.backend_url}/api/presence/check",
+                    json={"userId": user_id},
+                    headers=self._headers()
+                ) as resp:
+                    return user_id, await resp.json()
+
+        results = await asyncio.gather(*(check(user_id) for user_id in user_ids), return_exceptions=True)
+        return dict(result for result in results if not isinstance(result, Exception))
+
+
+class _Watch:
+    __slots__ = ("user_id", "room_id", "on_leave", "last_active", "inactive")
+
+    def __init__(self, user_id, room_id, on_leave):
+        self.user_id = user_id
+        self.room_id = room_id
+        self.on_leave = on_leave
+        self.last_active = time.time()
+        self.inactive = False
+
+
+class PresenceService:
+    """One presence poller per worker for all active sessions.
+
+    Sends one bulk request per interval, adapts the interval to how much presence is
+    changing, and calls each session's `on_leave` coroutine once its user has been
+    inactive for longer than the inactivity limit.
+    """
+
+    def __init__(
+        self,
+        backend,
+        max_interval=PRESENCE_POLL_INTERVAL,
+        min_interval=PRESENCE_MIN_POLL_INTERVAL,
+        inactivity_limit=PRESENCE_INACTIVITY_LIMIT,
+    ):
+        self.backend = backend
+        self.max_interval = max_interval
+        self.min_interval = min_interval
+        self.inactivity_limit = inactivity_limit
+        self.interval = max_interval
+        self._watches = {}
+        self._task = None
+        # Running on_leave callbacks, kept so they aren't garbage-collected and can be stopped
+        self._leave_tasks = set()
+
+        self.polls = 0
+        self.poll_errors = 0
+        self.leaves = 0
+
+    def register(self, session_key, user_id, room_id, on_leave):
+        """Track a session; `on_leave` is awaited when its user goes inactive."""
+        self._watches[session_key] = _Watch(user_id, room_id, on_leave)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def unregister(self, session_key):
+        self._watches.pop(session_key, None)
+
+    async def _run(self):
+        while self._watches:
+            await asyncio.sleep(self.interval)
+            if not self._watches:
+                break
+            try:
+                await self.poll_once()
+            except Exception as e:
+                self.poll_errors += 1
+                logger.error(f"Error polling user presence: {e}")
+
+    async def poll_once(self):
+        watches = dict(self._watches)
+        user_ids = sorted({watch.user_id for watch in watches.values()})
+        statuses = await self.backend.fetch(user_ids)
+        self.polls += 1
+
+        now = time.time()
+        changes = 0
+        for session_key, watch in watches.items():
+            status = statuses.get(watch.user_id)
+            if status is None:
+                continue
+            inactive = bool(status.get("inactive", False))
+            if inactive != watch.inactive:
+                changes += 1
+                watch.inactive = inactive
+            if not inactive:
+                watch.last_active = now
+            elif now - watch.last_active > self.inactivity_limit:
+                self.unregister(session_key)
+                self.leaves += 1
+                task = asyncio.create_task(self._dispatch_leave(watch))
+                self._leave_tasks.add(task)
+                task.add_done_callback(self._leave_tasks.discard)
+        self._adapt(changes, now)
+
+    def _adapt(self, changes, now):
+        if changes:
+            # Presence is changing, look again soon
+            self.interval = max(self.min_interval, self.interval / 2)
+        else:
+            self.interval = min(self.max_interval, self.interval * 1.5)
+        # Never sleep past the earliest possible leave decision
+        pending = [
+            self.inactivity_limit - (now - watch.last_active)
+            for watch in self._watches.values() if watch.inactive
+        ]
+        if pending:
+            self.interval = max(self.min_interval, min(self.interval, min(pending)))
+
+    async def stop(self):
+        """Stop polling and cancel on_leave callbacks still running."""
+        tasks = list(self._leave_tasks)
+        if self._task is not None:
+            tasks.append(self._task)
+            self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _dispatch_leave(self, watch):
+        try:
+            await watch.on_leave()
+        except Exception as e:
+            logger.error(f"Error ending session for inactive user {watch.user_id}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._watches),
+            "users": len({watch.user_id for watch in self._watches.values()}),
+            "interval": self.interval,
+            "polls": self.polls,
+            "poll_errors": self.poll_errors,
+            "leaves": self.leaves,
+        }
+
+
+local_presence_backend = LocalPresenceBackend()
+_presence_service = None
+
+
+def get_presence_service(backend_url=None, api_key=None) -> PresenceService:
+    """Return the worker's presence service, creating it on first use."""
+    global _presence_service
+    if _presence_service is None:
+        if PRESENCE_BACKEND == "local":
+            backend = local_presence_backend
+        else:
+            backend = HttpPresenceBackend(backend_url or os.getenv("OPTIFLOW_BACKEND_URL"), api_key)
+        _presence_service = PresenceService(backend)
+    return _presence_service
+
+
+async def close_presence_service():
+    global _presence_service
+    if _presence_service is not None:
+        await _presence_service.stop()
+        _presence_service = None
@@ -0,0 +1,181 @@
+import asyncio
+import os
+import time
+import logging
+from contextlib import asynccontextmanager
+from livekit.agents import tts as lk_tts, stt as lk_stt, llm as lk_llm
+
+from backend_client import BackendClient
+from tts_cache import CachedTTS, TTS_CACHE_ENABLED
+
+logger = logging.getLogger(__name__)
+
+PROVIDER_POOL_LIMIT = int(os.getenv("PROVIDER_POOL_LIMIT", "200"))
+PROVIDER_PREWARM = os.getenv("PROVIDER_PREWARM", "true").lower() in ("1", "true", "yes")
+PROVIDER_PREWARM_TIMEOUT = float(os.getenv("PROVIDER_PREWARM_TIMEOUT", "5"))
+
+
+class SessionProviders:
+    """Lightweight per-session handles leased from the ProviderPool."""
+
+    def __init__(self, stt, llm, tts, tts_voice_id=None, tts_model_id=None):
+        self.stt = stt
+        self.llm = llm
+        self.tts = tts
+        self.tts_voice_id = tts_voice_id
+        self.tts_model_id = tts_model_id
+
+
+class ProviderPool:
+    """Creates STT/LLM/TTS clients once per worker process and keeps their connections warm.
+
+    STT and TTS plugins are stateless between streams and are shared by every session. Each
+    session gets its own LLM handle (it carries the session's tools) built on a shared
+    OpenAI client, so all sessions reuse the same HTTP connections.
+
+    Provider SDKs and plugins are imported in `start()`, and only for providers that have
+    an API key, so importing this module stays cheap.
+    """
+
+    def __init__(
+        self,
+        openai_api_key=None,
+        llm_model="gpt-4-turbo-preview",
+        deepgram_api_key=None,
+        elevenlabs_api_key=None,
+        elevenlabs_voice_id=None,
+        elevenlabs_model_id=None,
+    ):
+        self.openai_api_key = openai_api_key
+        self.llm_model = llm_model
+        self.deepgram_api_key = deepgram_api_key
+        self.elevenlabs_api_key = elevenlabs_api_key
+        self.elevenlabs_voice_id = elevenlabs_voice_id
+        self.elevenlabs_model_id = elevenlabs_model_id
+
+        self.http = BackendClient(name="providers", limit=PROVIDER_POOL_LIMIT, limit_per_host=PROVIDER_POOL_LIMIT)
+        self.openai_client = None
+        self._openai_llm = None
+        self.stt = None
+        self.tts = None
+        self.tts_voice_id = elevenlabs_voice_id if elevenlabs_api_key else None
+        self.tts_model_id = elevenlabs_model_id if elevenlabs_api_key else None
+
+        self._started = False
+        self._lock = None
+        self.active_leases = 0
+        self.total_leases = 0
+        self.startup_seconds = None
+
+    async def start(self):
+        """Create the shared clients and prewarm their connections; safe to call concurrently."""
+        if self._started:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._started:
+                return
+            started_at = time.perf_counter()
+            http_session = await self.http.get_session()
+
+            if self.deepgram_api_key:
+                from livekit.plugins import deepgram as deepgram_plugin
+                self.stt = deepgram_plugin.STT(
+                    api_key=self.deepgram_api_key,
+                    http_session=http_session
+                )
+            else:
+                self.stt = lk_stt.NoOpSTT()
+            logger.info(f"STT initialized: {type(self.stt).__name__}")
+
+            if self.openai_api_key:
+                import httpx
+                import openai
+                from livekit.plugins import openai as openai_plugin
+                self._openai_llm = openai_plugin.LLM
+                self.openai_client = openai.AsyncClient(
+                    api_key=self.openai_api_key,
+                    http_client=httpx.AsyncClient(
+                        limits=httpx.Limits(
+                            max_connections=PROVIDER_POOL_LIMIT,
+                            max_keepalive_connections=PROVIDER_POOL_LIMIT,
+                        ),
+                        timeout=httpx.Timeout(30.0, connect=5.0),
+                    ),
+                )
+
+            if self.elevenlabs_api_key:
+                from livekit.plugins import elevenlabs as elevenlabs_plugin
+                tts = elevenlabs_plugin.TTS(
+                    api_key=self.elevenlabs_api_key,
+                    voice_id=self.elevenlabs_voice_id,
+                    model_id=self.elevenlabs_model_id,
+                    http_session=http_session
+                )
+            else:
+                tts = lk_tts.NoOpTTS()
+            logger.info(f"TTS initialized: {type(tts).__name__}")
+            if TTS_CACHE_ENABLED:
+                tts = CachedTTS(tts, voice_id=self.tts_voice_id, model_id=self.tts_model_id)
+                logger.info("TTS response cache enabled")
+            self.tts = tts
+
+            if PROVIDER_PREWARM:
+                await self._prewarm()
+            self._started = True
+            self.startup_seconds = time.perf_counter() - started_at
+            logger.info(f"Provider pool ready in {self.startup_seconds:.2f}s")
+
+    async def _prewarm(self):
+        """Open provider connections ahead of the first job."""
+        for plugin in (self.stt, self.tts):
+            prewarm = getattr(plugin, "prewarm", None)
+            if callable(prewarm):
+                try:
+                    prewarm()
+                except Exception as e:
+                    logger.warning(f"Failed to prewarm {type(plugin).__name__}: {e}")
+        if self.openai_client is not None:
+            try:
+                await asyncio.wait_for(self.openai_client.models.list(), PROVIDER_PREWARM_TIMEOUT)
+            except Exception as e:
+                logger.warning(f"Failed to prewarm OpenAI connection: {e}")
+
+    def _new_llm(self):
+        if self.openai_client is None:
+            return lk_llm.NoOpLLM()
+        return self._openai_llm(model=self.llm_model, client=self.openai_client)
+
+    @asynccontextmanager
+    async def lease(self):
+        """Lease per-session provider handles for the duration of a job."""
+        await self.start()
+        self.active_leases += 1
+        self.total_leases += 1
+        try:
+            yield SessionProviders(
+                stt=self.stt,
+                llm=self._new_llm(),
+                tts=self.tts,
+                tts_voice_id=self.tts_voice_id,
+                tts_model_id=self.tts_model_id,
+            )
+        finally:
+            self.active_leases -= 1
+
+    def stats(self) -> dict:
+        return {
+            "started": self._started,
+            "startup_seconds": self.startup_seconds,
+            "active_leases": self.active_leases,
+            "total_leases": self.total_leases,
+            "http": self.http.stats(),
+        }
+
+    async def close(self):
+        if self.openai_client is not None:
+            await self.openai_client.close()
+            self.openai_client = None
+        await self.http.close()
+        self._started = False
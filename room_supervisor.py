@@ -0,0 +1,242 @@
+import asyncio
+import os
+import random
+import time
+import logging
+
+from backend_client import get_backend_client
+
+logger = logging.getLogger(__name__)
+
+# "env" reads AGENT_ROOMS / AGENT_ROOM, "http" polls ROOM_SOURCE_URL, "local" uses the in-process stand-in
+ROOM_SOURCE = os.getenv("ROOM_SOURCE", "env" if os.getenv("AGENT_ROOMS") or os.getenv("AGENT_ROOM") else "local")
+ROOM_SOURCE_URL = os.getenv("ROOM_SOURCE_URL")
+ROOM_POLL_INTERVAL = float(os.getenv("ROOM_POLL_INTERVAL", "10"))
+ROOM_MAX_CONCURRENCY = int(os.getenv("ROOM_MAX_CONCURRENCY", "50"))
+ROOM_RESTART_BACKOFF_BASE = float(os.getenv("ROOM_RESTART_BACKOFF_BASE", "1"))
+ROOM_RESTART_BACKOFF_MAX = float(os.getenv("ROOM_RESTART_BACKOFF_MAX", "300"))
+# A room that stays up this long is considered healthy again and its backoff resets
+ROOM_STABLE_SECONDS = float(os.getenv("ROOM_STABLE_SECONDS", "60"))
+# Serve GET /health with the supervisor state on this port (0 disables)
+SUPERVISOR_HEALTH_PORT = int(os.getenv("SUPERVISOR_HEALTH_PORT", "0"))
+
+
+class EnvRoomSource:
+    """Fixed room list from AGENT_ROOMS (comma separated) or AGENT_ROOM."""
+
+    def __init__(self, spec=None):
+        spec = spec if spec is not None else os.getenv("AGENT_ROOMS") or os.getenv("AGENT_ROOM", "")
+        self.rooms = [room.strip() for room in spec.split(",") if room.strip()]
+
+    async def list_rooms(self) -> list:
+        return list(self.rooms)
+
+
+class HttpRoomSource:
+    """Polls a backend endpoint answering `{"rooms": ["name", ...]}` (or a list of `{"name": ...}`)."""
+
+    def __init__(self, url, api_key=None):
+        self.url = url
+        self.api_key = api_key
+
+    async def list_rooms(self) -> list:
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        async with get_backend_client().get(self.url, headers=headers) as resp:
+            resp.raise_for_status()
+            data = await resp.json()
+        rooms = data.get("rooms", []) if isinstance(data, dict) else data
+        return [room["name"] if isinstance(room, dict) else room for room in rooms]
+
+
+class LocalRoomSource:
+    """In-process stand-in room directory for local runs; starts with one generated room."""
+
+    def __init__(self, rooms=None):
+        self.rooms = list(rooms) if rooms is not None else [f"sync-jarvis-{int(time.time())}"]
+
+    def add(self, room_name):
+        if room_name not in self.rooms:
+            self.rooms.append(room_name)
+
+    def remove(self, room_name):
+        if room_name in self.rooms:
+            self.rooms.remove(room_name)
+
+    async def list_rooms(self) -> list:
+        return list(self.rooms)
+
+
+def get_room_source(kind=ROOM_SOURCE):
+    if kind == "env":
+        return EnvRoomSource()
+    if kind == "http":
+        if not ROOM_SOURCE_URL:
+            raise ValueError("ROOM_SOURCE=http requires ROOM_SOURCE_URL")
+        return HttpRoomSource(ROOM_SOURCE_URL, os.getenv("OPTIFLOW_BACKEND_API_KEY"))
+    if kind == "local":
+        return LocalRoomSource()
+    raise ValueError(f"Unknown room source: {kind}")
+
+
+class _RoomState:
+    __slots__ = ("name", "task", "agent", "state", "restarts", "failures", "last_error", "connected_at", "retry_at")
+
+    def __init__(self, name):
+        self.name = name
+        self.task = None
+        self.agent = None
+        self.state = "starting"
+        self.restarts = 0
+        self.failures = 0
+        self.last_error = None
+        self.connected_at = None
+        self.retry_at = None
+
+
+class RoomSupervisor:
+    """Runs one agent per room concurrently in a single event loop.
+
+    Rooms come from a pluggable source polled every `poll_interval` seconds. At most
+    `max_rooms` agents run at once; further rooms wait for a free slot. An agent that
+    fails or disconnects is restarted with full-jitter exponential backoff, and rooms that
+    disappear from the source are stopped.
+    """
+
+    def __init__(
+        self,
+        source,
+        agent_factory,
+        max_rooms=ROOM_MAX_CONCURRENCY,
+        poll_interval=ROOM_POLL_INTERVAL,
+        backoff_base=ROOM_RESTART_BACKOFF_BASE,
+        backoff_max=ROOM_RESTART_BACKOFF_MAX,
+    ):
+        self.source = source
+        self.agent_factory = agent_factory
+        self.max_rooms = max_rooms
+        self.poll_interval = poll_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rooms = {}
+        self.waiting = []
+        self.source_errors = 0
+        self._stopping = False
+
+    async def run(self):
+        """Poll the room source and reconcile running agents until stopped."""
+        try:
+            while not self._stopping:
+                try:
+                    await self.reconcile(await self.source.list_rooms())
+                except Exception as e:
+                    self.source_errors += 1
+                    logger.error(f"Failed to list rooms: {e}")
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            await self.stop()
+
+    async def reconcile(self, room_names):
+        wanted = list(dict.fromkeys(room_names))
+        for name in list(self.rooms):
+            if name not in wanted:
+                logger.info(f"Room {name} is no longer listed, stopping its agent")
+                await self._stop_room(name)
+
+        previously_waiting = len(self.waiting)
+        self.waiting = []
+        for name in wanted:
+            if name in self.rooms:
+                continue
+            if len(self.rooms) >= self.max_rooms:
+                self.waiting.append(name)
+                continue
+            state = self.rooms[name] = _RoomState(name)
+            state.task = asyncio.create_task(self._supervise(state))
+        if self.waiting and len(self.waiting) != previously_waiting:
+            logger.warning(f"{len(self.waiting)} rooms waiting for a free slot (limit {self.max_rooms})")
+
+    async def _supervise(self, state):
+        while not self._stopping:
+            state.agent = self.agent_factory(state.name)
+            state.state = "running"
+            state.connected_at = time.time()
+            started = time.monotonic()
+            try:
+                await state.agent.run()
+                if self._stopping:
+                    return
+                raise RuntimeError("agent exited")
+            except asyncio.CancelledError:
+                await self._stop_agent(state)
+                raise
+            except Exception as e:
+                await self._stop_agent(state)
+                if time.monotonic() - started >= ROOM_STABLE_SECONDS:
+                    state.failures = 0
+                state.failures += 1
+                state.restarts += 1
+                state.last_error = str(e) or type(e).__name__
+                state.connected_at = None
+                # Full jitter exponential backoff
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (state.failures - 1)))
+                state.state = "backoff"
+                state.retry_at = time.time() + delay
+                logger.error(f"Agent for room {state.name} failed ({state.last_error}); restarting in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                state.retry_at = None
+
+    async def _stop_agent(self, state):
+        if state.agent is None:
+            return
+        try:
+            await state.agent.stop()
+        except Exception as e:
+            logger.warning(f"Error stopping agent for room {state.name}: {e}")
+        state.agent = None
+
+    async def _stop_room(self, name):
+        state = self.rooms.pop(name, None)
+        if state is None or state.task is None:
+            return
+        state.task.cancel()
+        await asyncio.gather(state.task, return_exceptions=True)
+
+    async def stop(self):
+        """Stop every room's agent."""
+        self._stopping = True
+        await asyncio.gather(*(self._stop_room(name) for name in list(self.rooms)), return_exceptions=True)
+
+    def health(self) -> dict:
+        now = time.time()
+        rooms = {}
+        for name, state in self.rooms.items():
+            rooms[name] = {
+                "state": state.state,
+                "restarts": state.restarts,
+                "last_error": state.last_error,
+                "uptime": round(now - state.connected_at, 1) if state.connected_at else 0,
+                "retry_in": round(max(0.0, state.retry_at - now), 1) if state.retry_at else None,
+            }
+        return {
+            "active_rooms": sum(1 for state in self.rooms.values() if state.state == "running"),
+            "backoff_rooms": sum(1 for state in self.rooms.values() if state.state == "backoff"),
+            "waiting_rooms": len(self.waiting),
+            "max_rooms": self.max_rooms,
+            "source_errors": self.source_errors,
+            "rooms": rooms,
+        }
+
+    async def serve_health(self, port=SUPERVISOR_HEALTH_PORT):
+        """Serve the supervisor state on GET /health."""
+        from aiohttp import web
+
+        async def handle(request):
+            return web.json_response(self.health())
+
+        app = web.Application()
+        app.router.add_get("/health", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, "0.0.0.0", port).start()
+        logger.info(f"Supervisor health at http://0.0.0.0:{port}/health")
+        return runner
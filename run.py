@@ -1,6 +1,8 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
 import uvicorn
 import threading
+import multiprocessing
 import os
 import json
 import sys
@@ -8,6 +10,9 @@ import time
 import asyncio
 from dotenv import load_dotenv
 import traceback
+from turn_metrics import metrics
+from log_setup import configure_logging
+from worker_pool import WorkerPool, worker_count
 
 # Load environment variables
 load_dotenv()
@@ -22,12 +27,16 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 DEEPGRAM_API_KEY = os.getenv("DEEPGRAM_API_KEY")
 ELEVENLABS_API_KEY = os.getenv("ELEVENLABS_API_KEY")
 
+# Agent worker processes started by __main__ when WORKER_PROCESSES is set
+worker_pool = None
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint for Render.com"""
     # This health check doesn't try to import the agent code, making it more robust
     return {
         "status": "healthy",
+        "workers": worker_pool.health() if worker_pool is not None else None,
         "livekit_connected": bool(LIVEKIT_URL and LIVEKIT_API_KEY and LIVEKIT_API_SECRET),
         "openai_available": bool(OPENAI_API_KEY),
         "environment": {
@@ -40,6 +49,16 @@ async def health_check():
         }
     }
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus-style turn latency histograms and worker stats"""
+    # Includes the agent's metrics once main_agent has been imported in this process,
+    # or the latest snapshot of every worker process in pool mode
+    text = metrics.render()
+    if worker_pool is not None:
+        text += worker_pool.render_worker_metrics()
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
 def run_agent():
     """Run the agent in a separate thread"""
     try:
@@ -65,9 +84,24 @@ def delayed_agent_start():
     time.sleep(5)
     run_agent()
 
-agent_thread = threading.Thread(target=delayed_agent_start)
-agent_thread.daemon = True
-agent_thread.start()
+if __name__ == "__main__":
+    # Only in this process; pool children set up their own logging after they are forked
+    configure_logging()
+
+if __name__ == "__main__" and worker_count() > 0:
+    # Pool mode: agent processes are forked from a server that has already imported main_agent
+    worker_pool = WorkerPool()
+    metrics.register_collector("worker_pool", worker_pool.stats)
+    worker_pool.start()
+elif multiprocessing.parent_process() is None:
+    # Not in the worker processes, which re-import this module
+    agent_thread = threading.Thread(target=delayed_agent_start)
+    agent_thread.daemon = True
+    agent_thread.start()
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    try:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
+    finally:
+        if worker_pool is not None:
+            worker_pool.stop()
@@ -1,21 +1,13 @@
 import os
 import logging
 import asyncio
-import json
-import time
 from livekit import rtc
-import aiohttp
 from datetime import datetime
+from log_setup import configure_logging
+from token_service import get_token_service
+from room_supervisor import RoomSupervisor, get_room_source, SUPERVISOR_HEALTH_PORT
+from data_channel import DataChannel, resolve_encoding
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("agent.log"),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger("simple-agent")
 
 # Environment variables with defaults
@@ -23,12 +15,17 @@ LIVEKIT_URL = os.environ.get("LIVEKIT_URL", "wss://isyncsosync-p1sl1ryj.livekit.
 LIVEKIT_API_KEY = os.environ.get("LIVEKIT_API_KEY", "APIcPGS63mCxqbP")
 LIVEKIT_API_SECRET = os.environ.get("LIVEKIT_API_SECRET", "AxD4cT19ffntf1YXfDQDZmbzkj3VwdMiqWIcVbPLgyEB")
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+# Stable identity so cached tokens are reused and a reconnect replaces the previous participant
+AGENT_IDENTITY = os.environ.get("AGENT_IDENTITY", "agent-jarvis")
 
 class SimpleVoiceAgent:
     def __init__(self, room_name):
         self.room_name = room_name
         self.room = None
+        self.data_channel = None
         self.running = True
+        self._done = asyncio.Event()
+        self._disconnected = False
     
     async def connect(self):
         logger.info(f"Connecting to room: {self.room_name}")
@@ -42,59 +39,36 @@ class SimpleVoiceAgent:
         # Connect to room
         await self.room.connect(LIVEKIT_URL, token)
         logger.info(f"Connected to room: {self.room_name}")
+        # Messages are broadcast to every client, so binary only when DATA_CHANNEL_ENCODING forces it
+        self.data_channel = DataChannel(self._publish, encoding=resolve_encoding())
         
         # Set up event listeners
         self.room.on(rtc.RoomEvent.ParticipantConnected, self._on_participant_connected)
+        self.room.on(rtc.RoomEvent.Disconnected, self._on_disconnected)
         
         # Send initial greeting after a delay
         await asyncio.sleep(2)
         await self._send_greeting()
     
     async def _create_token(self):
-        """Create a LiveKit token for the agent"""
-        # Import locally to avoid dependency issues
-        try:
-            from livekit.tokens import AccessToken, VideoGrant
-            
-            # Create access token with server API key and secret
-            at = AccessToken(LIVEKIT_API_KEY, LIVEKIT_API_SECRET)
-            
-            # Set identity for this agent
-            identity = f"agent-jarvis-{int(time.time())}"
-            at.identity = identity
-            at.name = "Jarvis"
-            
-            # Define grant (permissions)
-            grant = VideoGrant(
-                room=self.room_name,
-                room_join=True,
-                can_publish=True,
-                can_subscribe=True,
-                can_publish_data=True
-            )
-            at.add_grant(grant)
-            
-            # Generate JWT token
-            return at.to_jwt()
-            
-        except ImportError:
-            # Fall back to making HTTP request if livekit.tokens is not available
-            logger.info("Using HTTP fallback for token generation")
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"https://app.isyncso.com/api/livekit/token",
-                    json={"room": self.room_name, "identity": f"agent-jarvis-{int(time.time())}"}
-                ) as resp:
-                    if resp.status != 200:
-                        raise RuntimeError(f"Failed to get token: {await resp.text()}")
-                    data = await resp.json()
-                    return data["token"]
+        """Create a LiveKit token for the agent, minted locally and reused across joins"""
+        token, _ = get_token_service(LIVEKIT_API_KEY, LIVEKIT_API_SECRET).get_token(
+            self.room_name, AGENT_IDENTITY, name="Jarvis"
+        )
+        return token
     
     async def _on_participant_connected(self, participant):
         """Handle new participant joining"""
         logger.info(f"Participant connected: {participant.identity}")
         await self._send_greeting()
     
+    def _on_disconnected(self, *args):
+        """The room connection dropped; wake run() so the supervisor can reconnect"""
+        if self.running:
+            logger.warning(f"Disconnected from room: {self.room_name}")
+            self._disconnected = True
+        self._done.set()
+    
     async def _send_greeting(self):
         """Send a greeting message to the room"""
         if not self.room:
@@ -107,54 +81,52 @@ class SimpleVoiceAgent:
             "timestamp": datetime.now().isoformat()
         }
         
-        # Encode and publish the message
-        data = json.dumps(message).encode()
-        await self.room.local_participant.publish_data(data, reliability=rtc.DataPacket_Kind.RELIABLE)
+        await self.data_channel.send(message)
+        # send() only queues the message; wait until it is published
+        await self.data_channel.flush()
         logger.info(f"Sent greeting message")
     
+    async def _publish(self, packet):
+        """Data channel transport: one reliable packet to the room"""
+        data = packet.encode() if isinstance(packet, str) else packet
+        await self.room.local_participant.publish_data(data, reliability=rtc.DataPacket_Kind.RELIABLE)
+    
     async def run(self):
         """Run the agent until stopped"""
         await self.connect()
         
-        # Keep the agent running
-        while self.running:
-            await asyncio.sleep(1)
+        # Keep the agent running until stopped or disconnected
+        await self._done.wait()
+        if self._disconnected:
+            raise RuntimeError(f"Lost connection to room {self.room_name}")
     
     async def stop(self):
         """Stop the agent gracefully"""
         self.running = False
+        self._done.set()
+        if self.data_channel:
+            try:
+                await self.data_channel.close()
+            except Exception as e:
+                logger.warning(f"Failed to flush data channel: {e}")
         if self.room:
             await self.room.disconnect()
             logger.info("Disconnected from room")
 
 async def find_and_join_rooms():
-    """Find rooms and join them"""
-    while True:
-        try:
-            # In a real implementation, this would query LiveKit for rooms to join
-            # For this simple agent, we'll just scan for rooms in our database or join any requested
-            room_name = os.environ.get("AGENT_ROOM")
-            
-            if not room_name:
-                # If no specific room is set, try to connect to a default room
-                # This would be replaced with logic to find active rooms
-                current_time = int(time.time())
-                room_name = f"sync-jarvis-{current_time}"
-            
-            logger.info(f"Found room to join: {room_name}")
-            
-            # Create and run agent for this room
-            agent = SimpleVoiceAgent(room_name)
-            await agent.run()
-            
-            # Wait before looking for more rooms
-            await asyncio.sleep(10)
-            
-        except Exception as e:
-            logger.error(f"Error joining room: {e}", exc_info=True)
-            await asyncio.sleep(5)  # Wait before retrying
+    """Find rooms and run an agent in each of them concurrently"""
+    supervisor = RoomSupervisor(get_room_source(), SimpleVoiceAgent)
+    health_runner = None
+    if SUPERVISOR_HEALTH_PORT:
+        health_runner = await supervisor.serve_health()
+    try:
+        await supervisor.run()
+    finally:
+        if health_runner is not None:
+            await health_runner.cleanup()
 
 if __name__ == "__main__":
+    configure_logging()
     try:
         logger.info("Starting simple voice agent")
         asyncio.run(find_and_join_rooms())
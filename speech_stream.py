@@ -0,0 +1,281 @@
+import asyncio
+import os
+import re
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Chunks shorter than this only end at sentence boundaries, not at commas or semicolons
+SPEECH_CLAUSE_MIN_CHARS = int(os.getenv("SPEECH_CLAUSE_MIN_CHARS", "60"))
+# Lower threshold for the first chunk of a response so audio starts sooner
+SPEECH_FIRST_CLAUSE_MIN_CHARS = int(os.getenv("SPEECH_FIRST_CLAUSE_MIN_CHARS", "25"))
+SPEECH_MAX_CHUNK_CHARS = int(os.getenv("SPEECH_MAX_CHUNK_CHARS", "250"))
+# Number of chunks synthesized ahead of the one currently playing
+SPEECH_TTS_LOOKAHEAD = int(os.getenv("SPEECH_TTS_LOOKAHEAD", "2"))
+# Speaking rate used to estimate how much of a partly played chunk was heard
+SPEECH_CHARS_PER_SECOND = float(os.getenv("SPEECH_CHARS_PER_SECOND", "15"))
+
+ABBREVIATIONS = frozenset(
+    "mr mrs ms dr prof sr jr st mt vs etc inc ltd co corp dept approx est fig no nos vol "
+    "jan feb mar apr jun jul aug sep sept oct nov dec mon tue wed thu fri sat sun "
+    "e.g i.e a.m p.m u.s u.k".split()
+)
+
+# Candidate boundary: sentence punctuation (plus closing quotes/brackets) or a clause mark, then whitespace
+# Requiring whitespace after the mark keeps dots inside URLs, emails and decimals from splitting
+_BOUNDARY_RE = re.compile(r"(?:[.!?…]+[\"')\]]*|[,;:—])(?=\s)|\n")
+
+
+class SentenceChunker:
+    """Splits streaming LLM text into speakable chunks on sentence and clause boundaries.
+
+    Periods in abbreviations ("Dr.", "e.g."), initials, decimals and URLs do not end a chunk.
+    """
+
+    def __init__(
+        self,
+        clause_min_chars=SPEECH_CLAUSE_MIN_CHARS,
+        first_clause_min_chars=SPEECH_FIRST_CLAUSE_MIN_CHARS,
+        max_chunk_chars=SPEECH_MAX_CHUNK_CHARS,
+    ):
+        self.clause_min_chars = clause_min_chars
+        self.first_clause_min_chars = first_clause_min_chars
+        self.max_chunk_chars = max_chunk_chars
+        self._buffer = ""
+        self._emitted = 0
+
+    def push(self, text: str) -> list:
+        """Add streamed text; returns the chunks completed by it."""
+        self._buffer += text
+        chunks = []
+        while True:
+            end = self._find_boundary()
+            if end is None:
+                break
+            chunk = self._buffer[:end].strip()
+            self._buffer = self._buffer[end:]
+            if chunk:
+                chunks.append(chunk)
+                self._emitted += 1
+        return chunks
+
+    def flush(self) -> list:
+        """Return whatever text is left at the end of the response."""
+        chunk = self._buffer.strip()
+        self._buffer = ""
+        if not chunk:
+            return []
+        self._emitted += 1
+        return [chunk]
+
+    def _find_boundary(self):
+        buffer = self._buffer
+        clause_min = self.first_clause_min_chars if self._emitted == 0 else self.clause_min_chars
+        for match in _BOUNDARY_RE.finditer(buffer):
+            end = match.end()
+            mark = match.group(0)
+            if mark == "\n":
+                return end
+            if mark[0] in ",;:—":
+                if len(buffer[:end].strip()) >= clause_min:
+                    return end
+                continue
+            if mark[0] == "." and len(mark.rstrip("\"')]")) == 1 and not self._ends_sentence(buffer[:match.start()]):
+                continue
+            return end
+        if len(buffer) > self.max_chunk_chars:
+            # No natural boundary yet; split at the last space to keep latency bounded
+            split = buffer.rfind(" ", 0, self.max_chunk_chars)
+            return split if split > 0 else self.max_chunk_chars
+        return None
+
+    @staticmethod
+    def _ends_sentence(before: str) -> bool:
+        words = before.split()
+        if not words:
+            return False
+        word = words[-1].strip("\"'([")
+        if word.lower().rstrip(".") in ABBREVIATIONS:
+            return False
+        # Initials such as "J. R. R. Tolkien"
+        if len(word) == 1 and word.isalpha() and word.isupper():
+            return False
+        return True
+
+
+class SentenceStreamer:
+    """Streams LLM text into TTS chunk by chunk so playback starts after the first sentence.
+
+    Up to `lookahead` chunks are synthesized ahead of the one currently playing. The text of
+    chunks whose audio has been fully yielded is available as `spoken_text`. `cancel()` stops
+    playback at the next frame, closes the text stream and cancels pending synthesis.
+
+    Audio is yielded faster than real time and buffered downstream, so a playout clock tracks
+    when each yielded frame actually plays: it starts when the frame is yielded or when the
+    audio before it finishes, whichever is later. `heard_text()` is based on that clock.
+    """
+
+    def __init__(self, tts, lookahead=SPEECH_TTS_LOOKAHEAD, chunker=None):
+        self.tts = tts
+        self.lookahead = lookahead
+        self.chunker = chunker or SentenceChunker()
+        self.spoken_chunks = []
+        self.current_chunk = None
+        # Audio seconds yielded so far for `current_chunk`
+        self.current_chunk_seconds = 0.0
+        # Per chunk: [text, [[playout start, playout end], ...], all audio yielded]
+        self._playout = []
+        self._playout_end = 0.0
+        self.chunks_started = 0
+        self.received_text = ""
+        self.cancelled_at = None
+        # perf_counter timestamps of the first TTS request and the first audio it returned
+        self.first_request_at = None
+        self.first_audio_at = None
+        self._tasks = set()
+        self._cancelled = False
+        self._pending = None
+        self._frames = None
+
+    @property
+    def spoken_text(self) -> str:
+        return " ".join(self.spoken_chunks)
+
+    def heard_text(self, chars_per_second=SPEECH_CHARS_PER_SECOND, now=None) -> str:
+        """Chunks played out by `now` plus the played part of the next one, cut at a word.
+
+        The played part is proportional to its audio when the chunk's audio is complete, and
+        estimated from `chars_per_second` while it is still being synthesized.
+        """
+        now = time.perf_counter() if now is None else now
+        heard = []
+        for chunk, segments, complete in self._playout:
+            total = sum(end - start for start, end in segments)
+            played = sum(max(0.0, min(end, now) - start) for start, end in segments)
+            if complete and played >= total:
+                heard.append(chunk)
+                continue
+            if complete and total:
+                part = chunk[:int(len(chunk) * played / total)]
+            else:
+                part = chunk[:int(played * chars_per_second)]
+            if len(part) < len(chunk) and not chunk[len(part)].isspace():
+                # Drop the partly spoken word
+                part = part[:part.rfind(" ")] if " " in part else ""
+            heard.append(part.strip())
+            break
+        return " ".join(heard).strip()
+
+    def _schedule_playout(self, frame):
+        duration = frame.samples_per_channel / frame.sample_rate
+        start = max(time.perf_counter(), self._playout_end)
+        self._playout_end = start + duration
+        segments = self._playout[-1][1]
+        if segments and segments[-1][1] == start:
+            segments[-1][1] = self._playout_end
+        else:
+            segments.append([start, self._playout_end])
+        return duration
+
+    async def run(self, text_stream):
+        """Consume an async iterable of text deltas and yield synthesized audio in order."""
+        pending = self._pending = asyncio.Queue(maxsize=max(1, self.lookahead))
+        producer = asyncio.create_task(self._produce(text_stream, pending))
+        self._tasks.add(producer)
+        try:
+            while not self._cancelled:
+                item = await pending.get()
+                if item is None or self._cancelled:
+                    break
+                chunk, frames = item
+                self.current_chunk = chunk
+                self.current_chunk_seconds = 0.0
+                self._playout.append([chunk, [], False])
+                self._frames = frames
+                while True:
+                    audio = await frames.get()
+                    if audio is None or self._cancelled:
+                        break
+                    if isinstance(audio, Exception):
+                        raise audio
+                    frame = getattr(audio, "frame", None)
+                    if frame is not None and getattr(frame, "sample_rate", 0):
+                        self.current_chunk_seconds += self._schedule_playout(frame)
+                    yield audio
+                if self._cancelled:
+                    break
+                self._playout[-1][2] = True
+                self.spoken_chunks.append(chunk)
+                self.current_chunk = None
+            if not self._cancelled:
+                await producer
+        finally:
+            self._cancel_tasks()
+
+    async def _produce(self, text_stream, pending):
+        try:
+            async for delta in text_stream:
+                self.received_text += delta
+                for chunk in self.chunker.push(delta):
+                    await pending.put((chunk, self._start_synthesis(chunk)))
+            for chunk in self.chunker.flush():
+                await pending.put((chunk, self._start_synthesis(chunk)))
+        except asyncio.CancelledError:
+            # Close the text stream so the streaming LLM request is abandoned, not left to finish
+            aclose = getattr(text_stream, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            raise
+        except Exception as e:
+            logger.error(f"LLM text stream failed: {e}")
+        await pending.put(None)
+
+    def _start_synthesis(self, chunk):
+        frames = asyncio.Queue()
+        self.chunks_started += 1
+        if self.first_request_at is None:
+            self.first_request_at = time.perf_counter()
+
+        async def synthesize():
+            try:
+                async for audio in self.tts.synthesize(chunk):
+                    if self.first_audio_at is None:
+                        self.first_audio_at = time.perf_counter()
+                    frames.put_nowait(audio)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"TTS failed for chunk {chunk!r}: {e}")
+                frames.put_nowait(e)
+            finally:
+                frames.put_nowait(None)
+
+        task = asyncio.create_task(synthesize())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return frames
+
+    def cancel(self):
+        """Stop playback, stop reading text and cancel pending synthesis requests."""
+        if self._cancelled:
+            return
+        self._cancelled = True
+        self.cancelled_at = time.perf_counter()
+        self._cancel_tasks()
+        # Wake run() if it is waiting for the next chunk or frame
+        for waiting in (self._pending, self._frames):
+            if waiting is not None:
+                try:
+                    waiting.put_nowait(None)
+                except asyncio.QueueFull:
+                    pass
+
+    def _cancel_tasks(self):
+        for task in list(self._tasks):
+            task.cancel()
+        self._tasks.clear()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-import requests
+import math
 import os
 import json
 from dotenv import load_dotenv
@@ -9,6 +9,9 @@ from fastapi import FastAPI, HTTPException
 from fastapi.responses import JSONResponse
 import uvicorn
 from pydantic import BaseModel
+from presence_service import local_presence_backend
+from backend_client import close_backend_client
+from health import HealthMonitor, livekit_probe, openai_probe
 
 # Load environment variables
 load_dotenv()
@@ -29,28 +32,7 @@ class HealthResponse(BaseModel):
     livekit_connected: bool
     openai_available: bool
     environment: dict
-
-@app.get("/health")
-async def health_check():
-    """Check if the agent service is healthy and environment is configured properly"""
-    env_status = {
-        "livekit_url": mask_string(os.getenv("LIVEKIT_URL", "")),
-        "livekit_api_key": mask_string(os.getenv("LIVEKIT_API_KEY", "")),
-        "livekit_api_secret": "***masked***" if os.getenv("LIVEKIT_API_SECRET") else "not set",
-        "openai_api_key": "***masked***" if os.getenv("OPENAI_API_KEY") else "not set",
-        "deepgram_api_key": "***masked***" if os.getenv("DEEPGRAM_API_KEY") else "not set",
-        "elevenlabs_api_key": "***masked***" if os.getenv("ELEVENLABS_API_KEY") else "not set",
-    }
-    
-    livekit_status = check_livekit_connection()
-    openai_status = check_openai_status()
-    
-    return HealthResponse(
-        status="healthy",
-        livekit_connected=livekit_status,
-        openai_available=openai_status,
-        environment=env_status
-    )
+    checks: dict
 
 def mask_string(s: str) -> str:
     """Mask a string to show only the first few and last few characters"""
@@ -60,47 +42,57 @@ def mask_string(s: str) -> str:
         return "***masked***"
     return s[:4] + "..." + s[-4:]
 
-def check_livekit_connection() -> bool:
-    """Check if LiveKit server is accessible"""
-    livekit_url = os.getenv("LIVEKIT_URL", "")
-    if not livekit_url:
-        return False
-    
-    # Convert wss:// to https:// for the health check
-    if livekit_url.startswith("wss://"):
-        http_url = livekit_url.replace("wss://", "https://")
-    else:
-        http_url = livekit_url
-        
-    try:
-        # Most LiveKit servers have a /health endpoint
-        response = requests.get(f"{http_url}/.well-known/livekit/health", timeout=5)
-        return response.status_code == 200
-    except Exception as e:
-        print(f"LiveKit connection check failed: {e}")
-        return False
-
-def check_openai_status() -> bool:
-    """Check if OpenAI API is accessible"""
-    openai_api_key = os.getenv("OPENAI_API_KEY", "")
-    if not openai_api_key:
-        return False
-    
-    try:
-        # Make a simple API call to OpenAI
-        headers = {
-            "Authorization": f"Bearer {openai_api_key}",
-            "Content-Type": "application/json"
-        }
-        response = requests.get(
-            "https://api.openai.com/v1/models", 
-            headers=headers,
-            timeout=5
+# Environment doesn't change while the server runs
+ENV_STATUS = {
+    "livekit_url": mask_string(os.getenv("LIVEKIT_URL", "")),
+    "livekit_api_key": mask_string(os.getenv("LIVEKIT_API_KEY", "")),
+    "livekit_api_secret": "***masked***" if os.getenv("LIVEKIT_API_SECRET") else "not set",
+    "openai_api_key": "***masked***" if os.getenv("OPENAI_API_KEY") else "not set",
+    "deepgram_api_key": "***masked***" if os.getenv("DEEPGRAM_API_KEY") else "not set",
+    "elevenlabs_api_key": "***masked***" if os.getenv("ELEVENLABS_API_KEY") else "not set",
+}
+
+# Dependencies are probed in the background; health endpoints only read the cached results
+health_probes = {"livekit": livekit_probe(os.getenv("LIVEKIT_URL"))}
+if os.getenv("OPENAI_API_KEY"):
+    health_probes["openai"] = openai_probe(os.getenv("OPENAI_API_KEY"))
+health_monitor = HealthMonitor(health_probes)
+
+@app.on_event("startup")
+async def start_health_monitor():
+    health_monitor.start()
+
+@app.on_event("shutdown")
+async def stop_health_monitor():
+    await health_monitor.stop()
+    await close_backend_client()
+
+def health_response(snapshot: dict) -> HealthResponse:
+    checks = snapshot["checks"]
+    return HealthResponse(
+        status=snapshot["status"],
+        livekit_connected=checks["livekit"]["ok"],
+        openai_available=checks.get("openai", {}).get("ok", False),
+        environment=ENV_STATUS,
+        checks=checks
+    )
+
+@app.get("/health")
+async def health_check():
+    """Check if the agent service is healthy, from the latest background probe results"""
+    return health_response(health_monitor.snapshot())
+
+@app.get("/health/deep")
+async def deep_health_check():
+    """Probe all dependencies now; rate limited to protect them from frequent callers"""
+    snapshot, retry_after = await health_monitor.deep_check()
+    if snapshot is None:
+        return JSONResponse(
+            {"error": "Deep health check rate limited", "retry_after": round(retry_after, 1)},
+            status_code=429,
+            headers={"Retry-After": str(math.ceil(retry_after))}
         )
-        return response.status_code == 200
-    except Exception as e:
-        print(f"OpenAI connection check failed: {e}")
-        return False
+    return health_response(snapshot)
 
 class AgentRequestModel(BaseModel):
     room_name: str
@@ -127,12 +119,32 @@ async def test_agent(request: AgentRequestModel):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error testing agent: {str(e)}")
 
+class PresenceBulkRequest(BaseModel):
+    userIds: list[str]
+
+class PresenceOverrideRequest(BaseModel):
+    userId: str
+    inactive: bool = True
+
+@app.post("/api/presence/check-bulk")
+async def presence_check_bulk(request: PresenceBulkRequest):
+    """Local stand-in for the backend bulk presence endpoint used by the agent's presence service"""
+    return local_presence_backend.check_bulk(request.userIds)
+
+@app.post("/api/presence/override")
+async def presence_override(request: PresenceOverrideRequest):
+    """Mark a user active or inactive in the local presence stand-in"""
+    local_presence_backend.set_inactive(request.userId, request.inactive)
+    return {"userId": request.userId, "inactive": request.inactive}
+
 if __name__ == "__main__":
     print("\n🎙️ Voice Agent Test Server 🎙️")
     print("==============================")
     print("This server provides endpoints to test the voice agent configuration.")
     print("Access the health check at: http://localhost:8000/health")
+    print("Probe dependencies on demand at: http://localhost:8000/health/deep")
     print("Send test agent requests to: http://localhost:8000/test/agent")
+    print("Local presence stand-in at: http://localhost:8000/api/presence/check-bulk")
     print("Access the API documentation at: http://localhost:8000/docs")
     print("----------------------------------------------")
     
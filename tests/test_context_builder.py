@@ -0,0 +1,35 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from context_builder import build_memory_block  # noqa: E402
+
+
+def test_mixed_timestamp_types_sort_chronologically():
+    items = [
+        {"role": "user", "content": "third", "timestamp": 1700000300},
+        {"role": "user", "content": "no time"},
+        {"role": "assistant", "content": "first", "createdAt": "2023-11-14T22:13:20Z"},
+        {"role": "user", "content": "second", "timestamp": 1700000100000},
+        {"role": "user", "content": "bad time", "createdAt": "yesterday"},
+    ]
+    text, stats = build_memory_block(items, policy="recent")
+    lines = text.split("\n")[1:]
+    assert lines == [
+        "user: no time",
+        "user: bad time",
+        "assistant: first",
+        "user: second",
+        "user: third",
+    ]
+    assert stats["kept"] == 5
+
+
+def test_items_without_time_keep_their_order():
+    items = [
+        {"role": "user", "content": "a"},
+        {"role": "assistant", "content": "b", "createdAt": ""},
+    ]
+    text, _ = build_memory_block(items)
+    assert text.split("\n")[1:] == ["user: a", "assistant: b"]
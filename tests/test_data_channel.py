@@ -0,0 +1,127 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_channel  # noqa: E402
+from data_channel import DataChannel, decode  # noqa: E402
+
+
+class Transport:
+    def __init__(self):
+        self.packets = []
+        self.open = asyncio.Event()
+        self.open.set()
+
+    async def __call__(self, packet):
+        await self.open.wait()
+        self.packets.append(packet)
+
+    def messages(self):
+        return [message for packet in self.packets for message in decode(packet)]
+
+
+def interim(text, participant="p1"):
+    return {"type": "user_transcript", "participant": participant, "transcript": text, "final": False}
+
+
+def test_interim_transcripts_coalesce_per_speaker():
+    async def scenario():
+        transport = Transport()
+        channel = DataChannel(transport, coalesce_ms=20, batch_ms=0)
+        for text in ["what", "what is", "what is our"]:
+            await channel.send(interim(text))
+        await channel.send(interim("hello", participant="p2"))
+        await asyncio.sleep(0.05)
+        await channel.close()
+        return transport, channel
+
+    transport, channel = asyncio.run(scenario())
+    assert [m["transcript"] for m in transport.messages()] == ["what is our", "hello"]
+    assert channel.coalesced == 2
+
+
+def test_final_transcript_replaces_pending_interim():
+    async def scenario():
+        transport = Transport()
+        channel = DataChannel(transport, coalesce_ms=1000, batch_ms=0)
+        await channel.send(interim("what is"))
+        await channel.send({**interim("What is our policy?"), "final": True})
+        await channel.close()
+        return transport
+
+    messages = asyncio.run(scenario()).messages()
+    assert [(m["transcript"], m["final"]) for m in messages] == [("What is our policy?", True)]
+
+
+def test_batches_split_at_the_byte_limit(monkeypatch):
+    monkeypatch.setattr(data_channel, "DATA_CHANNEL_JSON_BATCH", True)
+    monkeypatch.setattr(data_channel, "DATA_CHANNEL_BATCH_MAX_BYTES", 90)
+
+    async def scenario():
+        transport = Transport()
+        channel = DataChannel(transport, batch_ms=1000)
+        for i in range(4):
+            await channel.send({"type": "agent_status", "status": f"step-{i}"})
+        assert transport.packets == []
+        await channel.flush()
+        return transport, channel
+
+    transport, channel = asyncio.run(scenario())
+    # Each status encodes to 41 bytes, so two fit under the limit per packet
+    assert len(transport.packets) == 2
+    assert [m["status"] for m in transport.messages()] == ["step-0", "step-1", "step-2", "step-3"]
+    assert channel.batched == 4
+
+
+def test_errors_skip_the_batching_window(monkeypatch):
+    monkeypatch.setattr(data_channel, "DATA_CHANNEL_JSON_BATCH", True)
+
+    async def scenario():
+        transport = Transport()
+        channel = DataChannel(transport, batch_ms=10000)
+        await channel.send({"type": "agent_status", "status": "thinking"})
+        await channel.send({"type": "error", "message": "failed"})
+        await asyncio.sleep(0.01)
+        sent = transport.messages()
+        await channel.close()
+        return sent
+
+    assert [m["type"] for m in asyncio.run(scenario())] == ["agent_status", "error"]
+
+
+def test_full_queue_makes_senders_wait():
+    async def scenario():
+        transport = Transport()
+        transport.open.clear()
+        channel = DataChannel(transport, queue_size=1)
+        await channel.send({"type": "agent_status", "status": "a"})
+        # The writer holds "a" in the blocked transport; "b" fills the queue
+        await asyncio.sleep(0)
+        await channel.send({"type": "agent_status", "status": "b"})
+        blocked = asyncio.create_task(channel.send({"type": "agent_status", "status": "c"}))
+        await asyncio.sleep(0.01)
+        waited = not blocked.done()
+        transport.open.set()
+        await blocked
+        await channel.close()
+        return transport, channel, waited
+
+    transport, channel, waited = asyncio.run(scenario())
+    assert waited
+    assert channel.backpressure_waits == 1
+    assert [m["status"] for m in transport.messages()] == ["a", "b", "c"]
+
+
+def test_send_after_close_raises():
+    async def scenario():
+        channel = DataChannel(Transport())
+        await channel.close()
+        try:
+            await channel.send({"type": "agent_status"})
+        except RuntimeError:
+            return True
+        return False
+
+    assert asyncio.run(scenario())
@@ -0,0 +1,109 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dispatch import Dispatcher, DispatchRejected  # noqa: E402
+
+
+def test_unmanaged_until_first_heartbeat():
+    dispatcher = Dispatcher()
+    assert asyncio.run(dispatcher.dispatch("acme")) is None
+    assert dispatcher.stats()["unmanaged"] == 1
+
+
+def test_places_on_least_loaded_worker():
+    async def scenario():
+        dispatcher = Dispatcher()
+        dispatcher.heartbeat("a", capacity=4, active_sessions=3)
+        dispatcher.heartbeat("b", capacity=4, active_sessions=1)
+        return [await dispatcher.dispatch() for _ in range(3)]
+
+    assert asyncio.run(scenario()) == ["b", "b", "a"]
+
+
+def test_tenants_are_served_round_robin():
+    async def scenario():
+        dispatcher = Dispatcher(max_wait=1)
+        dispatcher.heartbeat("w", capacity=1, active_sessions=1)
+        order = []
+
+        async def request(tenant):
+            await dispatcher.dispatch(tenant)
+            order.append(tenant)
+
+        tasks = [asyncio.create_task(request(tenant)) for tenant in ["a", "a", "a", "b", "b"]]
+        await asyncio.sleep(0)
+        for _ in tasks:
+            # Free one slot at a time
+            dispatcher.heartbeat("w", capacity=1, active_sessions=0)
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(scenario()) == ["a", "b", "a", "b", "a"]
+
+
+def test_queue_limits_reject_with_retry_after():
+    async def scenario():
+        dispatcher = Dispatcher(max_queue=3, max_queue_per_tenant=2, max_wait=1)
+        dispatcher.heartbeat("w", capacity=1, active_sessions=1)
+        waiting = [asyncio.create_task(dispatcher.dispatch("a")) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(DispatchRejected, match="tenant queue full") as tenant_full:
+            await dispatcher.dispatch("a")
+        waiting.append(asyncio.create_task(dispatcher.dispatch("b")))
+        await asyncio.sleep(0)
+        with pytest.raises(DispatchRejected, match="dispatch queue full"):
+            await dispatcher.dispatch("c")
+        for task in waiting:
+            task.cancel()
+        await asyncio.gather(*waiting, return_exceptions=True)
+        return tenant_full.value, dispatcher
+
+    rejection, dispatcher = asyncio.run(scenario())
+    assert rejection.retry_after > 0
+    assert dispatcher.rejected == 2
+    assert dispatcher.queued == 0
+
+
+def test_waiting_request_times_out():
+    async def scenario():
+        dispatcher = Dispatcher(max_wait=0.01)
+        dispatcher.heartbeat("w", capacity=1, active_sessions=1)
+        with pytest.raises(DispatchRejected, match="no agent capacity"):
+            await dispatcher.dispatch()
+        return dispatcher
+
+    dispatcher = asyncio.run(scenario())
+    assert dispatcher.timed_out == 1
+    assert dispatcher.queued == 0
+
+
+def test_stale_workers_get_no_sessions_and_are_dropped():
+    async def scenario():
+        dispatcher = Dispatcher(max_wait=0.01, heartbeat_ttl=0.01)
+        dispatcher.heartbeat("w", capacity=4, active_sessions=0)
+        time.sleep(0.02)
+        with pytest.raises(DispatchRejected):
+            await dispatcher.dispatch()
+        return dispatcher
+
+    dispatcher = asyncio.run(scenario())
+    assert dispatcher.snapshot()["workers"] == []
+    assert dispatcher.stats()["workers"] == 0
+
+
+def test_worker_registrations_are_capped():
+    dispatcher = Dispatcher(max_workers=2)
+    dispatcher.heartbeat("a", capacity=1, active_sessions=0)
+    dispatcher.heartbeat("b", capacity=1, active_sessions=0)
+    with pytest.raises(ValueError):
+        dispatcher.heartbeat("c", capacity=100, active_sessions=0)
+    # Known workers keep reporting
+    dispatcher.heartbeat("a", capacity=2, active_sessions=1)
+    assert sorted(dispatcher.workers) == ["a", "b"]
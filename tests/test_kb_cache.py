@@ -0,0 +1,83 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import kb_cache  # noqa: E402
+from kb_cache import KnowledgeBaseCache, parse_ttls  # noqa: E402
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(kb_cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_queries_are_normalized():
+    cache = KnowledgeBaseCache(ttls={})
+    cache.put("u1", None, "What's the  refund policy?", "result")
+    assert cache.get("u1", None, "what s the refund policy") == "result"
+    assert cache.get("u2", None, "what s the refund policy") is None
+
+
+def test_entries_expire_after_their_type_ttl(clock):
+    cache = KnowledgeBaseCache(default_ttl=300, ttls={"personal": 60})
+    cache.put("u1", "personal", "notes", "mine")
+    cache.put("u1", "organization", "handbook", "shared")
+    clock[0] += 61
+    assert cache.get("u1", "personal", "notes") is None
+    assert cache.get("u1", "organization", "handbook") == "shared"
+    clock[0] += 240
+    assert cache.get("u1", "organization", "handbook") is None
+    assert cache.stats()["expirations"] == 2
+
+
+def test_negative_results_use_the_short_ttl(clock):
+    cache = KnowledgeBaseCache(default_ttl=300, negative_ttl=30, ttls={})
+    cache.put("u1", None, "unknown topic", "No results found", negative=True)
+    clock[0] += 29
+    assert cache.get("u1", None, "unknown topic") == "No results found"
+    assert cache.stats()["negative_hits"] == 1
+    clock[0] += 2
+    assert cache.get("u1", None, "unknown topic") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = KnowledgeBaseCache(max_entries=2, ttls={})
+    cache.put("u1", None, "a", "A")
+    cache.put("u1", None, "b", "B")
+    # Reading "a" makes "b" the least recently used
+    assert cache.get("u1", None, "a") == "A"
+    cache.put("u1", None, "c", "C")
+    assert cache.get("u1", None, "b") is None
+    assert cache.get("u1", None, "a") == "A"
+    assert cache.get("u1", None, "c") == "C"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_budget_evicts_and_skips_oversized_values():
+    cache = KnowledgeBaseCache(max_bytes=10, ttls={})
+    cache.put("u1", None, "a", "x" * 6)
+    cache.put("u1", None, "b", "y" * 6)
+    assert cache.get("u1", None, "a") is None
+    assert cache.stats()["bytes"] == 6
+    cache.put("u1", None, "c", "z" * 11)
+    assert cache.get("u1", None, "c") is None
+    assert cache.get("u1", None, "b") == "y" * 6
+
+
+def test_invalidation_by_user_and_org():
+    cache = KnowledgeBaseCache(ttls={})
+    cache.put("u1", None, "a", "A", org_id="o1")
+    cache.put("u2", None, "b", "B", org_id="o1")
+    cache.put("u3", None, "c", "C", org_id="o2")
+    assert cache.invalidate_user("u1") == 1
+    assert cache.invalidate_org("o1") == 1
+    assert cache.get("u3", None, "c") == "C"
+
+
+def test_parse_ttls_skips_invalid_entries():
+    assert parse_ttls("personal=120, team = 300,bogus,org=abc") == {"personal": 120.0, "team": 300.0}
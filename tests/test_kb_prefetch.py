@@ -0,0 +1,68 @@
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kb_prefetch import KnowledgeBasePrefetcher  # noqa: E402
+
+
+class FakeKnowledgeBase:
+    def __init__(self, result=None):
+        self.queries = []
+        self.result = result or json.dumps({"results": ["Enterprise refunds within 60 days"]})
+
+    async def search(self, query, user_id=None, org_id=None):
+        self.queries.append(query)
+        return self.result
+
+
+def run_turn(kb, transcripts, tool_query, **claim_ids):
+    async def turn():
+        prefetcher = KnowledgeBasePrefetcher(kb, user_id="u1", org_id="o1", debounce=0)
+        for text in transcripts[:-1]:
+            prefetcher.on_transcript(text)
+        prefetcher.on_transcript(transcripts[-1], is_final=True)
+        await asyncio.sleep(0)
+        result = await prefetcher.claim(tool_query, **claim_ids)
+        prefetcher.cancel_all()
+        return result, prefetcher.stats()
+
+    return asyncio.run(turn())
+
+
+def test_rewritten_tool_query_reuses_prefetch():
+    kb = FakeKnowledgeBase()
+    transcripts = [
+        "what is our refund",
+        "what is our refund policy for",
+        "What is our refund policy for enterprise customers?",
+    ]
+    result, stats = run_turn(kb, transcripts, "enterprise refund policies", user_id="u1", org_id="o1")
+    assert result == kb.result
+    assert stats["reused"] == 1
+    assert kb.queries == ["What is our refund policy for enterprise customers?"]
+
+
+def test_query_about_something_else_is_not_reused():
+    kb = FakeKnowledgeBase()
+    transcripts = ["What is our refund policy for enterprise customers?"]
+    result, _ = run_turn(kb, transcripts, "enterprise pricing", user_id="u1", org_id="o1")
+    assert result is None
+
+
+def test_narrower_query_than_transcript_is_not_reused():
+    kb = FakeKnowledgeBase()
+    transcripts = ["compare the refund policy and the onboarding checklist for enterprise customers"]
+    result, _ = run_turn(kb, transcripts, "refund policy", user_id="u1", org_id="o1")
+    assert result is None
+
+
+def test_other_user_and_failed_results_are_not_reused():
+    transcripts = ["What is our refund policy for enterprise customers?"]
+    result, _ = run_turn(FakeKnowledgeBase(), transcripts, "enterprise refund policy", user_id="u2", org_id="o1")
+    assert result is None
+    failing = FakeKnowledgeBase(result=json.dumps({"error": "backend unavailable"}))
+    result, _ = run_turn(failing, transcripts, "enterprise refund policy", user_id="u1", org_id="o1")
+    assert result is None
@@ -0,0 +1,55 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from speech_stream import SentenceChunker  # noqa: E402
+
+
+def chunk(text, step=3, **options):
+    """Feed text the way an LLM streams it, a few characters at a time."""
+    options.setdefault("clause_min_chars", 1000)
+    options.setdefault("first_clause_min_chars", 1000)
+    chunker = SentenceChunker(**options)
+    chunks = []
+    for i in range(0, len(text), step):
+        chunks.extend(chunker.push(text[i:i + step]))
+    return chunks + chunker.flush()
+
+
+def test_splits_on_sentence_boundaries():
+    assert chunk("Hello there! How are you? I'm fine.") == ["Hello there!", "How are you?", "I'm fine."]
+
+
+def test_abbreviations_and_initials_do_not_split():
+    text = "Dr. Smith met J. R. R. Tolkien, e.g. at 9 a.m. on Fri. today. Next sentence."
+    assert chunk(text) == ["Dr. Smith met J. R. R. Tolkien, e.g. at 9 a.m. on Fri. today.", "Next sentence."]
+
+
+def test_decimals_urls_and_emails_do_not_split():
+    text = "Growth was 3.5 percent. See https://example.com/docs.html or mail help@example.co.uk today. Done."
+    assert chunk(text) == [
+        "Growth was 3.5 percent.",
+        "See https://example.com/docs.html or mail help@example.co.uk today.",
+        "Done.",
+    ]
+
+
+def test_closing_quotes_stay_with_their_sentence():
+    assert chunk('She said "stop." Then left.') == ['She said "stop."', "Then left."]
+
+
+def test_clauses_split_once_long_enough():
+    text = "First, a short clause; then a much longer clause that goes on for a while, and an ending."
+    chunks = chunk(text, clause_min_chars=30, first_clause_min_chars=10)
+    assert chunks == [
+        "First, a short clause;",
+        "then a much longer clause that goes on for a while,",
+        "and an ending.",
+    ]
+
+
+def test_long_text_without_boundaries_splits_at_a_space():
+    chunks = chunk("word " * 30, max_chunk_chars=50)
+    assert all(len(c) <= 50 for c in chunks)
+    assert " ".join(chunks).split() == ["word"] * 30
@@ -0,0 +1,106 @@
+import array
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+rtc = pytest.importorskip("livekit.rtc")
+pytest.importorskip("livekit.agents")
+
+from vad_gate import SpeechGate  # noqa: E402
+
+WINDOW = 512
+RATE = 16000
+WINDOW_SECONDS = WINDOW / RATE
+
+
+class LoudnessVad:
+    """Stand-in VAD: a window is speech when it isn't silent."""
+
+    window_samples = WINDOW
+    sample_rate = RATE
+
+    def probability(self, data):
+        samples = data if isinstance(data, array.array) else memoryview(data).cast("B").cast("h")
+        return 1.0 if max(abs(sample) for sample in samples) > 100 else 0.0
+
+
+def make_frame(speech):
+    samples = array.array("h", [1000 if speech else 0] * WINDOW)
+    return rtc.AudioFrame(data=samples.tobytes(), sample_rate=RATE, num_channels=1, samples_per_channel=WINDOW)
+
+
+def make_gate(**options):
+    options.setdefault("min_speech", 2 * WINDOW_SECONDS)
+    options.setdefault("prefix_padding", 0.3)
+    options.setdefault("trailing_padding", 0.2)
+    options.setdefault("min_silence", 0.25)
+    options.setdefault("max_silence", 0.8)
+    return SpeechGate(LoudnessVad(), **options)
+
+
+def feed(gate, pattern):
+    """Push one window per character ("s" speech, "." silence); returns (forwarded counts, ended flags)."""
+    counts, ended = [], []
+    for char in pattern:
+        forward, end = gate.process(make_frame(char == "s"))
+        counts.append(len(forward))
+        ended.append(end)
+    return counts, ended
+
+
+def test_silence_is_held_back():
+    gate = make_gate()
+    counts, ended = feed(gate, "." * 30)
+    assert sum(counts) == 0
+    assert not any(ended)
+    assert gate.forwarded_seconds == 0
+
+
+def test_speech_start_releases_prefix_padding():
+    gate = make_gate()
+    counts, _ = feed(gate, "." * 20 + "ss")
+    # The first speech window is held until speech has lasted min_speech
+    assert counts[-2] == 0
+    # Then up to prefix_padding of held audio goes out ahead of the live frame
+    held = counts[-1] - 1
+    assert held * WINDOW_SECONDS == pytest.approx(0.3, abs=WINDOW_SECONDS)
+    assert gate.speaking
+
+
+def test_trailing_padding_then_endpoint():
+    gate = make_gate()
+    feed(gate, "sss")
+    counts, ended = feed(gate, "." * 20)
+    forwarded_silence = sum(1 for count in counts if count)
+    assert forwarded_silence * WINDOW_SECONDS <= 0.2 < (forwarded_silence + 1) * WINDOW_SECONDS
+    # Without a pause history the limit is midway between min_silence and max_silence
+    end = ended.index(True) + 1
+    assert end * WINDOW_SECONDS >= (0.25 + 0.8) / 2 > (end - 1) * WINDOW_SECONDS
+    assert gate.utterances == 1
+    assert not gate.speaking
+
+
+def test_sentence_final_transcript_ends_at_min_silence():
+    gate = make_gate()
+    feed(gate, "sss")
+    gate.sentence_final = True
+    _, ended = feed(gate, "." * 20)
+    end = ended.index(True) + 1
+    assert end * WINDOW_SECONDS >= 0.25 > (end - 1) * WINDOW_SECONDS
+
+
+def test_silence_limit_adapts_to_speaker_pauses():
+    gate = make_gate()
+    feed(gate, "sss" + "." * 6 + "sss")
+    assert gate.silence_limit() == pytest.approx(2 * 6 * WINDOW_SECONDS)
+    # Short gaps are noise within speech, not pauses
+    fresh = make_gate()
+    feed(fresh, "sss" + "." * 2 + "sss")
+    assert fresh.silence_limit() == pytest.approx((0.25 + 0.8) / 2)
+    # Long habitual pauses are capped at max_silence
+    slow = make_gate(max_silence=0.3)
+    feed(slow, "sss" + "." * 8 + "sss")
+    assert slow.silence_limit() == pytest.approx(0.3)
@@ -0,0 +1,122 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+TOKEN_TTL = int(os.getenv("TOKEN_TTL", str(6 * 60 * 60)))
+# Cached tokens are re-minted once they are this close to expiring
+TOKEN_REFRESH_MARGIN = int(os.getenv("TOKEN_REFRESH_MARGIN", "300"))
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+
+DEFAULT_GRANTS = {
+    "room_join": True,
+    "can_publish": True,
+    "can_subscribe": True,
+    "can_publish_data": True,
+}
+
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _camel(name: str) -> str:
+    first, *rest = name.split("_")
+    return first + "".join(part.capitalize() for part in rest)
+
+
+_HEADER = _b64url(json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(",", ":")).encode())
+
+
+class TokenService:
+    """Mints LiveKit access tokens (HS256 JWTs) locally from the API key and secret.
+
+    Signed tokens are cached per (room, identity, name, metadata, grants) and reused until
+    they are within `refresh_margin` seconds of expiring.
+    """
+
+    def __init__(self, api_key, api_secret, ttl=TOKEN_TTL, refresh_margin=TOKEN_REFRESH_MARGIN,
+                 max_entries=TOKEN_CACHE_MAX_ENTRIES):
+        if not api_key or not api_secret:
+            raise ValueError("LiveKit API key and secret are required to mint tokens")
+        self.api_key = api_key
+        self.ttl = ttl
+        self.refresh_margin = min(refresh_margin, ttl // 2)
+        self.max_entries = max_entries
+        self._mac = hmac.new(api_secret.encode(), digestmod=hashlib.sha256)
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.minted = 0
+
+    def get_token(self, room, identity, name=None, metadata=None, **grants):
+        """Return `(jwt, expires_at)` for joining `room` as `identity`.
+
+        Grants use snake_case names (`can_publish=False`) and default to `DEFAULT_GRANTS`.
+        """
+        grants = {**DEFAULT_GRANTS, **grants}
+        key = (room, identity, name, metadata, tuple(sorted(grants.items())))
+        now = int(time.time())
+        cached = self._cache.get(key)
+        if cached is not None and cached[1] - now > self.refresh_margin:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return cached
+
+        expires_at = now + self.ttl
+        claims = {
+            "iss": self.api_key,
+            "sub": identity,
+            "nbf": now,
+            "exp": expires_at,
+            "video": {"room": room, **{_camel(grant): value for grant, value in grants.items()}},
+        }
+        if name:
+            claims["name"] = name
+        if metadata:
+            claims["metadata"] = metadata
+        token = self._sign(claims)
+        self.minted += 1
+
+        self._cache[key] = (token, expires_at)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return token, expires_at
+
+    def _sign(self, claims: dict) -> str:
+        signing_input = f"{_HEADER}.{_b64url(json.dumps(claims, separators=(',', ':')).encode())}"
+        mac = self._mac.copy()
+        mac.update(signing_input.encode("ascii"))
+        return f"{signing_input}.{_b64url(mac.digest())}"
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._cache),
+            "hits": self.hits,
+            "minted": self.minted,
+            "hit_rate": self.hits / (self.hits + self.minted) if self.hits + self.minted else 0.0,
+        }
+
+
+_token_service = None
+
+
+def get_token_service(api_key=None, api_secret=None) -> TokenService:
+    """Return the process-wide token service, creating it on first use."""
+    global _token_service
+    if _token_service is None:
+        _token_service = TokenService(
+            api_key or os.getenv("LIVEKIT_API_KEY"),
+            api_secret or os.getenv("LIVEKIT_API_SECRET"),
+        )
+    return _token_service
+
+
+def stats() -> dict:
+    return _token_service.stats() if _token_service is not None else {}
@@ -0,0 +1,172 @@
+import asyncio
+import functools
+import json
+import os
+import time
+import logging
+
+from turn_metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Latency budget in seconds for tools without an entry in TOOL_TIMEOUTS (0 disables the budget)
+TOOL_TIMEOUT_DEFAULT = float(os.getenv("TOOL_TIMEOUT_DEFAULT", "10"))
+TOOL_TIMEOUTS = os.getenv("TOOL_TIMEOUTS", "query_knowledge_base=4,execute_pipedream_action=15")
+
+
+def parse_budgets(spec: str) -> dict:
+    """Parse a "tool_name=seconds,..." string into a dict."""
+    budgets = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        name, _, seconds = item.partition("=")
+        try:
+            budgets[name.strip()] = float(seconds)
+        except ValueError:
+            logger.warning(f"Ignoring invalid tool timeout entry: {item!r}")
+    return budgets
+
+
+def timeout_result(tool_name: str, budget: float) -> str:
+    return json.dumps({
+        "status": "timeout",
+        "error": f"The {tool_name} call did not finish within {budget:g} seconds.",
+        "results": [],
+    })
+
+
+class ToolExecutor:
+    """Runs a session's tool calls as tracked tasks with per-tool latency budgets.
+
+    A call that overruns its budget returns a timeout result to the LLM instead of holding
+    up the turn. Tools can define `on_timeout(task, *args, **kwargs)` to take over the still
+    running task and return their own result. When the user interrupts, tools with side
+    effects can likewise take over their task with `on_interrupt(task, *args, **kwargs)`;
+    other outstanding calls are cancelled, as are all calls when the session closes.
+
+    Calls are never serialized: tool calls the LLM plugin issues together run concurrently.
+    """
+
+    def __init__(self, budgets=None, default_budget=TOOL_TIMEOUT_DEFAULT):
+        self.budgets = parse_budgets(TOOL_TIMEOUTS) if budgets is None else dict(budgets)
+        self.default_budget = default_budget
+        self.tools = {}
+        self._inflight = set()
+        # In-flight task -> (tool, args, kwargs, hand-off future) for interrupt hand-offs
+        self._calls = {}
+
+        self.calls = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.errors = 0
+        self.max_concurrent = 0
+
+    def budget_for(self, tool_name: str) -> float:
+        return self.budgets.get(tool_name, self.default_budget)
+
+    def wrap(self, tool):
+        """Route `tool.arun` through the executor. Returns the same tool object."""
+        run = tool.arun
+
+        @functools.wraps(run)
+        async def arun(*args, **kwargs):
+            return await self.call(tool, run, *args, **kwargs)
+
+        tool.arun = arun
+        self.tools[tool.name] = tool
+        return tool
+
+    async def call(self, tool, run, *args, **kwargs) -> str:
+        budget = self.budget_for(tool.name)
+        task = asyncio.create_task(run(*args, **kwargs))
+        handoff = asyncio.get_running_loop().create_future()
+        self._inflight.add(task)
+        self._calls[task] = (tool, args, kwargs, handoff)
+        task.add_done_callback(self._inflight.discard)
+        self.calls += 1
+        self.max_concurrent = max(self.max_concurrent, len(self._inflight))
+
+        started = time.perf_counter()
+        try:
+            done, _ = await asyncio.wait({task, handoff}, timeout=budget or None,
+                                         return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            if not handoff.done():
+                task.cancel()
+            raise
+        finally:
+            self._calls.pop(task, None)
+
+        if handoff in done:
+            # Taken over by the tool on interrupt; it keeps running in the background
+            return handoff.result()
+        if task in done:
+            if task.cancelled():
+                self.cancelled += 1
+                return json.dumps({"status": "cancelled", "error": f"The {tool.name} call was cancelled."})
+            if task.exception() is not None:
+                self.errors += 1
+            return task.result()
+
+        self.timeouts += 1
+        metrics.inc("tool_timeouts", help_text="Tool calls that exceeded their latency budget", tool=tool.name)
+        logger.warning(f"Tool {tool.name} exceeded its {budget:g}s budget after {time.perf_counter() - started:.2f}s")
+
+        on_timeout = getattr(tool, "on_timeout", None)
+        result = on_timeout(task, *args, **kwargs) if on_timeout is not None else None
+        if result is not None:
+            # The tool owns the task now; it is no longer cancelled by interrupts
+            self._inflight.discard(task)
+            return result
+        task.cancel()
+        return timeout_result(tool.name, budget)
+
+    def interrupt(self) -> int:
+        """The user interrupted: hand calls with side effects to their tool, cancel the rest.
+
+        Returns how many calls were cancelled.
+        """
+        handed_off = 0
+        for task in [task for task in self._inflight if not task.done()]:
+            entry = self._calls.get(task)
+            if entry is None:
+                continue
+            tool, args, kwargs, handoff = entry
+            on_interrupt = getattr(tool, "on_interrupt", None)
+            result = on_interrupt(task, *args, **kwargs) if on_interrupt is not None else None
+            if result is not None:
+                self._inflight.discard(task)
+                handoff.set_result(result)
+                handed_off += 1
+        if handed_off:
+            logger.info(f"Moved {handed_off} tool calls to the background on user interruption")
+        return self.cancel_all()
+
+    def cancel_all(self) -> int:
+        """Cancel every outstanding call, e.g. when the user interrupts. Returns how many were cancelled."""
+        tasks = [task for task in self._inflight if not task.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            metrics.inc("tool_cancellations", len(tasks), help_text="Tool calls cancelled by interrupts or session close")
+        return len(tasks)
+
+    async def close(self):
+        """Cancel outstanding calls and wait for them to unwind."""
+        tasks = list(self._inflight)
+        cancelled = self.cancel_all()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        if cancelled:
+            logger.info(f"Cancelled {cancelled} outstanding tool calls")
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "in_flight": len(self._inflight),
+            "max_concurrent": self.max_concurrent,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled,
+            "errors": self.errors,
+        }
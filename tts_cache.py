@@ -0,0 +1,239 @@
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import re
+import logging
+from collections import OrderedDict
+from livekit import rtc
+from livekit.agents import tts as lk_tts
+
+logger = logging.getLogger(__name__)
+
+TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+TTS_CACHE_BYTES = int(os.getenv("TTS_CACHE_BYTES", str(64 * 1024 * 1024)))
+TTS_CACHE_MAX_CHARS = int(os.getenv("TTS_CACHE_MAX_CHARS", "200"))
+# Optional file backing for the segment store; anonymous shared memory when unset
+TTS_CACHE_PATH = os.getenv("TTS_CACHE_PATH")
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    return _SPACE_RE.sub(" ", text or "").strip()
+
+
+def utterance_key(text: str, voice_id, model_id, sample_rate, num_channels) -> str:
+    material = json.dumps([normalize_text(text), voice_id or "", model_id or "", sample_rate, num_channels])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class _Segment:
+    __slots__ = ("offset", "length", "frame_sizes", "sample_rate", "num_channels")
+
+    def __init__(self, offset, length, frame_sizes, sample_rate, num_channels):
+        self.offset = offset
+        self.length = length
+        self.frame_sizes = frame_sizes
+        self.sample_rate = sample_rate
+        self.num_channels = num_channels
+
+
+class SegmentStore:
+    """Size-bounded memory-mapped arena of encoded audio segments with LRU eviction."""
+
+    def __init__(self, capacity=TTS_CACHE_BYTES, path=TTS_CACHE_PATH):
+        self.capacity = capacity
+        if path:
+            self._file = open(path, "w+b")
+            self._file.truncate(capacity)
+            self._mmap = mmap.mmap(self._file.fileno(), capacity)
+        else:
+            self._file = None
+            self._mmap = mmap.mmap(-1, capacity)
+        # Free blocks as sorted, non-overlapping (offset, length) pairs
+        self._free = [(0, capacity)]
+        self._segments = OrderedDict()
+        self.used = 0
+        self.evictions = 0
+
+    def __contains__(self, key):
+        return key in self._segments
+
+    def __len__(self):
+        return len(self._segments)
+
+    def get(self, key):
+        """Return (segment, bytes) for a cached entry and mark it recently used.
+
+        The audio is copied out of the arena, so a later `put` may evict and reuse the
+        region while the caller is still playing it.
+        """
+        segment = self._segments.get(key)
+        if segment is None:
+            return None
+        self._segments.move_to_end(key)
+        return segment, self._mmap[segment.offset:segment.offset + segment.length]
+
+    def put(self, key, data, frame_sizes, sample_rate, num_channels) -> bool:
+        length = len(data)
+        if length == 0 or length > self.capacity // 4:
+            return False
+        if key in self._segments:
+            self._release(key)
+        offset = self._allocate(length)
+        while offset is None and self._segments:
+            self._release(next(iter(self._segments)))
+            self.evictions += 1
+            offset = self._allocate(length)
+        if offset is None:
+            return False
+        self._mmap[offset:offset + length] = data
+        self._segments[key] = _Segment(offset, length, frame_sizes, sample_rate, num_channels)
+        self.used += length
+        return True
+
+    def _allocate(self, length):
+        for i, (offset, size) in enumerate(self._free):
+            if size >= length:
+                if size == length:
+                    del self._free[i]
+                else:
+                    self._free[i] = (offset + length, size - length)
+                return offset
+        return None
+
+    def _release(self, key):
+        segment = self._segments.pop(key)
+        self.used -= segment.length
+        block = (segment.offset, segment.length)
+        i = bisect.bisect_left(self._free, block)
+        self._free.insert(i, block)
+        # Coalesce with the neighbours on both sides
+        if i + 1 < len(self._free) and self._free[i][0] + self._free[i][1] == self._free[i + 1][0]:
+            self._free[i] = (self._free[i][0], self._free[i][1] + self._free[i + 1][1])
+            del self._free[i + 1]
+        if i > 0 and self._free[i - 1][0] + self._free[i - 1][1] == self._free[i][0]:
+            self._free[i - 1] = (self._free[i - 1][0], self._free[i - 1][1] + self._free[i][1])
+            del self._free[i]
+
+    def close(self):
+        self._mmap.close()
+        if self._file is not None:
+            self._file.close()
+
+
+class CachedTTS:
+    """Opt-in wrapper around a TTS plugin that replays identical utterances from a SegmentStore.
+
+    Everything except `synthesize` is delegated to the wrapped plugin.
+    """
+
+    def __init__(self, tts, voice_id=None, model_id=None, store=None, max_chars=TTS_CACHE_MAX_CHARS):
+        self._tts = tts
+        self.voice_id = voice_id
+        self.model_id = model_id
+        self.store = store if store is not None else get_segment_store()
+        self.max_chars = max_chars
+
+    def __getattr__(self, name):
+        return getattr(self._tts, name)
+
+    def synthesize(self, text: str, **kwargs):
+        if len(text) > self.max_chars:
+            return self._tts.synthesize(text, **kwargs)
+        key = utterance_key(
+            text, self.voice_id, self.model_id,
+            getattr(self._tts, "sample_rate", None), getattr(self._tts, "num_channels", None),
+        )
+        return _CachedStream(self, key, text, kwargs)
+
+
+class _CachedStream:
+    """Async iterator yielding SynthesizedAudio with the same frame boundaries as live synthesis."""
+
+    def __init__(self, cached_tts, key, text, kwargs):
+        self._cached_tts = cached_tts
+        self._key = key
+        self._text = text
+        self._kwargs = kwargs
+        self._iter = None
+
+    def __aiter__(self):
+        if self._iter is None:
+            self._iter = self._run()
+        return self._iter
+
+    async def __anext__(self):
+        return await self.__aiter__().__anext__()
+
+    async def aclose(self):
+        if self._iter is not None:
+            await self._iter.aclose()
+
+    async def _run(self):
+        store = self._cached_tts.store
+        cached = store.get(self._key)
+        if cached is not None:
+            segment, data = cached
+            view = memoryview(data)
+            _stats["hits"] += 1
+            _stats["bytes_saved"] += segment.length
+            request_id = self._key[:16]
+            offset = 0
+            for i, size in enumerate(segment.frame_sizes):
+                chunk = view[offset:offset + size]
+                offset += size
+                yield lk_tts.SynthesizedAudio(
+                    frame=rtc.AudioFrame(
+                        data=chunk,
+                        sample_rate=segment.sample_rate,
+                        num_channels=segment.num_channels,
+                        samples_per_channel=size // (2 * segment.num_channels),
+                    ),
+                    request_id=request_id,
+                    is_final=i == len(segment.frame_sizes) - 1,
+                )
+            return
+
+        _stats["misses"] += 1
+        pcm = bytearray()
+        frame_sizes = []
+        sample_rate = None
+        num_channels = None
+        async for audio in self._cached_tts._tts.synthesize(self._text, **self._kwargs):
+            frame = audio.frame
+            data = frame.data.cast("B")
+            pcm += data
+            frame_sizes.append(len(data))
+            sample_rate = frame.sample_rate
+            num_channels = frame.num_channels
+            yield audio
+        # Only complete renders reach this point; interrupted ones are never stored
+        if frame_sizes and store.put(self._key, pcm, frame_sizes, sample_rate, num_channels):
+            _stats["stored_bytes"] += len(pcm)
+
+
+_stats = {"hits": 0, "misses": 0, "bytes_saved": 0, "stored_bytes": 0}
+_segment_store = None
+
+
+def get_segment_store() -> SegmentStore:
+    global _segment_store
+    if _segment_store is None:
+        _segment_store = SegmentStore()
+    return _segment_store
+
+
+def stats() -> dict:
+    lookups = _stats["hits"] + _stats["misses"]
+    store = _segment_store
+    return {
+        **_stats,
+        "hit_rate": round(_stats["hits"] / lookups, 4) if lookups else 0.0,
+        "entries": len(store) if store else 0,
+        "used_bytes": store.used if store else 0,
+        "capacity_bytes": store.capacity if store else TTS_CACHE_BYTES,
+        "evictions": store.evictions if store else 0,
+    }
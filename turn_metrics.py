@@ -0,0 +1,243 @@
+import bisect
+import contextvars
+import os
+import threading
+import time
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+METRICS_PREFIX = os.getenv("METRICS_PREFIX", "jarvis")
+
+# Latency buckets in seconds, from 10ms to 30s
+LATENCY_BUCKETS = (
+    0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.2, 0.3, 0.4, 0.5, 0.75,
+    1.0, 1.5, 2.0, 3.0, 5.0, 7.5, 10.0, 15.0, 30.0,
+)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Cumulative Prometheus-style histogram with bucket-interpolated quantiles."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class MetricsRegistry:
+    """Process-wide histograms, counters and stats collectors rendered in Prometheus text format."""
+
+    def __init__(self, prefix=METRICS_PREFIX):
+        self.prefix = prefix
+        self._histograms = {}
+        self._counters = {}
+        self._help = {}
+        self._collectors = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, help_text="", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+                self._help.setdefault(name, help_text)
+            histogram.observe(value)
+
+    def inc(self, name, amount=1, help_text="", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+            self._help.setdefault(name, help_text)
+
+    def histogram(self, name, **labels):
+        return self._histograms.get((name, tuple(sorted(labels.items()))))
+
+    def register_collector(self, name, collect):
+        """Export the numeric values of `collect()` (a stats dict) as gauges."""
+        self._collectors[name] = collect
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+
+        emitted = set()
+        quantile_lines = {}
+        for (name, labels), histogram in histograms:
+            full = f"{self.prefix}_{name}"
+            if name not in emitted:
+                emitted.add(name)
+                if self._help.get(name):
+                    lines.append(f"# HELP {full} {self._help[name]}")
+                lines.append(f"# TYPE {full} histogram")
+            cumulative = 0
+            for bucket, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f"{full}_bucket{_format_labels(labels + (('le', bucket),))} {cumulative}")
+            lines.append(f"{full}_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+            lines.append(f"{full}_sum{_format_labels(labels)} {histogram.sum:.6f}")
+            lines.append(f"{full}_count{_format_labels(labels)} {histogram.count}")
+            for q in QUANTILES:
+                quantile_lines.setdefault(full, []).append(
+                    f"{full}_quantile{_format_labels(labels + (('quantile', q),))} {histogram.quantile(q):.6f}"
+                )
+
+        # Bucket-interpolated p50/p95/p99 for dashboards that don't compute histogram_quantile
+        for full, samples in quantile_lines.items():
+            lines.append(f"# TYPE {full}_quantile gauge")
+            lines.extend(samples)
+
+        for (name, labels), value in counters:
+            full = f"{self.prefix}_{name}_total"
+            if name not in emitted:
+                emitted.add(name)
+                if self._help.get(name):
+                    lines.append(f"# HELP {full} {self._help[name]}")
+                lines.append(f"# TYPE {full} counter")
+            lines.append(f"{full}{_format_labels(labels)} {value}")
+
+        for collector_name, collect in sorted(self._collectors.items()):
+            try:
+                values = collect()
+            except Exception as e:
+                logger.warning(f"Metrics collector {collector_name} failed: {e}")
+                continue
+            for key, value in _flatten(values):
+                full = f"{self.prefix}_{collector_name}_{key}"
+                lines.append(f"# TYPE {full} gauge")
+                lines.append(f"{full} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _flatten(values, prefix=""):
+    for key, value in (values or {}).items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{name}_")
+        elif isinstance(value, bool):
+            yield name, int(value)
+        elif isinstance(value, (int, float)):
+            yield name, value
+
+
+# Shared by every session in the worker process
+metrics = MetricsRegistry()
+
+# Stages reported per turn: (histogram name, start mark, end mark)
+TURN_STAGES = (
+    ("stt_latency_seconds", "user_speech_end", "stt_final"),
+    ("llm_first_token_seconds", "stt_final", "llm_first_token"),
+    ("tts_first_byte_seconds", "tts_request", "tts_first_byte"),
+    ("audio_out_seconds", "tts_first_byte", "audio_out"),
+)
+
+
+class TurnTracker:
+    """Records per-turn timestamps for one session and feeds the worker histograms."""
+
+    def __init__(self, registry=None, session_id=None):
+        self.registry = registry or metrics
+        self.session_id = session_id
+        self.turn_id = 0
+        self.marks = {}
+        self.tool_seconds = {}
+
+    def start_turn(self, at=None):
+        self.turn_id += 1
+        self.marks = {"user_speech_end": at or time.perf_counter()}
+        self.tool_seconds = {}
+
+    def mark(self, name, at=None):
+        """Record the first occurrence of `name` in the current turn."""
+        if not self.marks:
+            self.turn_id += 1
+        if name not in self.marks:
+            self.marks[name] = at or time.perf_counter()
+        if name == "audio_out":
+            self.finish_turn()
+
+    @contextmanager
+    def tool_span(self, tool_name):
+        started = time.perf_counter()
+        self.marks.setdefault("tool_start", started)
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.tool_seconds[tool_name] = self.tool_seconds.get(tool_name, 0.0) + elapsed
+            self.registry.observe(
+                "tool_call_seconds", elapsed, "Duration of a tool call", tool=tool_name, status=status
+            )
+
+    def finish_turn(self):
+        marks = self.marks
+        # Turns without a speech-end event are measured from the final transcript
+        start = marks.get("user_speech_end", marks.get("stt_final"))
+        if start is None or "audio_out" not in marks:
+            self.marks = {}
+            return
+        stages = {}
+        for name, begin, end in TURN_STAGES:
+            if begin in marks and end in marks:
+                stages[name] = max(0.0, marks[end] - marks[begin])
+                self.registry.observe(name, stages[name], f"Turn stage {begin} -> {end}")
+        for tool_name, seconds in self.tool_seconds.items():
+            stages[f"tool:{tool_name}"] = seconds
+
+        total = marks["audio_out"] - start
+        self.registry.observe(
+            "turn_latency_seconds", total, "User-perceived latency from end of speech to first audio out"
+        )
+        if stages:
+            dominant = max(stages, key=stages.get)
+            self.registry.inc("turn_dominant_stage", help_text="Turns by slowest stage", stage=dominant)
+        logger.debug(f"Turn {self.turn_id} of session {self.session_id}: {total:.3f}s {stages}")
+        self.marks = {}
+
+
+current_turns = contextvars.ContextVar("current_turns", default=None)
+
+
+@contextmanager
+def tool_span(tool_name):
+    """Time a tool call against the current session's TurnTracker, if any."""
+    tracker = current_turns.get()
+    if tracker is None:
+        yield
+        return
+    with tracker.tool_span(tool_name):
+        yield
@@ -0,0 +1,341 @@
+import array
+import math
+import os
+import time
+import logging
+from collections import deque
+from functools import lru_cache
+
+from livekit import rtc
+from livekit.agents import stt as lk_stt
+
+from audio_frames import FrameConverter, as_bytes, np
+from turn_metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Only send audio to STT while someone is speaking, and end utterances locally (opt-in)
+VAD_GATE_ENABLED = os.getenv("VAD_GATE_ENABLED", "false").lower() in ("1", "true", "yes")
+# While gated, send one frame of silence this often so the provider doesn't close an idle stream (0 disables)
+VAD_KEEPALIVE_SECONDS = float(os.getenv("VAD_KEEPALIVE_SECONDS", "5"))
+# "silero" (ONNX model on CPU), "energy", or "auto" (Silero when onnxruntime and the model are available)
+VAD_BACKEND = os.getenv("VAD_BACKEND", "auto")
+VAD_MODEL_PATH = os.getenv("VAD_MODEL_PATH", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "node_modules", "@livekit", "agents-plugin-silero", "src", "silero_vad.onnx"
+))
+# Speech probability at or above which a window counts as speech
+VAD_ACTIVATION_THRESHOLD = float(os.getenv("VAD_ACTIVATION_THRESHOLD", "0.5"))
+VAD_MIN_SPEECH_MS = int(os.getenv("VAD_MIN_SPEECH_MS", "64"))
+# Audio kept from before speech starts, and forwarded after it stops
+VAD_PREFIX_PADDING_MS = int(os.getenv("VAD_PREFIX_PADDING_MS", "300"))
+VAD_TRAILING_PADDING_MS = int(os.getenv("VAD_TRAILING_PADDING_MS", "200"))
+# Bounds of the adaptive end-of-utterance silence
+VAD_MIN_SILENCE_MS = int(os.getenv("VAD_MIN_SILENCE_MS", "250"))
+VAD_MAX_SILENCE_MS = int(os.getenv("VAD_MAX_SILENCE_MS", "800"))
+# Energy VAD: decibels above the tracked noise floor that count as speech
+VAD_ENERGY_MARGIN_DB = float(os.getenv("VAD_ENERGY_MARGIN_DB", "12"))
+
+VAD_SAMPLE_RATE = 16000
+# Silero v5 at 16 kHz: 512-sample windows with 64 samples of context from the previous one
+SILERO_WINDOW = 512
+SILERO_CONTEXT = 64
+# Pauses shorter than this are treated as noise in the speech, not as a pause
+MIN_PAUSE_SECONDS = 0.1
+
+_stats = {"streams": 0, "audio_seconds": 0.0, "forwarded_seconds": 0.0, "utterances": 0, "endpoints": 0, "keepalives": 0}
+
+
+@lru_cache(maxsize=None)
+def _silero_session(model_path):
+    """One ONNX session per process; it is stateless, sessions keep their RNN state themselves."""
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = 1
+    options.inter_op_num_threads = 1
+    options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+    return onnxruntime.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+
+
+class SileroVAD:
+    """Per-stream Silero VAD state over a shared ONNX session."""
+
+    name = "silero"
+    sample_rate = VAD_SAMPLE_RATE
+    window_samples = SILERO_WINDOW
+
+    def __init__(self, model_path=VAD_MODEL_PATH):
+        self._session = _silero_session(model_path)
+        self._input = np.zeros((1, SILERO_CONTEXT + SILERO_WINDOW), dtype=np.float32)
+        self._state = np.zeros((2, 1, 128), dtype=np.float32)
+        self._sr = np.array(VAD_SAMPLE_RATE, dtype=np.int64)
+
+    def probability(self, window) -> float:
+        samples = np.frombuffer(as_bytes(window), dtype=np.int16)
+        # Carry the tail of the previous window over as context
+        self._input[0, :SILERO_CONTEXT] = self._input[0, -SILERO_CONTEXT:]
+        np.multiply(samples, 1 / 32768, out=self._input[0, SILERO_CONTEXT:], casting="unsafe")
+        output, self._state = self._session.run(None, {"input": self._input, "state": self._state, "sr": self._sr})
+        return float(output[0, 0])
+
+
+class EnergyVAD:
+    """Fallback VAD: window loudness against an adaptive noise floor, mapped to a probability."""
+
+    name = "energy"
+    sample_rate = VAD_SAMPLE_RATE
+    window_samples = SILERO_WINDOW
+
+    def __init__(self, margin_db=VAD_ENERGY_MARGIN_DB):
+        self.margin_db = margin_db
+        self.noise_floor = -50.0
+
+    def probability(self, window) -> float:
+        if np is not None:
+            samples = np.frombuffer(as_bytes(window), dtype=np.int16).astype(np.float32)
+            power = float(np.dot(samples, samples)) / max(1, len(samples))
+        else:
+            samples = array.array("h")
+            samples.frombytes(as_bytes(window))
+            power = sum(s * s for s in samples) / max(1, len(samples))
+        level = 10 * math.log10(power / (32768 * 32768) + 1e-10)
+        probability = 1 / (1 + math.exp(-(level - self.noise_floor - self.margin_db) / 2))
+        # Follow the floor down immediately, and up slowly while there is no speech
+        if level < self.noise_floor:
+            self.noise_floor = level
+        elif probability < 0.5:
+            self.noise_floor += 0.05 * (level - self.noise_floor)
+        return probability
+
+
+_backend_warned = False
+
+
+def create_vad(backend=VAD_BACKEND):
+    """A VAD for one stream; "auto" falls back to the energy VAD when Silero can't be loaded."""
+    global _backend_warned
+    if backend in ("auto", "silero"):
+        try:
+            if np is None:
+                raise ImportError("numpy is not installed")
+            return SileroVAD()
+        except Exception as e:
+            if backend == "silero":
+                raise
+            if not _backend_warned:
+                _backend_warned = True
+                logger.warning(f"Silero VAD unavailable ({e}), using the energy VAD")
+    return EnergyVAD()
+
+
+def preload_vad(backend=VAD_BACKEND):
+    """Load the Silero model before the first session needs it."""
+    vad = create_vad(backend)
+    logger.info(f"VAD backend: {vad.name}")
+
+
+class SpeechGate:
+    """Decides for each audio frame whether it goes to STT, and when an utterance has ended.
+
+    Frames are held back while nobody speaks. Once speech has lasted `min_speech`, the last
+    `prefix_padding` seconds of held frames are released, followed by live frames. The
+    first `trailing_padding` seconds of silence after speech are forwarded too. The utterance ends after
+    a silence that adapts to the speaker: twice their typical mid-utterance pause, within
+    `min_silence`..`max_silence`, or `min_silence` right away when the latest interim
+    transcript ends a sentence. All durations are in seconds.
+    """
+
+    def __init__(self, vad, threshold=VAD_ACTIVATION_THRESHOLD, min_speech=VAD_MIN_SPEECH_MS / 1000,
+                 prefix_padding=VAD_PREFIX_PADDING_MS / 1000, trailing_padding=VAD_TRAILING_PADDING_MS / 1000,
+                 min_silence=VAD_MIN_SILENCE_MS / 1000, max_silence=VAD_MAX_SILENCE_MS / 1000):
+        self.vad = vad
+        self.threshold = threshold
+        self.min_speech = min_speech
+        self.prefix_padding = prefix_padding
+        self.trailing_padding = trailing_padding
+        self.min_silence = min_silence
+        self.max_silence = max_silence
+        self.window_seconds = vad.window_samples / vad.sample_rate
+        self._converter = FrameConverter(vad.sample_rate, 1, frame_ms=round(self.window_seconds * 1000))
+        self._held = deque()
+        self._held_seconds = 0.0
+        self.speaking = False
+        self._speech_run = 0.0
+        self._silence_run = 0.0
+        self._pause_average = None
+        # Set from interim transcripts by the stream
+        self.sentence_final = False
+
+        self.audio_seconds = 0.0
+        self.forwarded_seconds = 0.0
+        self.utterances = 0
+        self.endpoint_delays = []
+
+    def silence_limit(self) -> float:
+        if self.sentence_final:
+            return self.min_silence
+        if self._pause_average is None:
+            return (self.min_silence + self.max_silence) / 2
+        return min(self.max_silence, max(self.min_silence, 2 * self._pause_average))
+
+    def process(self, frame):
+        """Returns `(frames to forward, utterance ended)` for one input frame."""
+        duration = frame.samples_per_channel / frame.sample_rate
+        self.audio_seconds += duration
+        ended = False
+        silence = 0.0
+        for window in self._converter.push_frame(frame):
+            speech = self.vad.probability(window.data) >= self.threshold
+            if self.speaking:
+                if speech:
+                    if self._silence_run >= MIN_PAUSE_SECONDS:
+                        pause = self._silence_run
+                        self._pause_average = pause if self._pause_average is None else 0.8 * self._pause_average + 0.2 * pause
+                    self._silence_run = 0.0
+                    continue
+                self._silence_run += self.window_seconds
+                if self._silence_run >= self.silence_limit():
+                    ended = True
+                    silence = self._silence_run
+                    self.endpoint_delays.append(silence)
+                    self.speaking = False
+                    self._silence_run = 0.0
+                    self._speech_run = 0.0
+            elif speech:
+                self._speech_run += self.window_seconds
+                if self._speech_run >= self.min_speech:
+                    self.speaking = True
+                    self.sentence_final = False
+                    self.utterances += 1
+            else:
+                self._speech_run = 0.0
+
+        if not ended:
+            silence = self._silence_run
+        if (self.speaking or ended) and silence <= self.trailing_padding:
+            forward = [held for held, _ in self._held]
+            forward.append(frame)
+            self.forwarded_seconds += self._held_seconds + duration
+            self._held.clear()
+            self._held_seconds = 0.0
+            return forward, ended
+
+        self._held.append((frame, duration))
+        self._held_seconds += duration
+        while self._held and self._held_seconds - self._held[0][1] >= self.prefix_padding:
+            self._held_seconds -= self._held.popleft()[1]
+        return [], ended
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.vad.name,
+            "audio_seconds": round(self.audio_seconds, 3),
+            "forwarded_seconds": round(self.forwarded_seconds, 3),
+            "speech_ratio": round(self.forwarded_seconds / self.audio_seconds, 4) if self.audio_seconds else 0.0,
+            "utterances": self.utterances,
+            "endpoint_delay_avg": round(sum(self.endpoint_delays) / len(self.endpoint_delays), 3)
+            if self.endpoint_delays else None,
+        }
+
+
+class GatedSpeechStream:
+    """STT stream wrapper that forwards speech only and flushes the provider at local end of utterance.
+
+    Streaming providers close sockets that receive no audio for a while (Deepgram after about
+    10 s), so while audio is held back a frame of silence is sent every `keepalive` seconds.
+    """
+
+    def __init__(self, stream, gate: SpeechGate, keepalive=VAD_KEEPALIVE_SECONDS):
+        self._stream = stream
+        self.gate = gate
+        self.keepalive = keepalive
+        self._endpoint_at = None
+        self._last_sent = time.monotonic()
+        self._silence = None
+        self._closed = False
+        _stats["streams"] += 1
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+    def push_frame(self, frame):
+        frames, ended = self.gate.process(frame)
+        for forwarded in frames:
+            self._stream.push_frame(forwarded)
+        now = time.monotonic()
+        if frames:
+            self._last_sent = now
+        elif self.keepalive and now - self._last_sent >= self.keepalive:
+            self._stream.push_frame(self._silent_frame(frame))
+            self._last_sent = now
+            _stats["keepalives"] += 1
+        if ended:
+            # Ask the provider to finalize now instead of waiting for its own endpointing
+            self._stream.flush()
+            self._endpoint_at = time.perf_counter()
+            _stats["endpoints"] += 1
+            metrics.observe(
+                "vad_endpoint_delay_seconds", self.gate.endpoint_delays[-1],
+                "Silence after the last speech before the local VAD ended the utterance"
+            )
+
+    def _silent_frame(self, like):
+        shape = (like.sample_rate, like.num_channels, like.samples_per_channel)
+        if self._silence is None or self._silence[0] != shape:
+            self._silence = (shape, rtc.AudioFrame(
+                data=bytes(like.samples_per_channel * like.num_channels * 2),
+                sample_rate=like.sample_rate,
+                num_channels=like.num_channels,
+                samples_per_channel=like.samples_per_channel,
+            ))
+        return self._silence[1]
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        event = await self._stream.__anext__()
+        alternatives = getattr(event, "alternatives", None)
+        text = alternatives[0].text if alternatives else ""
+        if event.type == lk_stt.SpeechEventType.INTERIM_TRANSCRIPT:
+            self.gate.sentence_final = text.rstrip().endswith((".", "?", "!"))
+        elif event.type == lk_stt.SpeechEventType.FINAL_TRANSCRIPT and self._endpoint_at is not None:
+            metrics.observe(
+                "stt_final_after_endpoint_seconds", time.perf_counter() - self._endpoint_at,
+                "Time from the local end of utterance to the provider's final transcript"
+            )
+            self._endpoint_at = None
+        return event
+
+    async def aclose(self):
+        if not self._closed:
+            self._closed = True
+            stats = self.gate.stats()
+            _stats["audio_seconds"] += self.gate.audio_seconds
+            _stats["forwarded_seconds"] += self.gate.forwarded_seconds
+            _stats["utterances"] += self.gate.utterances
+            logger.info(f"VAD gate stats: {stats}")
+        await self._stream.aclose()
+
+
+class GatedSTT:
+    """Puts a local VAD in front of an STT plugin's streams; everything else is delegated."""
+
+    def __init__(self, stt, backend=VAD_BACKEND):
+        self._stt = stt
+        self.backend = backend
+
+    def __getattr__(self, name):
+        return getattr(self._stt, name)
+
+    def stream(self, *args, **kwargs):
+        return GatedSpeechStream(self._stt.stream(*args, **kwargs), SpeechGate(create_vad(self.backend)))
+
+
+def stats() -> dict:
+    return {
+        **_stats,
+        "audio_seconds": round(_stats["audio_seconds"], 3),
+        "forwarded_seconds": round(_stats["forwarded_seconds"], 3),
+        "speech_ratio": round(_stats["forwarded_seconds"] / _stats["audio_seconds"], 4) if _stats["audio_seconds"] else 0.0,
+    }
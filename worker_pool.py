@@ -0,0 +1,245 @@
+import asyncio
+import multiprocessing
+import os
+import re
+import shutil
+import signal
+import tempfile
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Number of agent processes; "auto" uses one per core, 0 disables the pool
+WORKER_PROCESSES = os.getenv("WORKER_PROCESSES", "0")
+# Jobs one process takes before it reports itself fully loaded
+WORKER_MAX_JOBS = int(os.getenv("WORKER_MAX_JOBS", "8"))
+# LiveKit stops assigning jobs to a process whose load is above this
+WORKER_LOAD_THRESHOLD = float(os.getenv("WORKER_LOAD_THRESHOLD", "0.75"))
+WORKER_RESTART_BACKOFF_MAX = float(os.getenv("WORKER_RESTART_BACKOFF_MAX", "30"))
+WORKER_METRICS_INTERVAL = float(os.getenv("WORKER_METRICS_INTERVAL", "5"))
+# Modules imported once by the fork server so every child starts with them loaded. The provider
+# plugins are listed explicitly because provider_pool only imports them in start(); modules
+# that aren't installed are skipped.
+WORKER_PRELOAD = os.getenv(
+    "WORKER_PRELOAD", "main_agent,livekit.plugins.deepgram,livekit.plugins.openai,livekit.plugins.elevenlabs"
+)
+
+_SAMPLE_RE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[^}]*\})?\s(.*)$")
+
+
+def worker_count(spec=WORKER_PROCESSES) -> int:
+    if str(spec).strip().lower() == "auto":
+        return os.cpu_count() or 1
+    return max(0, int(spec))
+
+
+def _run_agent_process(index, loads, metrics_dir, max_jobs, load_threshold):
+    """Entry point of a child: warm the providers, then serve LiveKit jobs until stopped."""
+    from log_setup import configure_logging, LOG_FILE
+    # Logging is set up here, after the fork, so no listener thread is inherited; each child gets its own file
+    configure_logging(log_file=f"{LOG_FILE}.worker-{index}" if LOG_FILE else None, force=True)
+
+    from livekit import agents
+    from livekit.agents import WorkerOptions
+    import main_agent
+    from turn_metrics import metrics
+
+    async def tracked_request_fnc(job_request):
+        with loads.get_lock():
+            loads[index] += 1
+        try:
+            await main_agent.request_fnc(job_request)
+        finally:
+            with loads.get_lock():
+                loads[index] -= 1
+
+    def load_fnc(*_):
+        # LiveKit hands new jobs to the least loaded worker, so the pool balances by load
+        return min(1.0, loads[index] / max_jobs)
+
+    async def publish_metrics():
+        path = os.path.join(metrics_dir, f"worker-{index}.prom")
+        while True:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(metrics.render())
+            os.replace(tmp_path, path)
+            await asyncio.sleep(WORKER_METRICS_INTERVAL)
+
+    async def serve():
+        # WorkerPool.stop() sends SIGTERM; cancel instead of dying so the finally below runs
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        await main_agent.warm_worker()
+        publisher = asyncio.create_task(publish_metrics())
+        worker_opts = WorkerOptions(
+            request_handler=tracked_request_fnc,
+            load_fnc=load_fnc,
+            load_threshold=load_threshold,
+        )
+        logger.info(f"Agent worker {index} (pid {os.getpid()}) ready")
+        try:
+            await agents.Worker(worker_opts).run()
+        finally:
+            publisher.cancel()
+            # Deliver queued agent events and close shared clients before the process exits
+            await main_agent.shutdown_worker()
+
+    try:
+        asyncio.run(serve())
+    except asyncio.CancelledError:
+        logger.info(f"Agent worker {index} (pid {os.getpid()}) stopped")
+
+
+class WorkerPool:
+    """Runs N agent worker processes forked from a parent with the heavy modules already imported.
+
+    Children are created by a fork server that preloads `WORKER_PRELOAD` (by default
+    `main_agent` and the provider plugin modules), so each starts with them imported,
+    without inheriting the parent's threads. Each child registers with LiveKit separately and reports its load, so jobs go
+    to the least loaded process. Crashed children are restarted with exponential backoff.
+    """
+
+    def __init__(self, processes=None, max_jobs=WORKER_MAX_JOBS, load_threshold=WORKER_LOAD_THRESHOLD,
+                 target=_run_agent_process):
+        self.processes = worker_count() if processes is None else processes
+        self.max_jobs = max_jobs
+        self.load_threshold = load_threshold
+        self.target = target
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            self._ctx = multiprocessing.get_context("forkserver")
+            self._ctx.set_forkserver_preload([module for module in WORKER_PRELOAD.split(",") if module])
+        else:
+            self._ctx = multiprocessing.get_context("spawn")
+        self.loads = self._ctx.Array("i", self.processes)
+        self.metrics_dir = tempfile.mkdtemp(prefix="jarvis-workers-")
+        self._children = [None] * self.processes
+        self._restarts = [0] * self.processes
+        self._failures = [0] * self.processes
+        self._retry_at = [0.0] * self.processes
+        self._stopping = threading.Event()
+        self._monitor = None
+
+    def start(self):
+        for index in range(self.processes):
+            self._spawn(index)
+        self._monitor = threading.Thread(target=self._watch, name="worker-pool-monitor", daemon=True)
+        self._monitor.start()
+        logger.info(f"Started {self.processes} agent worker processes")
+
+    def _spawn(self, index):
+        self.loads[index] = 0
+        child = self._ctx.Process(
+            target=self.target,
+            args=(index, self.loads, self.metrics_dir, self.max_jobs, self.load_threshold),
+            name=f"agent-worker-{index}",
+            daemon=True,
+        )
+        child.start()
+        self._children[index] = (child, time.monotonic())
+
+    def _watch(self):
+        while not self._stopping.wait(1.0):
+            now = time.monotonic()
+            for index, (child, started) in enumerate(self._children):
+                if child.is_alive():
+                    # A child that has stayed up for a minute has recovered
+                    if self._failures[index] and now - started > 60:
+                        self._failures[index] = 0
+                    continue
+                if not self._retry_at[index]:
+                    # Jobs of a crashed child are gone with it
+                    self.loads[index] = 0
+                    self._failures[index] += 1
+                    delay = min(WORKER_RESTART_BACKOFF_MAX, 2 ** (self._failures[index] - 1))
+                    self._retry_at[index] = now + delay
+                    logger.error(
+                        f"Agent worker {index} (pid {child.pid}) exited with code {child.exitcode}; "
+                        f"restarting in {delay:.0f}s"
+                    )
+                elif now >= self._retry_at[index]:
+                    self._retry_at[index] = 0.0
+                    self._restarts[index] += 1
+                    self._spawn(index)
+
+    def stop(self, timeout=15.0):
+        """Terminate every child and wait for them to exit; children drain their event outbox first."""
+        self._stopping.set()
+        for child, _ in filter(None, self._children):
+            if child.is_alive():
+                child.terminate()
+        deadline = time.monotonic() + timeout
+        for child, _ in filter(None, self._children):
+            child.join(max(0.0, deadline - time.monotonic()))
+            if child.is_alive():
+                child.kill()
+                child.join()
+        # The children's metric snapshots are only read while the pool runs
+        shutil.rmtree(self.metrics_dir, ignore_errors=True)
+
+    def health(self) -> dict:
+        workers = []
+        for index, entry in enumerate(self._children):
+            child = entry[0] if entry else None
+            workers.append({
+                "index": index,
+                "pid": child.pid if child else None,
+                "alive": bool(child and child.is_alive()),
+                "active_jobs": self.loads[index],
+                "load": round(min(1.0, self.loads[index] / self.max_jobs), 3),
+                "restarts": self._restarts[index],
+            })
+        return {
+            "processes": self.processes,
+            "alive": sum(1 for worker in workers if worker["alive"]),
+            "active_jobs": sum(worker["active_jobs"] for worker in workers),
+            "capacity": self.processes * self.max_jobs,
+            "workers": workers,
+        }
+
+    def stats(self) -> dict:
+        health = self.health()
+        return {
+            "processes": health["processes"],
+            "alive": health["alive"],
+            "active_jobs": health["active_jobs"],
+            "capacity": health["capacity"],
+            "restarts": sum(self._restarts),
+        }
+
+    def render_worker_metrics(self) -> str:
+        """Merge the children's latest metric snapshots, labelling each sample with its worker."""
+        snapshots = {}
+        for index in range(self.processes):
+            try:
+                with open(os.path.join(self.metrics_dir, f"worker-{index}.prom")) as f:
+                    snapshots[index] = f.read()
+            except FileNotFoundError:
+                continue
+        return merge_metrics(snapshots)
+
+
+def merge_metrics(snapshots: dict) -> str:
+    """Combine Prometheus text from several processes, keeping each metric family contiguous."""
+    families = {}
+    for worker, text in snapshots.items():
+        family = None
+        for line in text.splitlines():
+            if line.startswith("# TYPE ") or line.startswith("# HELP "):
+                family = line.split()[2]
+                entry = families.setdefault(family, {"meta": [], "samples": []})
+                if line not in entry["meta"]:
+                    entry["meta"].append(line)
+                continue
+            match = _SAMPLE_RE.match(line)
+            if not match or family is None:
+                continue
+            name, labels, value = match.groups()
+            labels = f'{{worker="{worker}",{labels[1:]}' if labels else f'{{worker="{worker}"}}'
+            families[family]["samples"].append(f"{name}{labels} {value}")
+    lines = []
+    for entry in families.values():
+        lines.extend(entry["meta"])
+        lines.extend(entry["samples"])
+    return "\n".join(lines) + "\n" if lines else ""